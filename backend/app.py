@@ -1,15 +1,35 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
+import click
 import mysql.connector
 from mysql.connector import errorcode
-import bcrypt
 import uuid
+import json
+import base64
+import math
 from datetime import datetime, timedelta
-import pandas as pd
-import pickle
+from decimal import Decimal
 import os
-from joblib import load as joblib_load
-import numpy as np
+import threading
+import time
+from db_pool import create_mysql_pool
+from migrations import run_migrations, LATEST_VERSION
+from velocity_store import VelocityStore, db_amount
+from payee_index import PayeeIndex
+from user_cache import UserCache
+from group_commit import GroupCommitWriter
+from hashing import HashingExecutor, HashingBusy
+from model_bundle import load_model_bundle, risk_score
+from feature_plan import build_model_base
+from rescore import rescore_transactions
+from export import ARROW_STREAM_MIMETYPE, arrow_stream, export_transactions
+from metrics import MetricsRegistry
+from kpi_rollups import apply_kpi_rollups, increment_counter, read_kpis, rebuild_kpi_rollups
+from review_queue import (
+    REVIEW_ACTIONS, InvalidFilter, apply_review_action, build_review_query, decode_review_cursor,
+    encode_review_cursor, parse_filters
+)
+from debug_log import Sampler, create_queue_logger
 
 app = Flask(__name__)
 CORS(app) # Enable CORS for all routes
@@ -22,34 +42,119 @@ db_config = {
     'database': 'bank'
 }
 
+# Connection pool sizing (override via env vars)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+
+db_pool = create_mysql_pool(db_config, DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW, DB_POOL_TIMEOUT)
+
 # Configurable transaction limits (override via env vars)
 MAX_TXNS_PER_DAY = int(os.getenv('MAX_TXNS_PER_DAY', '7'))
 MAX_TXN_AMOUNT = float(os.getenv('MAX_TXN_AMOUNT', '60000'))
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '500'))
+
+# Password hashing pool (override via env vars)
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', '2'))
+BCRYPT_MAX_QUEUE = int(os.getenv('BCRYPT_MAX_QUEUE', '32'))
+BCRYPT_TIMEOUT = float(os.getenv('BCRYPT_TIMEOUT', '30'))
+
+# Transaction history paging and streaming
+MAX_HISTORY_PAGE_SIZE = int(os.getenv('MAX_HISTORY_PAGE_SIZE', '500'))
+HISTORY_STREAM_CHUNK = int(os.getenv('HISTORY_STREAM_CHUNK', '500'))
+
+# Training-data export: Parquet day partitions under EXPORT_DIR; rows younger than
+# EXPORT_SETTLE_SECONDS are left for the next run, since transfers still committing may carry earlier timestamps
+EXPORT_DIR = os.getenv('EXPORT_DIR', os.path.join(os.path.dirname(__file__), 'exports'))
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '50000'))
+EXPORT_SETTLE_SECONDS = float(os.getenv('EXPORT_SETTLE_SECONDS', '60'))
+
+# Apply schema migrations at process start instead of on each request
+RUN_MIGRATIONS_ON_STARTUP = os.getenv('RUN_MIGRATIONS_ON_STARTUP', '1') == '1'
+
+# In-memory 24h velocity window; exact only while this process is the sole writer of transfers, so it is
+# opt-in for single-writer deployments (several gunicorn workers, or Flask and asgi_app side by side, undercount)
+VELOCITY_STORE = os.getenv('VELOCITY_STORE', '0') == '1'
+VELOCITY_REWARM_INTERVAL = float(os.getenv('VELOCITY_REWARM_INTERVAL', '30'))
+
+# Per-sender payee sets for is_new_payee, bounded by the total number of cached payees
+PAYEE_INDEX = os.getenv('PAYEE_INDEX', '1') == '1'
+PAYEE_INDEX_MAX_ENTRIES = int(os.getenv('PAYEE_INDEX_MAX_ENTRIES', '1000000'))
+
+# Users rows by user_id and email for the login and transfer paths; misses are cached for USER_CACHE_NEGATIVE_TTL
+USER_CACHE = os.getenv('USER_CACHE', '1') == '1'
+USER_CACHE_MAX_ENTRIES = int(os.getenv('USER_CACHE_MAX_ENTRIES', '100000'))
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '300'))
+USER_CACHE_NEGATIVE_TTL = float(os.getenv('USER_CACHE_NEGATIVE_TTL', '5'))
+
+# Micro-batching of concurrent single-transaction predictions (override via env vars)
+INFERENCE_BATCHING = os.getenv('INFERENCE_BATCHING', '1') == '1'
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv('INFERENCE_MAX_BATCH_SIZE', '32'))
+INFERENCE_MAX_WAIT_MS = float(os.getenv('INFERENCE_MAX_WAIT_MS', '2'))
+INFERENCE_BYPASS_INFLIGHT = int(os.getenv('INFERENCE_BYPASS_INFLIGHT', '1'))
 
-# Load fraud detection model components
+# Group commit of single-transaction inserts: rows from concurrent requests share one transaction and fsync
+GROUP_COMMIT = os.getenv('GROUP_COMMIT', '0') == '1'
+GROUP_COMMIT_MAX_BATCH_SIZE = int(os.getenv('GROUP_COMMIT_MAX_BATCH_SIZE', '64'))
+GROUP_COMMIT_MAX_WAIT_MS = float(os.getenv('GROUP_COMMIT_MAX_WAIT_MS', '2'))
+
+# Scoring backend: 'sklearn', or 'compiled' to flatten tree ensembles into NumPy node arrays (checked against
+# sklearn at load); compiled is faster for single rows and small batches but slower from about 1000 rows up
+MODEL_ENGINE = os.getenv('MODEL_ENGINE', 'sklearn')
+
+# Load fraud detection model components; converted copies are memory-mapped so workers share their pages
 MODEL_DIR = os.path.join(os.path.dirname(__file__), 'model')
+ARTIFACT_MMAP = os.getenv('ARTIFACT_MMAP', '1') == '1'
+MODEL_WATCH = os.getenv('MODEL_WATCH', '0') == '1'
+MODEL_WATCH_INTERVAL = float(os.getenv('MODEL_WATCH_INTERVAL', '5'))
 
-def try_load_model(path: str):
-    try:
-        return joblib_load(path)
-    except Exception as e1:
-        try:
-            with open(path, 'rb') as f:
-                return pickle.load(f)
-        except Exception as e2:
-            print(f"Failed to load {os.path.basename(path)} via joblib ({e1}) and pickle ({e2})")
-            return None
+# Feature dumps for 1 in FEATURE_DUMP_EVERY predictions (0 disables); request logs go through a bounded queue
+FEATURE_DUMP_EVERY = int(os.getenv('FEATURE_DUMP_EVERY', '1000'))
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
 
-fraud_model = try_load_model(os.path.join(MODEL_DIR, 'fraud_model.pkl'))
-encoders = try_load_model(os.path.join(MODEL_DIR, 'encoders.pkl'))
-scaler = try_load_model(os.path.join(MODEL_DIR, 'scaler.pkl'))
+def report_model_bundle(bundle):
+    for name, info in bundle.report.items():
+        rss = f"{info['rss_delta_bytes'] / 1e6:.1f}MB" if info['rss_delta_bytes'] is not None else 'n/a'
+        print(f"Loaded {name} ({info['mode']}) in {info['seconds']:.3f}s; RSS +{rss}, mapped {info['mapped_bytes'] / 1e6:.1f}MB")
+    if bundle.ready:
+        print(f"Fraud model components loaded successfully (version {bundle.version}, {bundle.engine_name} engine).")
+    else:
+        print("Error loading fraud model components: one or more artifacts failed to load.")
 
-if fraud_model and encoders and scaler:
-    print("Fraud model components loaded successfully.")
-else:
-    print("Error loading fraud model components: one or more artifacts failed to load.")
+def inference_scheduler_options():
+    if not INFERENCE_BATCHING:
+        return None
+    return {
+        'max_batch_size': INFERENCE_MAX_BATCH_SIZE,
+        'max_wait_ms': INFERENCE_MAX_WAIT_MS,
+        'bypass_inflight': INFERENCE_BYPASS_INFLIGHT
+    }
+
+# Requests read active_model once and keep that reference, so a reload never changes the model mid-request
+active_model = load_model_bundle(MODEL_DIR, mmap=ARTIFACT_MMAP, scheduler_options=inference_scheduler_options(), engine=MODEL_ENGINE)
+report_model_bundle(active_model)
+model_reload_lock = threading.Lock()
+model_reload_status = {'state': 'idle', 'version': active_model.version, 'error': None, 'finished_at': None}
 
 last_db_error = None
+schema_ready = False
+schema_lock = threading.Lock()
+velocity_store = VelocityStore(window=timedelta(hours=24)) if VELOCITY_STORE else None
+last_velocity_warm = 0.0
+payee_index = PayeeIndex(max_entries=PAYEE_INDEX_MAX_ENTRIES) if PAYEE_INDEX else None
+user_cache = UserCache(
+    max_entries=USER_CACHE_MAX_ENTRIES, ttl=USER_CACHE_TTL, negative_ttl=USER_CACHE_NEGATIVE_TTL
+) if USER_CACHE else None
+password_hasher = HashingExecutor(
+    workers=BCRYPT_WORKERS, max_queue=BCRYPT_MAX_QUEUE, rounds=BCRYPT_ROUNDS, timeout=BCRYPT_TIMEOUT
+)
+
+metrics = MetricsRegistry()
+stage_seconds = metrics.histogram('bank_stage_seconds', 'Time spent in each stage of request handling.', ['stage'])
+request_seconds = metrics.histogram('bank_request_seconds', 'HTTP request latency by route.', ['method', 'route', 'status'])
+txn_log, txn_log_handler, start_txn_log = create_queue_logger('bank.transactions', max_queue=LOG_QUEUE_SIZE)
+sample_feature_dump = Sampler(FEATURE_DUMP_EVERY)
 
 def ensure_database_exists():
     try:
@@ -68,7 +173,8 @@ def ensure_database_exists():
 def get_db_connection():
     global last_db_error
     try:
-        conn = mysql.connector.connect(**db_config)
+        with stage_seconds.time('db_acquire'):
+            conn = db_pool.acquire()
         return conn
     except mysql.connector.Error as err:
         last_db_error = str(err)
@@ -77,126 +183,227 @@ def get_db_connection():
             created = ensure_database_exists()
             if created:
                 try:
-                    conn = mysql.connector.connect(**db_config)
+                    conn = db_pool.acquire()
                     return conn
                 except mysql.connector.Error as err2:
                     last_db_error = str(err2)
         print(f"Error connecting to database: {err}")
         return None
 
-# Ensure required tables exist
-def ensure_users_table(conn):
+# Apply pending schema migrations once per process; afterwards this is a flag check
+def ensure_schema(conn):
+    global schema_ready
+    with stage_seconds.time('schema_check'):
+        if schema_ready:
+            return
+        with schema_lock:
+            if not schema_ready:
+                run_migrations(conn, db_config['database'])
+                schema_ready = True
+
+def migrate_on_startup():
+    conn = get_db_connection()
+    if conn is None:
+        print("Skipping startup schema migration: database unavailable.")
+        return
     try:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                user_id VARCHAR(36) PRIMARY KEY,
-                full_name VARCHAR(255) NOT NULL,
-                account_number VARCHAR(50) NOT NULL UNIQUE,
-                email VARCHAR(255) NOT NULL UNIQUE,
-                password_hash VARCHAR(255) NOT NULL
-            )
-            """
+        ensure_schema(conn)
+    except Exception as e:
+        print(f"Startup schema migration failed: {e}")
+    finally:
+        conn.close()
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Apply pending schema migrations."""
+    conn = get_db_connection()
+    if conn is None:
+        raise SystemExit(f"Database connection error: {last_db_error}")
+    try:
+        applied = run_migrations(conn, db_config['database'])
+        print(f"Schema at version {LATEST_VERSION}; applied {applied or 'nothing'}.")
+    finally:
+        conn.close()
+
+@app.cli.command('rescore')
+@click.option('--model-dir', default=None, help='Directory with fraud_model/encoders/scaler .pkl files (default: MODEL_DIR).')
+@click.option('--chunk-size', default=5000, show_default=True, help='Rows per scoring chunk.')
+@click.option('--workers', default=max(1, (os.cpu_count() or 2) - 1), show_default=True, help='Scoring processes.')
+@click.option('--reset', is_flag=True, help='Ignore the checkpoint and start from the first transaction.')
+def rescore_command(model_dir, chunk_size, workers, reset):
+    """Re-score stored transactions into transaction_scores, resuming from the last checkpoint."""
+    conn = get_db_connection()
+    if conn is None:
+        raise SystemExit(f"Database connection error: {last_db_error}")
+    try:
+        ensure_schema(conn)
+    finally:
+        conn.close()
+    rescore_transactions(
+        lambda: mysql.connector.connect(**db_config), model_dir or MODEL_DIR,
+        chunk_size=chunk_size, workers=workers, mmap=ARTIFACT_MMAP, reset=reset
+    )
+
+@app.cli.command('export-training')
+@click.option('--out-dir', default=None, help='Directory for the date=YYYY-MM-DD partitions (default: EXPORT_DIR).')
+@click.option('--chunk-size', default=EXPORT_CHUNK_SIZE, show_default=True, help='Rows per fetch and Parquet row group.')
+@click.option('--since', default=None, help='Export rows after this ISO timestamp instead of the stored high-water mark.')
+@click.option('--until', default=None, help='Export rows before this ISO timestamp (default: now - EXPORT_SETTLE_SECONDS).')
+@click.option('--reset', is_flag=True, help='Ignore the high-water mark and export from the first transaction (existing part files are kept).')
+def export_training_command(out_dir, chunk_size, since, until, reset):
+    """Export feature columns and is_fraud as Parquet partitioned by day, after the last exported row."""
+    try:
+        since = datetime.fromisoformat(since) if since else None
+        until = datetime.fromisoformat(until) if until else datetime.now() - timedelta(seconds=EXPORT_SETTLE_SECONDS)
+    except ValueError as e:
+        raise SystemExit(f"Invalid timestamp: {e}")
+    conn = get_db_connection()
+    if conn is None:
+        raise SystemExit(f"Database connection error: {last_db_error}")
+    try:
+        ensure_schema(conn)
+    finally:
+        conn.close()
+    try:
+        export_transactions(
+            lambda: mysql.connector.connect(**db_config), out_dir or EXPORT_DIR,
+            chunk_size=chunk_size, since=since, until=until, reset=reset
         )
-        conn.commit()
     except mysql.connector.Error as err:
-        print(f"Error ensuring users table exists: {err}")
-        raise
-    finally:
-        try:
-            cursor.close()
-        except Exception:
-            pass
+        raise SystemExit(f"Export failed: {err}")
 
-# Ensure transactions table and required columns exist
-def ensure_transactions_table(conn):
+@app.cli.command('rebuild-kpis')
+def rebuild_kpis_command():
+    """Recompute the KPI rollups and counters from the users and transactions tables."""
+    conn = get_db_connection()
+    if conn is None:
+        raise SystemExit(f"Database connection error: {last_db_error}")
     try:
+        ensure_schema(conn)
         cursor = conn.cursor()
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS transactions (
-                txn_id VARCHAR(36) PRIMARY KEY,
-                sender_user_id VARCHAR(36) NOT NULL,
-                receiver_account_number VARCHAR(50) NOT NULL,
-                receiver_name VARCHAR(255),
-                amount DECIMAL(15,2) NOT NULL,
-                currency VARCHAR(10) NOT NULL,
-                description TEXT,
-                channel VARCHAR(50),
-                authorization_method VARCHAR(50),
-                is_international TINYINT(1),
-                timestamp DATETIME NOT NULL,
-                txn_hour INT,
-                txn_day_of_week INT,
-                ip_address VARCHAR(45),
-                device_fingerprint VARCHAR(255),
-                is_new_payee TINYINT(1),
-                txn_count_last_24h INT,
-                sum_amount_last_24h DECIMAL(15,2),
-                is_fraud TINYINT(1),
-                status VARCHAR(20)
-            )
-            """
-        )
+        started = time.perf_counter()
+        rebuild_kpi_rollups(cursor)
         conn.commit()
+        cursor.close()
+        print(f"KPI rollups rebuilt in {time.perf_counter() - started:.1f}s.")
     except mysql.connector.Error as err:
-        print(f"Error ensuring transactions table exists: {err}")
-        raise
+        conn.rollback()
+        raise SystemExit(f"KPI rebuild failed: {err}")
     finally:
-        try:
-            cursor.close()
-        except Exception:
-            pass
+        conn.close()
 
-def ensure_transactions_schema(conn):
+# Load the last 24h of successful transfers into the velocity store
+def warm_velocity_store():
+    if velocity_store is None or not velocity_store.begin_warm():
+        return
+    conn = get_db_connection()
+    if conn is None:
+        velocity_store.fail_warm()
+        return
     try:
+        ensure_schema(conn)
+        now = datetime.now()
         cursor = conn.cursor()
         cursor.execute(
-            """
-            SELECT COLUMN_NAME FROM information_schema.COLUMNS
-            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'transactions'
-            """,
-            (db_config['database'],)
+            "SELECT sender_user_id, timestamp, amount, txn_id FROM transactions WHERE timestamp >= %s AND status = 'Success'",
+            (now - velocity_store.window,)
         )
-        existing = {row[0] for row in cursor.fetchall()}
-
-        expected_defs = {
-            'txn_id': 'VARCHAR(36)',
-            'sender_user_id': 'VARCHAR(36)',
-            'receiver_account_number': 'VARCHAR(50)',
-            'receiver_name': 'VARCHAR(255)',
-            'amount': 'DECIMAL(15,2)',
-            'currency': 'VARCHAR(10)',
-            'description': 'TEXT',
-            'channel': 'VARCHAR(50)',
-            'authorization_method': 'VARCHAR(50)',
-            'is_international': 'TINYINT(1)',
-            'timestamp': 'DATETIME',
-            'txn_hour': 'INT',
-            'txn_day_of_week': 'INT',
-            'ip_address': 'VARCHAR(45)',
-            'device_fingerprint': 'VARCHAR(255)',
-            'is_new_payee': 'TINYINT(1)',
-            'txn_count_last_24h': 'INT',
-            'sum_amount_last_24h': 'DECIMAL(15,2)',
-            'is_fraud': 'TINYINT(1)',
-            'status': 'VARCHAR(20)'
+        rows = cursor.fetchall()
+        cursor.close()
+        velocity_store.finish_warm(rows, datetime.now())
+        print(f"Velocity store warmed with {len(rows)} transactions.")
+    except Exception as e:
+        velocity_store.fail_warm()
+        print(f"Error warming velocity store: {e}")
+    finally:
+        conn.close()
+
+def schedule_velocity_warm():
+    global last_velocity_warm
+    if velocity_store is None or velocity_store.state != 'cold':
+        return
+    if time.monotonic() - last_velocity_warm < VELOCITY_REWARM_INTERVAL:
+        return
+    last_velocity_warm = time.monotonic()
+    threading.Thread(target=warm_velocity_store, daemon=True).start()
+
+INSERT_TRANSACTION_SQL = (
+    "INSERT INTO transactions (txn_id, sender_user_id, receiver_account_number, receiver_name, amount, currency, description, channel, authorization_method, is_international, timestamp, txn_hour, txn_day_of_week, ip_address, device_fingerprint, is_new_payee, txn_count_last_24h, sum_amount_last_24h, is_fraud, status, model_version, fraud_probability, risk_score, review_status) "
+    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+)
+
+# One group-commit batch: a multi-row insert plus the KPI rollups for every row in it
+def write_transaction_rows(cursor, rows):
+    cursor.executemany(INSERT_TRANSACTION_SQL, rows)
+    apply_kpi_rollups(cursor, [(row[10], row[7], row[5], row[4], row[18]) for row in rows])
+
+# The writer keeps its own pooled connection; db_pool is looked up per connect so a replaced pool is picked up
+transaction_writer = GroupCommitWriter(
+    lambda: db_pool.acquire(), write_transaction_rows,
+    max_batch_size=GROUP_COMMIT_MAX_BATCH_SIZE, max_wait_ms=GROUP_COMMIT_MAX_WAIT_MS
+) if GROUP_COMMIT else None
+
+# Answer is_new_payee from the payee index, loading the sender's payees on first use. A payee in the
+# index is known for certain; "not in the index" may be stale, so it is confirmed with the point query
+def check_new_payee(cursor, user_id, receiver_account_number):
+    known = None
+    if payee_index is not None:
+        known = payee_index.contains(user_id, receiver_account_number)
+        if known is None and payee_index.begin_load(user_id):
+            try:
+                cursor.execute("SELECT DISTINCT receiver_account_number FROM transactions WHERE sender_user_id = %s", (user_id,))
+                payee_index.finish_load(user_id, [row['receiver_account_number'] for row in cursor.fetchall()])
+            except Exception:
+                payee_index.fail_load(user_id)
+                raise
+            known = payee_index.contains(user_id, receiver_account_number)
+        if known:
+            return False
+    cursor.execute(
+        "SELECT 1 AS found FROM transactions WHERE sender_user_id = %s AND receiver_account_number = %s LIMIT 1",
+        (user_id, receiver_account_number)
+    )
+    found = cursor.fetchone() is not None
+    if found and known is False:
+        payee_index.learn(user_id, receiver_account_number)
+    return not found
+
+USER_COLUMNS = "user_id, password_hash, full_name, account_number, email"
+
+# Read a users row by 'user_id' or 'email' (dictionary cursor) and remember it, or its absence, in the user cache
+def load_user(cursor, field, value):
+    started = user_cache.now() if user_cache is not None else None
+    cursor.execute(f"SELECT {USER_COLUMNS} FROM users WHERE {field} = %s", (value,))
+    user = cursor.fetchone()
+    if user_cache is not None:
+        user_cache.store(field, value, user, started)
+    return user
+
+def find_user(cursor, field, value):
+    if user_cache is not None:
+        hit, user = user_cache.lookup(field, value)
+        if hit:
+            return user
+    return load_user(cursor, field, value)
+
+def login_payload(user):
+    return {
+        'message': 'Login successful',
+        'user': {
+            'user_id': user['user_id'],
+            'full_name': user['full_name'],
+            'account_number': user['account_number'],
+            'email': user['email']
         }
+    }
 
-        missing = [(name, dtype) for name, dtype in expected_defs.items() if name not in existing]
-        if missing:
-            alter_stmt = "ALTER TABLE transactions " + ", ".join([f"ADD COLUMN {name} {dtype}" for name, dtype in missing])
-            cursor.execute(alter_stmt)
-            conn.commit()
-    except mysql.connector.Error as err:
-        print(f"Error ensuring transactions schema: {err}")
-        raise
-    finally:
-        try:
-            cursor.close()
-        except Exception:
-            pass
+# Request amounts as a float, or None when they are not a finite number ("10" is accepted, "ten" is not)
+def parse_amount(value):
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return None
+    return amount if math.isfinite(amount) else None
 
 # Helper function to generate derived fields and perform validations
 def generate_derived_fields_and_validate(user_id, receiver_account_number, amount, currency, ip_address, device_fingerprint, conn):
@@ -205,35 +412,45 @@ def generate_derived_fields_and_validate(user_id, receiver_account_number, amoun
 
     # Fetch sender's account number from DB using user_id
     cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT account_number FROM users WHERE user_id = %s", (user_id,))
-    sender_info = cursor.fetchone()
+    with stage_seconds.time('sender_lookup'):
+        sender_info = find_user(cursor, 'user_id', user_id)
     if not sender_info:
         return {'error': 'Sender not found.'}, 404
     sender_account_number = sender_info['account_number']
 
     # Check for new payee
-    is_new_payee = False
-    cursor.execute(
-        "SELECT COUNT(*) AS cnt FROM transactions WHERE sender_user_id = %s AND receiver_account_number = %s",
-        (user_id, receiver_account_number)
-    )
-    row = cursor.fetchone()
-    if (row.get('cnt') if row else 0) == 0:
-        is_new_payee = True
+    with stage_seconds.time('payee_check'):
+        is_new_payee = check_new_payee(cursor, user_id, receiver_account_number)
 
     # Check if international transaction (simplified: if currency is not USD, assume international)
     is_international = (currency.upper() != 'USD') # This is a simplification; a more robust check would involve country codes or receiver bank location
 
-    # Transaction count and sum in last 24 hours
-    last_24h_threshold = current_time - timedelta(hours=24)
-    cursor.execute(
-        "SELECT COUNT(*) AS cnt, SUM(amount) AS total_amount FROM transactions WHERE sender_user_id = %s AND timestamp >= %s AND status = 'Success'",
-        (user_id, last_24h_threshold)
+    # Transaction count and sum in last 24 hours, from the in-memory window when it is warm
+    with stage_seconds.time('velocity_lookup'):
+        velocity = velocity_store.lookup(user_id, current_time) if velocity_store is not None else None
+    if velocity is not None:
+        txn_count_last_24h = velocity[0]
+        sum_amount_last_24h = float(velocity[1])
+    else:
+        last_24h_threshold = current_time - timedelta(hours=24)
+        with stage_seconds.time('velocity_query'):
+            cursor.execute(
+                "SELECT COUNT(*) AS cnt, SUM(amount) AS total_amount FROM transactions WHERE sender_user_id = %s AND timestamp >= %s AND status = 'Success'",
+                (user_id, last_24h_threshold)
+            )
+            txn_data_24h = cursor.fetchone() or {}
+        txn_count_last_24h = (txn_data_24h.get('cnt') or 0)
+        sum_amount_last_24h = float(txn_data_24h.get('total_amount') or 0.0)
+        schedule_velocity_warm()
+
+    return finish_derived_fields(
+        txn_id, current_time, amount, ip_address, device_fingerprint, sender_account_number, is_new_payee,
+        is_international, txn_count_last_24h, sum_amount_last_24h
     )
-    txn_data_24h = cursor.fetchone() or {}
-    txn_count_last_24h = (txn_data_24h.get('cnt') or 0)
-    sum_amount_last_24h = float(txn_data_24h.get('total_amount') or 0.0)
 
+# Limit checks and the derived-field dict, shared with the asyncio entry point (asgi_app.py)
+def finish_derived_fields(txn_id, current_time, amount, ip_address, device_fingerprint, sender_account_number,
+                          is_new_payee, is_international, txn_count_last_24h, sum_amount_last_24h):
     # Apply constraints (configurable)
     if txn_count_last_24h >= MAX_TXNS_PER_DAY:
         return {'error': f'Transaction limit exceeded: Max {MAX_TXNS_PER_DAY} transactions per day.'}, 403
@@ -255,10 +472,346 @@ def generate_derived_fields_and_validate(user_id, receiver_account_number, amoun
     }
     return derived_fields, 200
 
+# Set-based version of the lookups above for a batch of senders
+def fetch_batch_sender_state(cursor, sender_ids, receiver_account_numbers, since):
+    placeholders = ", ".join(["%s"] * len(sender_ids))
+    cursor.execute(f"SELECT user_id, account_number FROM users WHERE user_id IN ({placeholders})", tuple(sender_ids))
+    accounts = {row['user_id']: row['account_number'] for row in cursor.fetchall()}
+
+    cursor.execute(
+        f"SELECT sender_user_id, COUNT(*) AS cnt, SUM(amount) AS total_amount FROM transactions WHERE sender_user_id IN ({placeholders}) AND timestamp >= %s AND status = 'Success' GROUP BY sender_user_id",
+        tuple(sender_ids) + (since,)
+    )
+    velocity = {row['sender_user_id']: (row['cnt'] or 0, Decimal(row['total_amount'] or 0)) for row in cursor.fetchall()}
+
+    receiver_placeholders = ", ".join(["%s"] * len(receiver_account_numbers))
+    cursor.execute(
+        f"SELECT DISTINCT sender_user_id, receiver_account_number FROM transactions WHERE sender_user_id IN ({placeholders}) AND receiver_account_number IN ({receiver_placeholders})",
+        tuple(sender_ids) + tuple(receiver_account_numbers)
+    )
+    payees = {}
+    for row in cursor.fetchall():
+        payees.setdefault(row['sender_user_id'], set()).add(row['receiver_account_number'])
+    return accounts, velocity, payees
+
 @app.route('/')
 def home():
     return "Fraud Detection Banking Backend"
 
+@app.route('/api/inference/stats', methods=['GET'])
+def inference_stats():
+    scheduler = active_model.scheduler
+    if scheduler is None:
+        return jsonify({'enabled': False}), 200
+    return jsonify(dict(scheduler.stats(), enabled=True, model_version=active_model.version)), 200
+
+@app.route('/api/group-commit/stats', methods=['GET'])
+def group_commit_stats():
+    if transaction_writer is None:
+        return jsonify({'enabled': False}), 200
+    return jsonify(dict(transaction_writer.stats(), enabled=True)), 200
+
+# Load, check and warm a new bundle off the request path, then swap it in; failures keep the old one
+def reload_model():
+    global active_model
+    if not model_reload_lock.acquire(blocking=False):
+        return False
+    try:
+        model_reload_status.update(state='loading', error=None)
+        bundle = load_model_bundle(
+            MODEL_DIR, mmap=ARTIFACT_MMAP, strict=True, scheduler_options=inference_scheduler_options(), engine=MODEL_ENGINE
+        )
+        previous = active_model
+        active_model = bundle
+        # Rows already queued on the old scheduler are answered before its worker exits; requests that
+        # still hold the old bundle predict on it directly from here on
+        previous.close()
+        model_reload_status.update(state='idle', version=bundle.version, finished_at=datetime.now().isoformat())
+        print(f"Fraud model reloaded: {previous.version} -> {bundle.version}")
+    except Exception as e:
+        model_reload_status.update(state='failed', error=str(e), finished_at=datetime.now().isoformat())
+        print(f"Fraud model reload failed, still serving {active_model.version}: {e}")
+    finally:
+        model_reload_lock.release()
+    return True
+
+def model_files_signature():
+    signature = []
+    for name in ('fraud_model', 'encoders', 'scaler'):
+        try:
+            st = os.stat(os.path.join(MODEL_DIR, f"{name}.pkl"))
+            signature.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+def watch_model_dir():
+    # Reload once the artifact files changed and then stayed unchanged for one interval (no half-written copies)
+    loaded = model_files_signature()
+    seen = loaded
+    while True:
+        time.sleep(MODEL_WATCH_INTERVAL)
+        current = model_files_signature()
+        if current != seen:
+            seen = current
+            continue
+        if current != loaded:
+            loaded = current
+            reload_model()
+
+@app.route('/api/admin/model', methods=['GET'])
+def model_info():
+    model = active_model
+    return jsonify({
+        'version': model.version,
+        'ready': model.ready,
+        'compiled_features': model.feature_plan is not None,
+        'engine': model.engine_name,
+        'artifacts': model.report,
+        'reload': model_reload_status
+    }), 200
+
+@app.route('/api/admin/model/reload', methods=['POST'])
+def model_reload():
+    if model_reload_lock.locked():
+        return jsonify({'message': 'Model reload already in progress'}), 409
+    threading.Thread(target=reload_model, daemon=True).start()
+    return jsonify({'message': 'Model reload started', 'version': active_model.version}), 202
+
+@app.route('/api/admin/kpis', methods=['GET'])
+def admin_kpis():
+    conn = get_db_connection()
+    if conn is None:
+        return jsonify({'message': 'Database connection error', 'details': last_db_error}), 500
+    cursor = None
+    try:
+        ensure_schema(conn)
+        cursor = conn.cursor(dictionary=True)
+        return jsonify(read_kpis(cursor)), 200
+    except mysql.connector.Error as err:
+        print(f"Error reading KPIs: {err}")
+        return jsonify({'message': f'Database error: {err}'}), 500
+    finally:
+        if cursor is not None:
+            cursor.close()
+        conn.close()
+
+@app.route('/api/admin/transactions', methods=['GET'])
+def admin_transactions():
+    # Flagged-transaction queue: filters, sort=newest|risk and keyset paging (?limit, ?cursor) all run in SQL
+    try:
+        filters = parse_filters(request.args)
+        limit = max(1, min(int(request.args.get('limit', '50')), MAX_HISTORY_PAGE_SIZE))
+        page_cursor = request.args.get('cursor')
+        after = decode_review_cursor(page_cursor, filters['sort']) if page_cursor else None
+    except ValueError as e:
+        message = str(e) if isinstance(e, InvalidFilter) else 'limit must be an integer'
+        return jsonify({'message': message}), 400
+
+    conn = get_db_connection()
+    if conn is None:
+        return jsonify({'message': 'Database connection error', 'details': last_db_error}), 500
+    cursor = None
+    try:
+        ensure_schema(conn)
+        cursor = conn.cursor(dictionary=True)
+        # Fetch one extra row to know whether another page exists
+        sql, params = build_review_query(filters, after, limit + 1)
+        cursor.execute(sql, tuple(params))
+        transactions = cursor.fetchall()
+        next_cursor = None
+        if len(transactions) > limit:
+            transactions = transactions[:limit]
+            next_cursor = encode_review_cursor(transactions[-1], filters['sort'])
+        return jsonify({'transactions': transactions, 'next_cursor': next_cursor}), 200
+    except mysql.connector.Error as err:
+        print(f"Error fetching flagged transactions: {err}")
+        return jsonify({'message': f'Database error: {err}'}), 500
+    finally:
+        if cursor is not None:
+            cursor.close()
+        conn.close()
+
+@app.route('/api/admin/export', methods=['GET'])
+def admin_export():
+    # Arrow IPC stream of feature columns + is_fraud for ?since=...&until=... (ISO timestamps), one batch per chunk
+    try:
+        since = datetime.fromisoformat(request.args['since']) if request.args.get('since') else None
+        until = datetime.fromisoformat(request.args['until']) if request.args.get('until') \
+            else datetime.now() - timedelta(seconds=EXPORT_SETTLE_SECONDS)
+    except ValueError:
+        return jsonify({'message': 'since and until must be ISO timestamps'}), 400
+
+    conn = get_db_connection()
+    if conn is None:
+        return jsonify({'message': 'Database connection error', 'details': last_db_error}), 500
+    try:
+        ensure_schema(conn)
+    except mysql.connector.Error as err:
+        conn.close()
+        print(f"Error preparing export: {err}")
+        return jsonify({'message': f'Database error: {err}'}), 500
+
+    def generate():
+        try:
+            yield from arrow_stream(conn, (since, '') if since else None, until, EXPORT_CHUNK_SIZE)
+        except mysql.connector.Error as err:
+            print(f"Error streaming export: {err}")
+            raise
+        finally:
+            conn.close()
+
+    response = Response(stream_with_context(generate()), status=200, mimetype=ARROW_STREAM_MIMETYPE)
+    # A generator that never starts (HEAD, client gone before the first chunk) never reaches its finally
+    response.call_on_close(conn.close)
+    return response
+
+def review_transactions(txn_ids, action):
+    if action not in REVIEW_ACTIONS:
+        return jsonify({'message': f"action must be one of {', '.join(REVIEW_ACTIONS)}"}), 400
+    if not txn_ids or not all(isinstance(t, str) and t for t in txn_ids):
+        return jsonify({'message': 'Expected a non-empty list of transaction ids'}), 400
+    if len(txn_ids) > MAX_BATCH_SIZE:
+        return jsonify({'message': f'Too many transactions: Max {MAX_BATCH_SIZE} per request.'}), 413
+
+    conn = get_db_connection()
+    if conn is None:
+        return jsonify({'message': 'Database connection error', 'details': last_db_error}), 500
+    cursor = None
+    try:
+        ensure_schema(conn)
+        cursor = conn.cursor()
+        updated, not_found = apply_review_action(cursor, txn_ids, action)
+        conn.commit()
+        return jsonify({'action': action, 'review_status': REVIEW_ACTIONS[action], 'updated': updated, 'not_found': not_found}), 200
+    except mysql.connector.Error as err:
+        conn.rollback()
+        print(f"Error applying review action: {err}")
+        return jsonify({'message': f'Database error: {err}'}), 500
+    finally:
+        if cursor is not None:
+            cursor.close()
+        conn.close()
+
+@app.route('/api/admin/transactions/actions', methods=['POST'])
+def admin_transactions_bulk_action():
+    data = request.get_json(silent=True) or {}
+    txn_ids = data.get('txn_ids')
+    return review_transactions(txn_ids if isinstance(txn_ids, list) else None, data.get('action'))
+
+@app.route('/api/admin/transactions/<string:txn_id>/action', methods=['POST'])
+def admin_transaction_action(txn_id):
+    data = request.get_json(silent=True) or {}
+    response, status_code = review_transactions([txn_id], data.get('action'))
+    if status_code == 200 and response.get_json()['not_found']:
+        return jsonify({'message': 'Flagged transaction not found'}), 404
+    return response, status_code
+
+@app.route('/api/db/pool/stats', methods=['GET'])
+def db_pool_stats():
+    return jsonify(db_pool.stats()), 200
+
+@app.route('/api/hashing/stats', methods=['GET'])
+def hashing_stats():
+    return jsonify(password_hasher.stats()), 200
+
+@app.route('/api/user-cache/stats', methods=['GET'])
+def user_cache_stats():
+    if user_cache is None:
+        return jsonify({'enabled': False}), 200
+    return jsonify(dict(user_cache.stats(), enabled=True)), 200
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # Label by route pattern, not raw path, so user ids do not create new series
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        request_seconds.observe(time.perf_counter() - started, request.method, route, str(response.status_code))
+    return response
+
+# Existing component stats, read at scrape time
+def collect_component_metrics():
+    model = active_model
+    yield 'bank_model_info', 'gauge', 'Active fraud model bundle.', [
+        ({'version': model.version, 'compiled_features': str(model.feature_plan is not None).lower(),
+          'engine': model.engine_name}, 1)
+    ]
+
+    pool = db_pool.stats()
+    yield 'bank_db_pool_connections', 'gauge', 'Database pool connections by state.', [
+        ({'state': state}, pool[state]) for state in ('open', 'idle', 'in_use', 'waiters')
+    ]
+    yield 'bank_db_pool_events_total', 'counter', 'Database pool checkouts, timeouts and reconnects.', [
+        ({'event': event}, pool[event]) for event in ('checkouts', 'timeouts', 'reconnects')
+    ]
+
+    hashing = password_hasher.stats()
+    yield 'bank_hashing_in_flight', 'gauge', 'Password hashes running or queued.', [({}, hashing['in_flight'])]
+    yield 'bank_hashing_rejected_total', 'counter', 'Password hashes rejected because the pool was saturated.', [({}, hashing['rejected'])]
+    yield 'bank_hashing_timeouts_total', 'counter', 'Password hashes the caller stopped waiting for.', [({}, hashing['timeouts'])]
+    yield 'bank_hashing_restarts_total', 'counter', 'Hashing pools replaced after a worker died.', [({}, hashing['restarts'])]
+
+    if model.scheduler is not None:
+        scheduler = model.scheduler.stats()
+        yield 'bank_inference_queue_depth', 'gauge', 'Predictions waiting for a batch.', [({}, scheduler['queue_depth'])]
+        yield 'bank_inference_rows_total', 'counter', 'Predictions by path.', [
+            ({'path': 'batched'}, scheduler['batched_rows']), ({'path': 'bypassed'}, scheduler['bypassed'])
+        ]
+        yield 'bank_inference_batches_total', 'counter', 'Micro-batches run.', [({}, scheduler['batches'])]
+
+    if transaction_writer is not None:
+        writer = transaction_writer.stats()
+        yield 'bank_group_commit_queue_depth', 'gauge', 'Transaction rows waiting for a group commit.', [({}, writer['queue_depth'])]
+        yield 'bank_group_commit_rows_total', 'counter', 'Transaction rows written by the group-commit writer.', [
+            ({'result': 'committed'}, writer['committed_rows']), ({'result': 'failed'}, writer['failed_rows'])
+        ]
+        yield 'bank_group_commit_batches_total', 'counter', 'Group-commit transactions, and batches retried row by row.', [
+            ({'kind': 'all'}, writer['batches']), ({'kind': 'isolated'}, writer['isolated_batches'])
+        ]
+
+    if velocity_store is not None:
+        velocity = velocity_store.stats()
+        yield 'bank_velocity_store_lookups_total', 'counter', 'Velocity store lookups.', [
+            ({'result': 'hit'}, velocity['hits']), ({'result': 'miss'}, velocity['misses'])
+        ]
+        yield 'bank_velocity_store_warm', 'gauge', '1 when the velocity store is serving lookups.', [({}, int(velocity['state'] == 'warm'))]
+
+    if payee_index is not None:
+        payees = payee_index.stats()
+        yield 'bank_payee_index_lookups_total', 'counter', 'Payee index lookups.', [
+            ({'result': 'hit'}, payees['hits']), ({'result': 'miss'}, payees['misses']),
+            ({'result': 'too_large'}, payees['too_large_lookups'])
+        ]
+        yield 'bank_payee_index_stale_misses_total', 'counter', 'Payees missing from the index but found in the table.', [
+            ({}, payees['stale_misses'])
+        ]
+        yield 'bank_payee_index_entries', 'gauge', 'Payees cached in the payee index.', [({}, payees['entries'])]
+
+    if user_cache is not None:
+        users = user_cache.stats()
+        yield 'bank_user_cache_lookups_total', 'counter', 'User cache lookups.', [
+            ({'result': result}, users[key]) for result, key in (('hit', 'hits'), ('negative_hit', 'negative_hits'), ('miss', 'misses'))
+        ]
+        yield 'bank_user_cache_removals_total', 'counter', 'User cache entries expired, evicted or invalidated.', [
+            ({'reason': reason}, users[key]) for reason, key in (('expired', 'expirations'), ('evicted', 'evictions'), ('invalidated', 'invalidations'))
+        ]
+        yield 'bank_user_cache_entries', 'gauge', 'Keys (user ids and emails) in the user cache.', [({}, users['entries'])]
+
+    yield 'bank_log_records_dropped_total', 'counter', 'Request log records dropped because the log queue was full.', [
+        ({}, txn_log_handler.dropped)
+    ]
+
+metrics.add_collector(collect_component_metrics)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), status=200, mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/register', methods=['POST'])
 def register():
     data = request.get_json()
@@ -276,15 +829,15 @@ def register():
     cursor = conn.cursor()
 
     try:
-        # Make sure the users table exists before querying/insert
-        ensure_users_table(conn)
+        # Make sure the schema exists before querying/insert
+        ensure_schema(conn)
 
         # Check if email or account number already exists
         cursor.execute("SELECT * FROM users WHERE email = %s OR account_number = %s", (email, account_number))
         if cursor.fetchone():
             return jsonify({'message': 'Email or account number already exists'}), 409
 
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        hashed_password = password_hasher.hash_password(password)
         # Generate UUID and ensure it's properly formatted as a string
         user_id = str(uuid.uuid4())
         
@@ -295,8 +848,14 @@ def register():
             "INSERT INTO users (user_id, full_name, account_number, email, password_hash) VALUES (%s, %s, %s, %s, %s)",
             (user_id, full_name, account_number, email, hashed_password)
         )
+        increment_counter(cursor, 'users')
         conn.commit()
+        if user_cache is not None:
+            # Drop the negative entries a login or transfer for this user may have left
+            user_cache.invalidate(user_id=user_id, email=email)
         return jsonify({'message': 'User registered successfully', 'user_id': user_id}), 201
+    except HashingBusy:
+        return jsonify({'message': 'Server busy, please retry shortly'}), 503
     except mysql.connector.Error as err:
         conn.rollback()
         print(f"Error during registration: {err}")
@@ -314,34 +873,45 @@ def login():
     if not all([email, password]):
         return jsonify({'message': 'Missing email or password'}), 400
 
+    hit, user = user_cache.lookup('email', email) if user_cache is not None else (False, None)
+    if hit and (user is None or not password_hasher.needs_rehash(user['password_hash'])):
+        # Cached row (or cached miss): no connection needed unless the hash has to be upgraded
+        try:
+            if user and password_hasher.check_password(password, user['password_hash']):
+                return jsonify(login_payload(user)), 200
+            return jsonify({'message': 'Invalid credentials'}), 401
+        except HashingBusy:
+            return jsonify({'message': 'Server busy, please retry shortly'}), 503
+
     conn = get_db_connection()
     if conn is None:
         return jsonify({'message': 'Database connection error'}), 500
     cursor = conn.cursor(dictionary=True)
 
     try:
-        cursor.execute("SELECT user_id, password_hash, full_name, account_number, email FROM users WHERE email = %s", (email,))
-        user = cursor.fetchone()
+        if not hit:
+            user = load_user(cursor, 'email', email)
 
-        def safe_check_password(plain: str, hashed: str) -> bool:
-            try:
-                return bcrypt.checkpw(plain.encode('utf-8'), hashed.encode('utf-8'))
-            except (ValueError, TypeError):
-                return False
-
-        if user and safe_check_password(password, user['password_hash']):
+        if user and password_hasher.check_password(password, user['password_hash']):
+            # Upgrade hashes made with a lower work factor while the plain password is at hand
+            if password_hasher.needs_rehash(user['password_hash']):
+                try:
+                    cursor.execute(
+                        "UPDATE users SET password_hash = %s WHERE user_id = %s AND password_hash = %s",
+                        (password_hasher.hash_password(password), user['user_id'], user['password_hash'])
+                    )
+                    conn.commit()
+                    if user_cache is not None:
+                        user_cache.invalidate(user_id=user['user_id'], email=user['email'])
+                except (HashingBusy, mysql.connector.Error) as e:
+                    conn.rollback()
+                    print(f"Skipping password rehash for {user['user_id']}: {e}")
             # In a real application, you'd generate a JWT here
-            return jsonify({
-                'message': 'Login successful',
-                'user': {
-                    'user_id': user['user_id'],
-                    'full_name': user['full_name'],
-                    'account_number': user['account_number'],
-                    'email': user['email']
-                }
-            }), 200
+            return jsonify(login_payload(user)), 200
         else:
             return jsonify({'message': 'Invalid credentials'}), 401
+    except HashingBusy:
+        return jsonify({'message': 'Server busy, please retry shortly'}), 503
     except mysql.connector.Error as err:
         print(f"Error during login: {err}")
         return jsonify({'message': f'Database error: {err}'}), 500
@@ -364,122 +934,87 @@ def create_transaction():
 
     if not all([sender_user_id, receiver_account_number, amount, currency, channel, authorization_method]):
         return jsonify({'message': 'Missing required transaction fields'}), 400
+    amount = parse_amount(amount)
+    if amount is None:
+        return jsonify({'message': 'Invalid transaction amount'}), 400
 
     # Placeholder for IP address and device fingerprint - in a real app, these would be extracted from the request
     ip_address = request.remote_addr if request.remote_addr else "127.0.0.1"
     device_fingerprint = request.headers.get('X-Device-Fingerprint', str(uuid.uuid4()))
 
+    # Senders recently found not to exist are turned away without a connection
+    if user_cache is not None and user_cache.is_missing('user_id', sender_user_id):
+        return jsonify({'error': 'Sender not found.'}), 404
+
     conn = get_db_connection()
     if conn is None:
         return jsonify({'message': 'Database connection error'}), 500
     # Ensure table and schema are present before using
     try:
-        ensure_transactions_table(conn)
-        ensure_transactions_schema(conn)
+        ensure_schema(conn)
     except Exception as e:
+        conn.close()
         return jsonify({'message': f'Database schema error: {e}'}), 500
 
-    derived_fields, status_code = generate_derived_fields_and_validate(
-        sender_user_id, receiver_account_number, amount, currency, ip_address, device_fingerprint, conn
-    )
+    # Set once the group-commit path has handed the connection back to the pool
+    released = False
+    try:
+        derived_fields, status_code = generate_derived_fields_and_validate(
+            sender_user_id, receiver_account_number, amount, currency, ip_address, device_fingerprint, conn
+        )
 
-    if status_code != 200:
-        conn.close()
-        return jsonify(derived_fields), status_code # derived_fields here contains the error message
-
-    txn_id = derived_fields['txn_id']
-    timestamp = derived_fields['timestamp']
-    txn_hour = derived_fields['txn_hour']
-    txn_day_of_week = derived_fields['txn_day_of_week']
-    ip_address = derived_fields['ip_address']
-    device_fingerprint = derived_fields['device_fingerprint']
-    is_new_payee = derived_fields['is_new_payee']
-    is_international = derived_fields['is_international']
-    txn_count_last_24h = derived_fields['txn_count_last_24h']
-    sum_amount_last_24h = derived_fields['sum_amount_last_24h']
-
-    is_fraud = False # Default to not fraud
-    transaction_status = 'Success' # Default status
-    fraud_prediction_message = "Transaction successful."
+        if status_code != 200:
+            return jsonify(derived_fields), status_code # derived_fields here contains the error message
 
-    try:
-        if fraud_model and encoders and scaler:
+        txn_id = derived_fields['txn_id']
+        timestamp = derived_fields['timestamp']
+        txn_hour = derived_fields['txn_hour']
+        txn_day_of_week = derived_fields['txn_day_of_week']
+        ip_address = derived_fields['ip_address']
+        device_fingerprint = derived_fields['device_fingerprint']
+        is_new_payee = derived_fields['is_new_payee']
+        is_international = derived_fields['is_international']
+        txn_count_last_24h = derived_fields['txn_count_last_24h']
+        sum_amount_last_24h = derived_fields['sum_amount_last_24h']
+
+        is_fraud = False # Default to not fraud
+        transaction_status = 'Success' # Default status
+        fraud_prediction_message = "Transaction successful."
+
+        model = active_model
+        model_version = None
+        fraud_probability = None
+
+        if model.ready:
             # Prepare base features for the fraud model (ensure correct types)
-            base = {
-                'amount': float(amount),
-                'currency': str(currency),
-                'channel': str(channel),
-                'authorization_method': str(authorization_method),
-                'txn_hour': int(txn_hour),
-                'txn_day_of_week': int(txn_day_of_week),
-                'is_new_payee': int(bool(is_new_payee)),
-                'is_international': int(bool(is_international)),
-                'txn_count_last_24h': int(txn_count_last_24h),
-                'sum_amount_last_24h': float(sum_amount_last_24h or 0)
-            }
-
-            features = pd.DataFrame([base])
-
-            # Apply encoders with type-aware handling only for categorical inputs
-            categorical_cols = {'currency', 'channel', 'authorization_method'}
-            for column, encoder in encoders.items():
-                if column not in features.columns or column not in categorical_cols:
-                    continue
+            base = build_model_base(amount, currency, channel, authorization_method, derived_fields)
 
-                # Handle unseen labels by mapping to first known category/class
-                safe_series = features[column].astype(str)
-                if hasattr(encoder, 'categories_'):
-                    # OneHotEncoder path
-                    cats = [str(c) for c in encoder.categories_[0]]
-                    safe_series = safe_series.apply(lambda x: x if x in cats else cats[0])
-                    encoded = encoder.transform(safe_series.values.reshape(-1, 1))
-                    encoded = encoded.toarray() if hasattr(encoded, 'toarray') else np.asarray(encoded)
-                    col_names = [f"{column}_{cat}" for cat in cats]
-                    encoded_df = pd.DataFrame(encoded, columns=col_names)
-                    features = pd.concat([features.drop(columns=[column]), encoded_df], axis=1)
-                elif hasattr(encoder, 'classes_'):
-                    # LabelEncoder path (expects 1D array)
-                    classes = [str(c) for c in encoder.classes_]
-                    safe_series = safe_series.apply(lambda x: x if x in classes else classes[0])
-                    encoded = encoder.transform(safe_series.values)
-                    features[f"{column}_label"] = encoded
-                    features = features.drop(columns=[column])
-                else:
-                    # Unknown encoder type, skip transformation
-                    pass
-
-            # Scale features according to scaler's fitted feature names
-            scale_cols = list(getattr(scaler, 'feature_names_in_', []))
-            if scale_cols:
-                # Ensure all expected scaler columns exist; fill missing with 0
-                for col in scale_cols:
-                    if col not in features.columns:
-                        features[col] = 0
-                scaled_values = scaler.transform(features[scale_cols])
-                features[scale_cols] = scaled_values
+            if model.feature_plan is not None:
+                with stage_seconds.time('encode'):
+                    work = model.feature_plan.encode_many([base])
+                with stage_seconds.time('scale'):
+                    features = model.feature_plan.scale_align(work)
             else:
-                # Fallback: scale known numeric columns including time-based ones
-                numerical_cols = [c for c in ['amount', 'txn_count_last_24h', 'sum_amount_last_24h', 'txn_hour', 'txn_day_of_week'] if c in features.columns]
-                if numerical_cols:
-                    features[numerical_cols] = scaler.transform(features[numerical_cols])
-
-            # Align columns to model expectations when available
-            expected_cols = getattr(fraud_model, 'feature_names_in_', None)
-            if expected_cols is not None:
-                aligned = pd.DataFrame(columns=expected_cols)
-                for col in expected_cols:
-                    aligned[col] = features[col] if col in features.columns else 0
-                features = aligned
-
-            # Debug logging of feature alignment and values
-            try:
-                print("Model feature_names_in_:", getattr(fraud_model, 'feature_names_in_', None))
-                print("Prediction features columns:", list(features.columns))
-                print("Prediction features row:", features.to_dict(orient='records')[0])
-            except Exception as dbg_e:
-                print("Failed to print prediction debug info:", dbg_e)
+                with stage_seconds.time('features_pandas'):
+                    features = model.build_features_frame(base)
 
-            prediction = fraud_model.predict(features)[0]
+            # Sampled debug dump of feature alignment and values
+            if sample_feature_dump():
+                if model.feature_plan is not None:
+                    feature_columns, feature_row = model.feature_plan.columns, features[0].tolist()
+                else:
+                    feature_columns, feature_row = list(features.columns), features.to_numpy()[0].tolist()
+                txn_log.info(
+                    "Prediction features for txn_id=%s (model %s, feature_names_in_=%s): %s", txn_id, model.version,
+                    list(getattr(model.fraud_model, 'feature_names_in_', [])), dict(zip(feature_columns, feature_row))
+                )
+
+            with stage_seconds.time('predict'):
+                if model.scheduler is not None and model.feature_plan is not None:
+                    prediction, fraud_probability = model.scheduler.predict(features[0])
+                else:
+                    prediction, fraud_probability = model.score_rows(features)[0]
+            model_version = model.version
 
             if prediction == 1:  # Assuming 1 means fraud
                 is_fraud = True
@@ -490,58 +1025,353 @@ def create_transaction():
                 transaction_status = 'Success'
                 fraud_prediction_message = "Transaction successful."
 
-            # Log final outcome to server console
-            try:
-                print(f"Fraud prediction outcome: {'FRAUD' if is_fraud else 'LEGIT'}; status={transaction_status}; txn_id={txn_id}")
-            except Exception:
-                pass
+            txn_log.info("Fraud prediction outcome: %s; status=%s; txn_id=%s", 'FRAUD' if is_fraud else 'LEGIT', transaction_status, txn_id)
         else:
-            print("Fraud model components not loaded. Skipping fraud prediction.")
+            txn_log.warning("Fraud model components not loaded. Skipping fraud prediction.")
             fraud_prediction_message = "Transaction processed without fraud prediction (model not loaded)."
             
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO transactions (txn_id, sender_user_id, receiver_account_number, receiver_name, amount, currency, description, channel, authorization_method, is_international, timestamp, txn_hour, txn_day_of_week, ip_address, device_fingerprint, is_new_payee, txn_count_last_24h, sum_amount_last_24h, is_fraud, status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
-            (
-                txn_id, sender_user_id, receiver_account_number, receiver_name, amount, currency, description, channel,
-                authorization_method, is_international, timestamp, txn_hour, txn_day_of_week, ip_address,
-                device_fingerprint, is_new_payee, txn_count_last_24h, sum_amount_last_24h, is_fraud, transaction_status
-            )
+        row = (
+            txn_id, sender_user_id, receiver_account_number, receiver_name, amount, currency, description, channel,
+            authorization_method, is_international, timestamp, txn_hour, txn_day_of_week, ip_address,
+            device_fingerprint, is_new_payee, txn_count_last_24h, sum_amount_last_24h, is_fraud, transaction_status,
+            model_version, fraud_probability, risk_score(fraud_probability), 'flagged' if is_fraud else None
         )
-        conn.commit()
-        return jsonify({'message': fraud_prediction_message, 'txn_id': txn_id, 'is_fraud': is_fraud, 'status': transaction_status}), 200
+        if transaction_writer is not None:
+            # Give the connection back first: requests holding every pooled connection while they wait
+            # would leave the writer none to commit with
+            conn.close()
+            released = True
+            # Returns once the writer has committed the batch holding this row
+            with stage_seconds.time('group_commit'):
+                transaction_writer.write(row)
+        else:
+            cursor = conn.cursor()
+            with stage_seconds.time('insert'):
+                cursor.execute(INSERT_TRANSACTION_SQL, row)
+            with stage_seconds.time('kpi_rollup'):
+                apply_kpi_rollups(cursor, [(timestamp, channel, currency, amount, is_fraud)])
+            with stage_seconds.time('commit'):
+                conn.commit()
+        if velocity_store is not None and transaction_status == 'Success':
+            velocity_store.record(sender_user_id, timestamp, amount, txn_id)
+        if payee_index is not None:
+            payee_index.add(sender_user_id, receiver_account_number)
+        return jsonify({
+            'message': fraud_prediction_message, 'txn_id': txn_id, 'is_fraud': is_fraud, 'status': transaction_status,
+            'risk_score': risk_score(fraud_probability)
+        }), 200
 
     except mysql.connector.Error as err:
-        conn.rollback()
+        if not released:
+            conn.rollback()
         print(f"Error during transaction creation: {err}")
         return jsonify({'message': f'Database error: {err}'}), 500
     except Exception as e:
-        conn.rollback()
+        if not released:
+            conn.rollback()
         print(f"Error during fraud prediction or transaction processing: {e}")
         return jsonify({'message': f'Transaction processing error: {e}'}), 500
+    finally:
+        if not released:
+            conn.close()
+
+@app.route('/api/transactions/batch', methods=['POST'])
+def create_transactions_batch():
+    data = request.get_json(silent=True)
+    items = data.get('transactions') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({'message': 'Expected a non-empty list of transactions'}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({'message': f'Batch too large: Max {MAX_BATCH_SIZE} transactions per batch.'}), 413
+
+    ip_address = request.remote_addr if request.remote_addr else "127.0.0.1"
+    batch_fingerprint = request.headers.get('X-Device-Fingerprint')
+
+    results = [None] * len(items)
+    pending = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = {'index': index, 'error': 'Invalid transaction payload', 'code': 400}
+            continue
+        txn = {
+            'index': index,
+            'user_id': item.get('user_id'),
+            'receiver_account_number': item.get('receiver_account_number'),
+            'receiver_name': item.get('receiver_name'),
+            'amount': item.get('amount'),
+            'currency': item.get('currency'),
+            'description': item.get('description'),
+            'channel': item.get('send_via'),
+            'authorization_method': item.get('authorization_method'),
+            'device_fingerprint': batch_fingerprint or str(uuid.uuid4())
+        }
+        if not all([txn['user_id'], txn['receiver_account_number'], txn['amount'], txn['currency'], txn['channel'], txn['authorization_method']]):
+            results[index] = {'index': index, 'error': 'Missing required transaction fields', 'code': 400}
+            continue
+        txn['amount'] = parse_amount(txn['amount'])
+        if txn['amount'] is None:
+            results[index] = {'index': index, 'error': 'Invalid transaction amount', 'code': 400}
+            continue
+        pending.append(txn)
+
+    if not pending:
+        return jsonify({'results': results}), 200
+
+    conn = get_db_connection()
+    if conn is None:
+        return jsonify({'message': 'Database connection error'}), 500
+    try:
+        ensure_schema(conn)
+    except Exception as e:
+        conn.close()
+        return jsonify({'message': f'Database schema error: {e}'}), 500
+
+    model = active_model
+    model_ready = model.ready
+    current_time = datetime.now()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        sender_ids = sorted({txn['user_id'] for txn in pending})
+        receivers = sorted({txn['receiver_account_number'] for txn in pending})
+        accounts, velocity, payees = fetch_batch_sender_state(
+            cursor, sender_ids, receivers, current_time - timedelta(hours=24)
+        )
+        cursor.close()
+
+        # Committed per-sender state: (24h success count, 24h success sum, known payees)
+        state = {}
+        for sender in sender_ids:
+            count, total = velocity.get(sender, (0, Decimal('0')))
+            state[sender] = [count, total, set(payees.get(sender, ()))]
+
+        for txn in pending:
+            if txn['user_id'] not in accounts:
+                results[txn['index']] = {'index': txn['index'], 'error': 'Sender not found.', 'code': 404}
+        pending = [txn for txn in pending if txn['user_id'] in accounts]
+
+        # Items are decided in submission order, as if posted one by one. Each round scores every
+        # undecided item assuming earlier items from the same sender succeed, then keeps decisions
+        # up to and including each sender's first fraud flag; later items of that sender are
+        # re-derived next round since the flagged transfer no longer counts toward the 24h totals.
+        rows = []
+        while pending:
+            tentative = {sender: [st[0], st[1], set(st[2])] for sender, st in state.items()}
+            candidates = []
+            for txn in pending:
+                count, total, known = tentative[txn['user_id']]
+                if count >= MAX_TXNS_PER_DAY:
+                    candidates.append((txn, None, {'error': f'Transaction limit exceeded: Max {MAX_TXNS_PER_DAY} transactions per day.', 'code': 403}))
+                    continue
+                if txn['amount'] > MAX_TXN_AMOUNT:
+                    candidates.append((txn, None, {'error': f'Transaction amount limit exceeded: Max {int(MAX_TXN_AMOUNT):,}.', 'code': 403}))
+                    continue
+                derived = {
+                    'txn_id': str(uuid.uuid4()),
+                    'timestamp': current_time,
+                    'txn_hour': current_time.hour,
+                    'txn_day_of_week': current_time.weekday(),
+                    'is_new_payee': txn['receiver_account_number'] not in known,
+                    'is_international': txn['currency'].upper() != 'USD',
+                    'txn_count_last_24h': count,
+                    'sum_amount_last_24h': float(total)
+                }
+                tentative[txn['user_id']][0] += 1
+                tentative[txn['user_id']][1] += db_amount(txn['amount'])
+                known.add(txn['receiver_account_number'])
+                candidates.append((txn, derived, None))
+
+            scored = [(txn, derived) for txn, derived, _ in candidates if derived is not None]
+            if model_ready and scored:
+                with stage_seconds.time('batch_predict'):
+                    predictions, probabilities = model.score([
+                        build_model_base(txn['amount'], txn['currency'], txn['channel'], txn['authorization_method'], derived)
+                        for txn, derived in scored
+                    ])
+                predictions = iter(zip(predictions, probabilities or [None] * len(predictions)))
+            else:
+                predictions = iter([(0, None)] * len(scored))
+
+            blocked = set()
+            next_pending = []
+            for txn, derived, rejection in candidates:
+                prediction, probability = next(predictions) if derived is not None else (None, None)
+                sender = txn['user_id']
+                if sender in blocked:
+                    next_pending.append(txn)
+                    continue
+                if rejection is not None:
+                    results[txn['index']] = dict(rejection, index=txn['index'])
+                    continue
+
+                is_fraud = prediction == 1
+                transaction_status = 'Failed' if is_fraud else 'Success'
+                if is_fraud:
+                    blocked.add(sender)
+                else:
+                    state[sender][0] += 1
+                    state[sender][1] += db_amount(txn['amount'])
+                state[sender][2].add(txn['receiver_account_number'])
+
+                rows.append((txn['index'], (
+                    derived['txn_id'], sender, txn['receiver_account_number'], txn['receiver_name'], txn['amount'],
+                    txn['currency'], txn['description'], txn['channel'], txn['authorization_method'],
+                    derived['is_international'], derived['timestamp'], derived['txn_hour'], derived['txn_day_of_week'],
+                    ip_address, txn['device_fingerprint'], derived['is_new_payee'], derived['txn_count_last_24h'],
+                    derived['sum_amount_last_24h'], is_fraud, transaction_status,
+                    model.version if model_ready else None, probability, risk_score(probability),
+                    'flagged' if is_fraud else None
+                )))
+                if not model_ready:
+                    message = "Transaction processed without fraud prediction (model not loaded)."
+                elif is_fraud:
+                    message = "Transaction flagged as fraud and blocked."
+                else:
+                    message = "Transaction successful."
+                results[txn['index']] = {
+                    'index': txn['index'], 'message': message, 'txn_id': derived['txn_id'],
+                    'is_fraud': is_fraud, 'status': transaction_status, 'risk_score': risk_score(probability)
+                }
+            pending = next_pending
+
+        if rows:
+            cursor = conn.cursor()
+            rows = [row for _, row in sorted(rows, key=lambda r: r[0])]
+            with stage_seconds.time('batch_insert'):
+                cursor.executemany(INSERT_TRANSACTION_SQL, rows)
+            with stage_seconds.time('kpi_rollup'):
+                apply_kpi_rollups(cursor, [(row[10], row[7], row[5], row[4], row[18]) for row in rows])
+            with stage_seconds.time('commit'):
+                conn.commit()
+            cursor.close()
+            for row in rows:
+                if velocity_store is not None and row[19] == 'Success':
+                    velocity_store.record(row[1], row[10], row[4], row[0])
+                if payee_index is not None:
+                    payee_index.add(row[1], row[2])
+        return jsonify({'results': results}), 200
+
+    except mysql.connector.Error as err:
+        conn.rollback()
+        print(f"Error during batch transaction creation: {err}")
+        return jsonify({'message': f'Database error: {err}'}), 500
+    except Exception as e:
+        conn.rollback()
+        print(f"Error during batch fraud prediction or transaction processing: {e}")
+        return jsonify({'message': f'Transaction processing error: {e}'}), 500
     finally:
         conn.close()
 
+HISTORY_COLUMNS = "txn_id, receiver_account_number, receiver_name, amount, currency, description, channel, authorization_method, is_international, timestamp, is_fraud, status"
+
+def encode_history_cursor(row):
+    payload = json.dumps([row['timestamp'].isoformat(), row['txn_id']])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def decode_history_cursor(value):
+    timestamp, txn_id = json.loads(base64.urlsafe_b64decode(value.encode('ascii')).decode('utf-8'))
+    return datetime.fromisoformat(timestamp), str(txn_id)
+
 @app.route('/api/transactions/<string:user_id>', methods=['GET'])
 def get_transactions(user_id):
+    # ?limit=N[&cursor=...] returns one keyset page; without limit the full history is streamed as a JSON array
+    limit = request.args.get('limit')
+    page_cursor = request.args.get('cursor')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            return jsonify({'message': 'limit must be an integer'}), 400
+        limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+    after = None
+    if page_cursor:
+        try:
+            after = decode_history_cursor(page_cursor)
+        except (ValueError, TypeError):
+            return jsonify({'message': 'Invalid cursor'}), 400
+
     conn = get_db_connection()
     if conn is None:
         return jsonify({'message': 'Database connection error'}), 500
-    cursor = conn.cursor(dictionary=True)
 
+    sql = f"SELECT {HISTORY_COLUMNS} FROM transactions WHERE sender_user_id = %s"
+    params = [user_id]
+    if after is not None:
+        sql += " AND (timestamp < %s OR (timestamp = %s AND txn_id < %s))"
+        params += [after[0], after[0], after[1]]
+    sql += " ORDER BY timestamp DESC, txn_id DESC"
+
+    if limit is not None:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            # Fetch one extra row to know whether another page exists
+            cursor.execute(sql + " LIMIT %s", tuple(params + [limit + 1]))
+            transactions = cursor.fetchall()
+            next_cursor = None
+            if len(transactions) > limit:
+                transactions = transactions[:limit]
+                next_cursor = encode_history_cursor(transactions[-1])
+            return jsonify({'transactions': transactions, 'next_cursor': next_cursor}), 200
+        except mysql.connector.Error as err:
+            print(f"Error fetching transactions: {err}")
+            return jsonify({'message': f'Database error: {err}'}), 500
+        finally:
+            cursor.close()
+            conn.close()
+
+    # Unbuffered cursor: rows are read from the server in chunks as the response is written
+    cursor = conn.cursor(dictionary=True, buffered=False)
     try:
-        cursor.execute(
-            "SELECT txn_id, receiver_account_number, receiver_name, amount, currency, description, channel, authorization_method, is_international, timestamp, is_fraud, status FROM transactions WHERE sender_user_id = %s ORDER BY timestamp DESC",
-            (user_id,)
-        )
-        transactions = cursor.fetchall()
-        return jsonify(transactions), 200
+        cursor.execute(sql, tuple(params))
     except mysql.connector.Error as err:
         print(f"Error fetching transactions: {err}")
-        return jsonify({'message': f'Database error: {err}'}), 500
-    finally:
         cursor.close()
         conn.close()
+        return jsonify({'message': f'Database error: {err}'}), 500
+
+    def release():
+        # Called from the generator once the last chunk is out and again when the response closes;
+        # the second call is what runs for HEAD requests, where the generator never starts
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        conn.close()
+
+    def generate():
+        try:
+            yield '['
+            first = True
+            while True:
+                rows = cursor.fetchmany(HISTORY_STREAM_CHUNK)
+                if not rows:
+                    break
+                chunk = ','.join(app.json.dumps(row) for row in rows)
+                yield chunk if first else ',' + chunk
+                first = False
+            yield ']'
+        except mysql.connector.Error as err:
+            print(f"Error streaming transactions: {err}")
+            raise
+        finally:
+            release()
+
+    response = Response(stream_with_context(generate()), status=200, mimetype='application/json')
+    response.call_on_close(release)
+    return response
+
+# Fork the hashing workers before any request or background threads exist
+password_hasher.start()
+start_txn_log()
+
+if RUN_MIGRATIONS_ON_STARTUP:
+    migrate_on_startup()
+
+if velocity_store is not None:
+    last_velocity_warm = time.monotonic()
+    warm_velocity_store()
+
+if MODEL_WATCH:
+    threading.Thread(target=watch_model_dir, name='model-watch', daemon=True).start()
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
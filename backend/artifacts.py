@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import pickle
+import sys
+import time
+from joblib import dump as joblib_dump, load as joblib_load
+
+try:
+    import fcntl
+except ImportError:  # Windows: conversion runs without the cross-process lock
+    fcntl = None
+
+ARTIFACT_NAMES = ('fraud_model', 'encoders', 'scaler')
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+
+def try_load_model(path: str):
+    try:
+        return joblib_load(path)
+    except Exception as e1:
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e2:
+            print(f"Failed to load {os.path.basename(path)} via joblib ({e1}) and pickle ({e2})")
+            return None
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def resident_bytes():
+    # Current process RSS from /proc; None where it is not available
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def read_manifest(model_dir):
+    try:
+        with open(os.path.join(model_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        return manifest if manifest.get('version') == MANIFEST_VERSION else {'version': MANIFEST_VERSION, 'artifacts': {}}
+    except (OSError, ValueError):
+        return {'version': MANIFEST_VERSION, 'artifacts': {}}
+
+
+def write_atomic(path, write):
+    tmp = f"{path}.tmp.{os.getpid()}"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def convert_artifacts(model_dir, names=ARTIFACT_NAMES, force=False):
+    """Re-save each <name>.pkl as an uncompressed <name>.joblib whose NumPy arrays can be memory-mapped.
+
+    Note that sklearn's Tree copies its node arrays into its own buffers on
+    unpickling, so fitted trees are not shared this way; load the app before
+    forking workers (gunicorn --preload) to share them copy-on-write.
+
+    The manifest records the sha256 of every source and converted file. An
+    artifact is only converted again when its source checksum changes (or with
+    force=True). Returns the manifest.
+    """
+    lock = open(os.path.join(model_dir, '.convert.lock'), 'w')
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        manifest = read_manifest(model_dir)
+        changed = False
+        for name in names:
+            source = os.path.join(model_dir, f"{name}.pkl")
+            target = os.path.join(model_dir, f"{name}.joblib")
+            if not os.path.exists(source):
+                continue
+            source_sha = sha256_file(source)
+            entry = manifest['artifacts'].get(name)
+            if not force and entry and entry.get('source_sha256') == source_sha and os.path.exists(target):
+                continue
+            obj = try_load_model(source)
+            if obj is None:
+                continue
+            write_atomic(target, lambda tmp: joblib_dump(obj, tmp))
+            manifest['artifacts'][name] = {
+                'source': os.path.basename(source),
+                'source_sha256': source_sha,
+                'file': os.path.basename(target),
+                'sha256': sha256_file(target),
+                'bytes': os.path.getsize(target)
+            }
+            changed = True
+            print(f"Converted {os.path.basename(source)} -> {os.path.basename(target)}")
+        if changed:
+            def write_manifest(tmp):
+                with open(tmp, 'w') as f:
+                    json.dump(manifest, f, indent=2, sort_keys=True)
+            write_atomic(os.path.join(model_dir, MANIFEST_NAME), write_manifest)
+        return manifest
+    finally:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+        lock.close()
+
+
+def load_artifacts(model_dir, names=ARTIFACT_NAMES, mmap=True):
+    """Load model artifacts, memory-mapping converted copies when their checksums match.
+
+    Returns (artifacts, report): artifacts maps name -> object (None when loading
+    failed) and report maps name -> how it was loaded, load time and RSS growth.
+    Any artifact without a valid converted copy is loaded from its .pkl.
+    """
+    manifest = {'artifacts': {}}
+    if mmap:
+        try:
+            manifest = convert_artifacts(model_dir, names)
+        except Exception as e:
+            print(f"Artifact conversion failed, loading pickles directly: {e}")
+
+    artifacts, report = {}, {}
+    for name in names:
+        started = time.perf_counter()
+        rss_before = resident_bytes()
+        entry = manifest['artifacts'].get(name)
+        source = os.path.join(model_dir, f"{name}.pkl")
+        target = os.path.join(model_dir, f"{name}.joblib")
+        obj, mode = None, 'pickle'
+        if mmap and entry:
+            try:
+                if not os.path.exists(source) or sha256_file(source) != entry['source_sha256']:
+                    # The pickle changed but could not be converted; never serve the stale copy
+                    entry = None
+                elif sha256_file(target) != entry['sha256']:
+                    print(f"Checksum mismatch for {os.path.basename(target)}; loading pickle instead.")
+                else:
+                    obj, mode = joblib_load(target, mmap_mode='r'), 'mmap'
+            except Exception as e:
+                print(f"Failed to memory-map {os.path.basename(target)} ({e}); loading pickle instead.")
+        if obj is None:
+            obj = try_load_model(source) if os.path.exists(source) else None
+        rss_after = resident_bytes()
+        artifacts[name] = obj
+        report[name] = {
+            'mode': mode if obj is not None else 'failed',
+            'seconds': round(time.perf_counter() - started, 4),
+            'rss_delta_bytes': (rss_after - rss_before) if rss_before is not None and rss_after is not None else None,
+            'mapped_bytes': entry['bytes'] if mode == 'mmap' else 0
+        }
+    return artifacts, report
+
+
+if __name__ == '__main__':
+    # python artifacts.py [model_dir] [--force]
+    args = [a for a in sys.argv[1:] if a != '--force']
+    directory = args[0] if args else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model')
+    print(json.dumps(convert_artifacts(directory, force='--force' in sys.argv), indent=2, sort_keys=True))
@@ -0,0 +1,556 @@
+"""ASGI entry point: the user-facing routes on asyncio with an async MySQL pool.
+
+    uvicorn asgi_app:application --port 5000
+
+Serves /api/register, /api/login, POST /api/transactions and the transaction
+history with the same request and response shapes as the Flask routes in
+app.py, and shares that module's configuration, model bundle, velocity store,
+payee index and bcrypt pool (importing app sets them up). Database calls go
+through aiomysql, so a request waiting on MySQL holds no thread; bcrypt and
+model scoring run on a small thread pool and the event loop only awaits them.
+Inserts always commit on the request's own connection (GROUP_COMMIT applies to
+the Flask path), and history without ?limit streams keyset chunks rather than
+holding an unbuffered cursor open for the whole response.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs
+
+import aiomysql
+import mysql.connector
+
+import app as flask_backend
+from feature_plan import build_model_base
+from hashing import HashingBusy
+from kpi_rollups import INCREMENT_COUNTER_SQL, UPSERT_ROLLUP_SQL, rollup_rows
+from model_bundle import risk_score
+
+# Async connection pool sizing (override via env vars)
+ASYNC_DB_POOL_MIN = int(os.getenv('ASYNC_DB_POOL_MIN', '1'))
+ASYNC_DB_POOL_MAX = int(os.getenv('ASYNC_DB_POOL_MAX', '50'))
+# Threads for blocking work: waiting on the bcrypt processes and building features / scoring
+ASYNC_BLOCKING_WORKERS = int(os.getenv('ASYNC_BLOCKING_WORKERS', '8'))
+
+# aiomysql raises PyMySQL errors; the migrations and the bench fakes raise mysql.connector ones
+DB_ERRORS = (aiomysql.Error, mysql.connector.Error)
+
+CORS_HEADERS = [(b'access-control-allow-origin', b'*')]
+
+db_pool = None
+db_pool_lock = asyncio.Lock()
+last_db_error = None
+blocking = ThreadPoolExecutor(max_workers=ASYNC_BLOCKING_WORKERS, thread_name_prefix='asgi-blocking')
+
+
+async def run_blocking(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(blocking, fn, *args)
+
+
+async def create_db_pool():
+    config = flask_backend.db_config
+    # autocommit: reads leave no transaction open; writes start one explicitly with conn.begin()
+    return await aiomysql.create_pool(
+        host=config['host'], user=config['user'], password=config['password'], db=config['database'],
+        minsize=ASYNC_DB_POOL_MIN, maxsize=ASYNC_DB_POOL_MAX, autocommit=True, cursorclass=aiomysql.DictCursor
+    )
+
+
+async def get_db_pool():
+    # The pool is created on first use and after a failed attempt, so the app starts even while MySQL is down
+    global db_pool, last_db_error
+    if db_pool is not None:
+        return db_pool
+    async with db_pool_lock:
+        if db_pool is None:
+            try:
+                db_pool = await create_db_pool()
+            except Exception as err:
+                last_db_error = str(err)
+                print(f"Error connecting to database: {err}")
+    return db_pool
+
+
+class Request:
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = {k: v[-1] for k, v in parse_qs(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True).items()}
+        self.headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+        self.remote_addr = (scope.get('client') or (None,))[0]
+        self.body = body
+
+    def get_json(self):
+        try:
+            data = json.loads(self.body) if self.body else None
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def send_response(send, status, body, content_type=b'application/json'):
+    await send({
+        'type': 'http.response.start', 'status': status,
+        'headers': [(b'content-type', content_type), (b'content-length', str(len(body)).encode('ascii'))] + CORS_HEADERS
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def dumps(payload):
+    # Flask's JSON provider, so dates and decimals serialize exactly as the Flask routes return them
+    return flask_backend.app.json.dumps(payload)
+
+
+async def register(request, send):
+    data = request.get_json()
+    if data is None:
+        return {'message': 'Invalid JSON body'}, 400
+    full_name = data.get('full_name')
+    account_number = data.get('account_number')
+    email = data.get('email')
+    password = data.get('password')
+
+    if not all([full_name, account_number, email, password]):
+        return {'message': 'Missing required fields'}, 400
+
+    pool = await get_db_pool()
+    if pool is None:
+        return {'message': 'Database connection error', 'details': last_db_error}, 500
+
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            try:
+                await cursor.execute("SELECT user_id FROM users WHERE email = %s OR account_number = %s", (email, account_number))
+                if await cursor.fetchone():
+                    return {'message': 'Email or account number already exists'}, 409
+
+                # Hash before opening the transaction so no locks are held while bcrypt runs
+                hashed_password = await run_blocking(flask_backend.password_hasher.hash_password, password)
+                user_id = str(uuid.uuid4())
+                await conn.begin()
+                await cursor.execute(
+                    "INSERT INTO users (user_id, full_name, account_number, email, password_hash) VALUES (%s, %s, %s, %s, %s)",
+                    (user_id, full_name, account_number, email, hashed_password)
+                )
+                await cursor.execute(INCREMENT_COUNTER_SQL, ('users', 1))
+                await conn.commit()
+                if flask_backend.user_cache is not None:
+                    flask_backend.user_cache.invalidate(user_id=user_id, email=email)
+                return {'message': 'User registered successfully', 'user_id': user_id}, 201
+            except HashingBusy:
+                return {'message': 'Server busy, please retry shortly'}, 503
+            except DB_ERRORS as err:
+                await conn.rollback()
+                print(f"Error during registration: {err}")
+                return {'message': f'Database error: {err}'}, 500
+
+
+async def login(request, send):
+    data = request.get_json()
+    if data is None:
+        return {'message': 'Invalid JSON body'}, 400
+    email = data.get('email')
+    password = data.get('password')
+
+    if not all([email, password]):
+        return {'message': 'Missing email or password'}, 400
+
+    hasher = flask_backend.password_hasher
+    user_cache = flask_backend.user_cache
+    hit, user = user_cache.lookup('email', email) if user_cache is not None else (False, None)
+    if hit and (user is None or not hasher.needs_rehash(user['password_hash'])):
+        # Cached row (or cached miss): no connection needed unless the hash has to be upgraded
+        try:
+            if user and await run_blocking(hasher.check_password, password, user['password_hash']):
+                return flask_backend.login_payload(user), 200
+            return {'message': 'Invalid credentials'}, 401
+        except HashingBusy:
+            return {'message': 'Server busy, please retry shortly'}, 503
+
+    pool = await get_db_pool()
+    if pool is None:
+        return {'message': 'Database connection error'}, 500
+
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            try:
+                if not hit:
+                    user = await load_user(cursor, 'email', email)
+                if not user or not await run_blocking(hasher.check_password, password, user['password_hash']):
+                    return {'message': 'Invalid credentials'}, 401
+
+                # Upgrade hashes made with a lower work factor while the plain password is at hand
+                if hasher.needs_rehash(user['password_hash']):
+                    try:
+                        rehashed = await run_blocking(hasher.hash_password, password)
+                        await cursor.execute(
+                            "UPDATE users SET password_hash = %s WHERE user_id = %s AND password_hash = %s",
+                            (rehashed, user['user_id'], user['password_hash'])
+                        )
+                        if user_cache is not None:
+                            user_cache.invalidate(user_id=user['user_id'], email=user['email'])
+                    except (HashingBusy, *DB_ERRORS) as e:
+                        print(f"Skipping password rehash for {user['user_id']}: {e}")
+                return flask_backend.login_payload(user), 200
+            except HashingBusy:
+                return {'message': 'Server busy, please retry shortly'}, 503
+            except DB_ERRORS as err:
+                print(f"Error during login: {err}")
+                return {'message': f'Database error: {err}'}, 500
+
+
+async def load_user(cursor, field, value):
+    # Async twins of app.load_user / app.find_user, sharing its user cache
+    user_cache = flask_backend.user_cache
+    started = user_cache.now() if user_cache is not None else None
+    await cursor.execute(f"SELECT {flask_backend.USER_COLUMNS} FROM users WHERE {field} = %s", (value,))
+    user = await cursor.fetchone()
+    if user_cache is not None:
+        user_cache.store(field, value, user, started)
+    return user
+
+
+async def find_user(cursor, field, value):
+    if flask_backend.user_cache is not None:
+        hit, user = flask_backend.user_cache.lookup(field, value)
+        if hit:
+            return user
+    return await load_user(cursor, field, value)
+
+
+async def check_new_payee(cursor, user_id, receiver_account_number):
+    # Async twin of app.check_new_payee
+    payee_index = flask_backend.payee_index
+    known = None
+    if payee_index is not None:
+        known = payee_index.contains(user_id, receiver_account_number)
+        if known is None and payee_index.begin_load(user_id):
+            try:
+                await cursor.execute("SELECT DISTINCT receiver_account_number FROM transactions WHERE sender_user_id = %s", (user_id,))
+                payee_index.finish_load(user_id, [row['receiver_account_number'] for row in await cursor.fetchall()])
+            except Exception:
+                payee_index.fail_load(user_id)
+                raise
+            known = payee_index.contains(user_id, receiver_account_number)
+        if known:
+            return False
+    await cursor.execute(
+        "SELECT 1 AS found FROM transactions WHERE sender_user_id = %s AND receiver_account_number = %s LIMIT 1",
+        (user_id, receiver_account_number)
+    )
+    found = await cursor.fetchone() is not None
+    if found and known is False:
+        payee_index.learn(user_id, receiver_account_number)
+    return not found
+
+
+async def derive_fields(cursor, user_id, receiver_account_number, amount, currency, ip_address, device_fingerprint):
+    # Async twin of app.generate_derived_fields_and_validate
+    current_time = datetime.now()
+    txn_id = str(uuid.uuid4())
+
+    sender_info = await find_user(cursor, 'user_id', user_id)
+    if not sender_info:
+        return {'error': 'Sender not found.'}, 404
+
+    is_new_payee = await check_new_payee(cursor, user_id, receiver_account_number)
+    is_international = currency.upper() != 'USD'
+
+    velocity_store = flask_backend.velocity_store
+    velocity = velocity_store.lookup(user_id, current_time) if velocity_store is not None else None
+    if velocity is not None:
+        txn_count_last_24h = velocity[0]
+        sum_amount_last_24h = float(velocity[1])
+    else:
+        await cursor.execute(
+            "SELECT COUNT(*) AS cnt, SUM(amount) AS total_amount FROM transactions WHERE sender_user_id = %s AND timestamp >= %s AND status = 'Success'",
+            (user_id, current_time - timedelta(hours=24))
+        )
+        txn_data_24h = await cursor.fetchone() or {}
+        txn_count_last_24h = txn_data_24h.get('cnt') or 0
+        sum_amount_last_24h = float(txn_data_24h.get('total_amount') or 0.0)
+        flask_backend.schedule_velocity_warm()
+
+    return flask_backend.finish_derived_fields(
+        txn_id, current_time, amount, ip_address, device_fingerprint, sender_info['account_number'], is_new_payee,
+        is_international, txn_count_last_24h, sum_amount_last_24h
+    )
+
+
+def score_transaction(model, base):
+    # Runs on the blocking pool: building features and the model call are CPU-bound
+    if model.feature_plan is not None:
+        features = model.feature_plan.transform_many([base])
+    else:
+        with flask_backend.stage_seconds.time('features_pandas'):
+            features = model.build_features_frame(base)
+    with flask_backend.stage_seconds.time('predict'):
+        if model.scheduler is not None and model.feature_plan is not None:
+            return model.scheduler.predict(features[0])
+        return model.score_rows(features)[0]
+
+
+async def create_transaction(request, send):
+    data = request.get_json()
+    if data is None:
+        return {'message': 'Invalid JSON body'}, 400
+
+    sender_user_id = data.get('user_id')
+    receiver_account_number = data.get('receiver_account_number')
+    receiver_name = data.get('receiver_name')
+    amount = data.get('amount')
+    currency = data.get('currency')
+    description = data.get('description')
+    channel = data.get('send_via')
+    authorization_method = data.get('authorization_method')
+
+    if not all([sender_user_id, receiver_account_number, amount, currency, channel, authorization_method]):
+        return {'message': 'Missing required transaction fields'}, 400
+    amount = flask_backend.parse_amount(amount)
+    if amount is None:
+        return {'message': 'Invalid transaction amount'}, 400
+
+    ip_address = request.remote_addr or "127.0.0.1"
+    device_fingerprint = request.headers.get('x-device-fingerprint', str(uuid.uuid4()))
+
+    if flask_backend.user_cache is not None and flask_backend.user_cache.is_missing('user_id', sender_user_id):
+        return {'error': 'Sender not found.'}, 404
+
+    pool = await get_db_pool()
+    if pool is None:
+        return {'message': 'Database connection error'}, 500
+
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            try:
+                derived_fields, status_code = await derive_fields(
+                    cursor, sender_user_id, receiver_account_number, amount, currency, ip_address, device_fingerprint
+                )
+                if status_code != 200:
+                    return derived_fields, status_code
+
+                txn_id = derived_fields['txn_id']
+                timestamp = derived_fields['timestamp']
+                model = flask_backend.active_model
+                model_version = None
+                fraud_probability = None
+                is_fraud = False
+                transaction_status = 'Success'
+                fraud_prediction_message = "Transaction successful."
+
+                if model.ready:
+                    base = build_model_base(amount, currency, channel, authorization_method, derived_fields)
+                    prediction, fraud_probability = await run_blocking(score_transaction, model, base)
+                    model_version = model.version
+                    if prediction == 1:
+                        is_fraud = True
+                        transaction_status = 'Failed'
+                        fraud_prediction_message = "Transaction flagged as fraud and blocked."
+                    flask_backend.txn_log.info(
+                        "Fraud prediction outcome: %s; status=%s; txn_id=%s", 'FRAUD' if is_fraud else 'LEGIT', transaction_status, txn_id
+                    )
+                else:
+                    flask_backend.txn_log.warning("Fraud model components not loaded. Skipping fraud prediction.")
+                    fraud_prediction_message = "Transaction processed without fraud prediction (model not loaded)."
+
+                row = (
+                    txn_id, sender_user_id, receiver_account_number, receiver_name, amount, currency, description, channel,
+                    authorization_method, derived_fields['is_international'], timestamp, derived_fields['txn_hour'],
+                    derived_fields['txn_day_of_week'], derived_fields['ip_address'], derived_fields['device_fingerprint'],
+                    derived_fields['is_new_payee'], derived_fields['txn_count_last_24h'], derived_fields['sum_amount_last_24h'],
+                    is_fraud, transaction_status, model_version, fraud_probability, risk_score(fraud_probability),
+                    'flagged' if is_fraud else None
+                )
+                await conn.begin()
+                await cursor.execute(flask_backend.INSERT_TRANSACTION_SQL, row)
+                await cursor.executemany(UPSERT_ROLLUP_SQL, rollup_rows([(timestamp, channel, currency, amount, is_fraud)]))
+                await conn.commit()
+            except DB_ERRORS as err:
+                await conn.rollback()
+                print(f"Error during transaction creation: {err}")
+                return {'message': f'Database error: {err}'}, 500
+            except Exception as e:
+                await conn.rollback()
+                print(f"Error during fraud prediction or transaction processing: {e}")
+                return {'message': f'Transaction processing error: {e}'}, 500
+
+    velocity_store = flask_backend.velocity_store
+    if velocity_store is not None and transaction_status == 'Success':
+        velocity_store.record(sender_user_id, timestamp, amount, txn_id)
+    if flask_backend.payee_index is not None:
+        flask_backend.payee_index.add(sender_user_id, receiver_account_number)
+    return {
+        'message': fraud_prediction_message, 'txn_id': txn_id, 'is_fraud': is_fraud, 'status': transaction_status,
+        'risk_score': risk_score(fraud_probability)
+    }, 200
+
+
+async def fetch_history_page(pool, user_id, after, limit):
+    sql = f"SELECT {flask_backend.HISTORY_COLUMNS} FROM transactions WHERE sender_user_id = %s"
+    params = [user_id]
+    if after is not None:
+        sql += " AND (timestamp < %s OR (timestamp = %s AND txn_id < %s))"
+        params += [after[0], after[0], after[1]]
+    sql += " ORDER BY timestamp DESC, txn_id DESC LIMIT %s"
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(sql, tuple(params + [limit]))
+            return list(await cursor.fetchall())
+
+
+async def get_transactions(request, send, user_id):
+    # ?limit=N[&cursor=...] returns one keyset page; without limit the full history is streamed as a JSON array
+    limit = request.args.get('limit')
+    page_cursor = request.args.get('cursor')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            return {'message': 'limit must be an integer'}, 400
+        limit = max(1, min(limit, flask_backend.MAX_HISTORY_PAGE_SIZE))
+    after = None
+    if page_cursor:
+        try:
+            after = flask_backend.decode_history_cursor(page_cursor)
+        except (ValueError, TypeError):
+            return {'message': 'Invalid cursor'}, 400
+
+    pool = await get_db_pool()
+    if pool is None:
+        return {'message': 'Database connection error'}, 500
+
+    if limit is not None:
+        try:
+            # Fetch one extra row to know whether another page exists
+            transactions = await fetch_history_page(pool, user_id, after, limit + 1)
+        except DB_ERRORS as err:
+            print(f"Error fetching transactions: {err}")
+            return {'message': f'Database error: {err}'}, 500
+        next_cursor = None
+        if len(transactions) > limit:
+            transactions = transactions[:limit]
+            next_cursor = flask_backend.encode_history_cursor(transactions[-1])
+        return {'transactions': transactions, 'next_cursor': next_cursor}, 200
+
+    # One keyset page per chunk; the connection goes back to the pool between chunks
+    chunk_size = flask_backend.HISTORY_STREAM_CHUNK
+    try:
+        rows = await fetch_history_page(pool, user_id, after, chunk_size)
+    except DB_ERRORS as err:
+        print(f"Error fetching transactions: {err}")
+        return {'message': f'Database error: {err}'}, 500
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [(b'content-type', b'application/json')] + CORS_HEADERS})
+    await send({'type': 'http.response.body', 'body': b'[', 'more_body': True})
+    first = True
+    try:
+        while rows:
+            chunk = ','.join(dumps(row) for row in rows)
+            await send({'type': 'http.response.body', 'body': (chunk if first else ',' + chunk).encode('utf-8'), 'more_body': True})
+            first = False
+            if len(rows) < chunk_size:
+                break
+            rows = await fetch_history_page(pool, user_id, (rows[-1]['timestamp'], rows[-1]['txn_id']), chunk_size)
+    except DB_ERRORS as err:
+        print(f"Error streaming transactions: {err}")
+        raise
+    await send({'type': 'http.response.body', 'body': b']'})
+    return None
+
+
+async def prometheus_metrics(request, send):
+    await send_response(send, 200, flask_backend.metrics.render().encode('utf-8'), b'text/plain; version=0.0.4')
+    return None
+
+
+# (method, path pattern, Flask-style rule used as the metrics label, handler)
+ROUTES = [
+    ('POST', re.compile(r'/api/register'), '/api/register', register),
+    ('POST', re.compile(r'/api/login'), '/api/login', login),
+    ('POST', re.compile(r'/api/transactions'), '/api/transactions', create_transaction),
+    ('GET', re.compile(r'/api/transactions/(?P<user_id>[^/]+)'), '/api/transactions/<string:user_id>', get_transactions),
+    ('GET', re.compile(r'/metrics'), '/metrics', prometheus_metrics),
+]
+
+
+def match_route(method, path):
+    allowed = []
+    for route_method, pattern, rule, handler in ROUTES:
+        match = pattern.fullmatch(path)
+        if match:
+            if route_method == method:
+                return rule, handler, match.groupdict(), allowed
+            allowed.append(route_method)
+    return None, None, None, allowed
+
+
+async def lifespan(receive, send):
+    global db_pool
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Migrations run through the Flask module's synchronous path, once, before serving
+            if not flask_backend.schema_ready:
+                await run_blocking(flask_backend.migrate_on_startup)
+            await get_db_pool()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if db_pool is not None:
+                db_pool.close()
+                await db_pool.wait_closed()
+                db_pool = None
+            blocking.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    started = time.perf_counter()
+    request = Request(scope, await read_body(receive))
+    if request.method == 'OPTIONS':
+        # CORS preflight, answered the way flask_cors does for the Flask app
+        headers = [(b'access-control-allow-methods', b'GET, POST, OPTIONS')] + CORS_HEADERS
+        if 'access-control-request-headers' in request.headers:
+            headers.append((b'access-control-allow-headers', request.headers['access-control-request-headers'].encode('latin-1')))
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    rule, handler, params, allowed = match_route(request.method, request.path)
+    if handler is None:
+        status = 405 if allowed else 404
+        await send_response(send, status, dumps({'message': 'Method not allowed' if allowed else 'Not found'}).encode('utf-8'))
+        flask_backend.request_seconds.observe(time.perf_counter() - started, request.method, 'unmatched', str(status))
+        return
+
+    result = await handler(request, send, **params)
+    status = 200
+    if result is not None:
+        payload, status = result
+        await send_response(send, status, dumps(payload).encode('utf-8'))
+    flask_backend.request_seconds.observe(time.perf_counter() - started, request.method, rule, str(status))
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(application, port=5000)
@@ -0,0 +1,238 @@
+"""Throughput of POST /api/transactions: threaded Flask vs the asyncio entry point.
+
+Both paths run in-process against the same seeded database. The Flask app
+gets a fixed number of worker threads (--flask-threads, like a threaded WSGI
+server) with a connection pool of the same size; asgi_app.application runs on
+one event loop with an async connection pool of --async-pool connections.
+For each concurrency level, that many clients post back to back and the
+report shows req/s and p50/p99 latency as the client saw it (queueing
+included).
+
+    python bench/bench_asgi.py --concurrency 16,64,256 --latency-ms 2
+    python bench/bench_asgi.py --db mysql --password ... --output asgi.json
+
+--db fake uses bench/fake_db.py with --latency-ms added to every statement as
+a stand-in for the network round trip; --db mysql recreates a scratch
+database (default bank_bench) before every run and uses aiomysql for the
+asyncio path.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import bench_transactions as bt  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', choices=['fake', 'mysql'], default='fake')
+    parser.add_argument('--host', default=os.getenv('BENCH_DB_HOST', 'localhost'))
+    parser.add_argument('--user', default=os.getenv('BENCH_DB_USER', 'root'))
+    parser.add_argument('--password', default=os.getenv('BENCH_DB_PASSWORD', ''))
+    parser.add_argument('--database', default=os.getenv('BENCH_DB_NAME', 'bank_bench'))
+    parser.add_argument('--latency-ms', type=float, default=2.0, help='fake db only: delay added to every statement')
+    parser.add_argument('--rows', type=int, default=10000, help='history rows loaded before each run')
+    parser.add_argument('--senders', type=int, default=50)
+    parser.add_argument('--payees-per-sender', type=int, default=50)
+    parser.add_argument('--concurrency', default='16,64,256', help='clients posting at the same time, comma separated')
+    parser.add_argument('--flask-threads', type=int, default=16, help='Flask worker threads (and pooled connections)')
+    parser.add_argument('--async-pool', type=int, default=16, help='connections in the async pool')
+    parser.add_argument('--requests', type=int, default=1000, help='measured requests per run')
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--output', default='bench_asgi.json')
+    parser.add_argument('--verbose', action='store_true', help="keep the app's own console output")
+    parser.add_argument('--seed', type=int, default=7)
+    return parser.parse_args()
+
+
+def reset_database(app_module, args, scratch, senders, seed):
+    # Fresh history for every run, so both paths insert into the same starting state
+    from db_pool import ConnectionPool
+    from fake_db import FakeDatabase
+    if args.db == 'fake':
+        # Loading the history does not pay the simulated round trips; the runs do
+        fake = FakeDatabase(os.path.join(scratch, 'bank.sqlite'))
+        seed_pool = ConnectionPool(fake.connect, size=2)
+    else:
+        fake = None
+        seed_pool = bt.reset_mysql(app_module, args)
+    bt.populate(seed_pool, app_module, args, args.rows, senders, random.Random(seed))
+    seed_pool.close_idle()
+    if fake is not None:
+        fake.latency_ms = args.latency_ms
+    return fake
+
+
+def sync_pool(app_module, fake, size):
+    from db_pool import ConnectionPool, create_mysql_pool
+    if fake is not None:
+        return ConnectionPool(fake.connect, size=size, max_overflow=0, timeout=app_module.DB_POOL_TIMEOUT)
+    return create_mysql_pool(app_module.db_config, size, 0, app_module.DB_POOL_TIMEOUT)
+
+
+def flask_run(app_module, args, fake, senders, concurrency, count, seed):
+    pool = sync_pool(app_module, fake, args.flask_threads)
+    bt.reset_app_state(app_module, pool)
+    samples = []
+    lock = threading.Lock()
+    local = threading.local()
+    # Clients wait on the server's worker threads: at most `concurrency` requests are outstanding
+    outstanding = threading.Semaphore(concurrency)
+    rng = random.Random(seed)
+
+    def serve(body, submitted):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app_module.app.test_client()
+        status = client.post('/api/transactions', json=body).status_code
+        with lock:
+            samples.append((status, time.perf_counter() - submitted))
+        outstanding.release()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.flask_threads) as workers:
+        for _ in range(count):
+            outstanding.acquire()
+            workers.submit(serve, bt.payload(senders, args, rng), time.perf_counter())
+    wall = time.perf_counter() - started
+    pool.close_idle()
+    return samples, wall
+
+
+async def post(application, body):
+    data = json.dumps(body).encode('utf-8')
+    scope = {
+        'type': 'http', 'method': 'POST', 'path': '/api/transactions', 'query_string': b'',
+        'headers': [(b'content-type', b'application/json')], 'client': ('127.0.0.1', 0)
+    }
+    status = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': data, 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+async def asgi_load(asgi_module, args, senders, concurrency, count, seed):
+    samples = []
+    per_client = [count // concurrency + (1 if i < count % concurrency else 0) for i in range(concurrency)]
+
+    async def client(index, n):
+        rng = random.Random(seed * 1000 + index)
+        for _ in range(n):
+            started = time.perf_counter()
+            status = await post(asgi_module.application, bt.payload(senders, args, rng))
+            samples.append((status, time.perf_counter() - started))
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client(i, n) for i, n in enumerate(per_client) if n])
+    return samples, time.perf_counter() - started
+
+
+async def asgi_session(asgi_module, args, fake, senders, concurrency, warmup, count, seed):
+    from fake_db import AsyncFakePool
+    if fake is not None:
+        asgi_module.db_pool = AsyncFakePool(fake, maxsize=args.async_pool)
+    else:
+        asgi_module.ASYNC_DB_POOL_MAX = args.async_pool
+        asgi_module.db_pool = await asgi_module.create_db_pool()
+    try:
+        await asgi_load(asgi_module, args, senders, concurrency, warmup, seed - 1)
+        return await asgi_load(asgi_module, args, senders, concurrency, count, seed)
+    finally:
+        asgi_module.db_pool.close()
+        await asgi_module.db_pool.wait_closed()
+        asgi_module.db_pool = None
+
+
+def asgi_run(app_module, asgi_module, args, fake, senders, concurrency, count, seed):
+    # The shared state (velocity store, payee index) is rebuilt through a sync pool, as on Flask startup
+    warm_pool = sync_pool(app_module, fake, 2)
+    bt.reset_app_state(app_module, warm_pool)
+    result = asyncio.run(asgi_session(asgi_module, args, fake, senders, concurrency, args.warmup, count, seed))
+    warm_pool.close_idle()
+    return result
+
+
+def report(path, concurrency, samples, wall):
+    ok = [s[1] for s in samples if s[0] == 200]
+    latency = bt.summarize(ok)
+    return {
+        'path': path,
+        'concurrency': concurrency,
+        'requests': len(samples),
+        'status_counts': {str(k): v for k, v in sorted(Counter(s[0] for s in samples).items())},
+        'wall_s': round(wall, 3),
+        'throughput_rps': round(len(samples) / wall, 1) if wall else None,
+        'latency': latency
+    }
+
+
+def main():
+    args = parse_args()
+    for key, value in bt.BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        import app as app_module
+        import asgi_app as asgi_module
+    app_module.schema_ready = True
+
+    senders = [str(uuid.uuid4()) for _ in range(args.senders)]
+    scratch = tempfile.mkdtemp(prefix='bench_asgi_')
+    results = []
+    print(f"{'path':<6} {'clients':>7} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9}  status")
+    for concurrency in [int(c) for c in args.concurrency.split(',')]:
+        for path in ('flask', 'asgi'):
+            with (contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())):
+                fake = reset_database(app_module, args, scratch, senders, args.seed)
+                if path == 'flask':
+                    flask_run(app_module, args, fake, senders, concurrency, args.warmup, args.seed - 1)
+                    samples, wall = flask_run(app_module, args, fake, senders, concurrency, args.requests, args.seed)
+                else:
+                    samples, wall = asgi_run(app_module, asgi_module, args, fake, senders, concurrency, args.requests, args.seed)
+            result = report(path, concurrency, samples, wall)
+            results.append(result)
+            s = result['latency']
+            print(f"{path:<6} {concurrency:>7} {result['throughput_rps']:>8} {s.get('p50_ms', 0):>9.2f} "
+                  f"{s.get('p99_ms', 0):>9.2f}  {result['status_counts']}")
+
+    document = {
+        'meta': {
+            'commit': bt.git_commit(),
+            'db': args.db,
+            'latency_ms': args.latency_ms if args.db == 'fake' else None,
+            'history_rows': args.rows,
+            'flask_threads': args.flask_threads,
+            'async_pool': args.async_pool,
+            'blocking_workers': asgi_module.ASYNC_BLOCKING_WORKERS,
+            'env': {key: os.environ[key] for key in bt.CONFIG_ENV if key in os.environ}
+        },
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
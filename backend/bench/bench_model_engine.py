@@ -0,0 +1,100 @@
+"""Compare fraud_model scoring: sklearn predict_proba vs the compiled tree engine.
+
+Loads the artifacts from backend/model, checks that the compiled engine gives
+the same predict and predict_proba as sklearn on randomized rows, then times
+both for each batch size.
+
+    python bench/bench_model_engine.py --batch-sizes 1,8,32,128,500 --repeats 200
+
+Exits with status 1 if the engine does not match sklearn exactly.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+from feature_plan import named_features, sample_bases  # noqa: E402
+from model_bundle import load_model_bundle  # noqa: E402
+from tree_engine import compile_model, random_inputs, verify_engine  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model-dir', default=os.path.join(BACKEND_DIR, 'model'))
+    parser.add_argument('--batch-sizes', default='1,8,32,128,500')
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--check-rows', type=int, default=2000, help='randomized rows per input kind for the equivalence check')
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--seed', type=int, default=7)
+    return parser.parse_args()
+
+
+def time_calls(fn, X, repeats):
+    fn(X)
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(X)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def summarize(samples, rows):
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e6
+
+    return {'n': len(ordered), 'p50_us': round(pick(0.50), 2), 'p99_us': round(pick(0.99), 2),
+            'per_row_us': round(pick(0.50) / rows, 2)}
+
+
+def main():
+    args = parse_args()
+    bundle = load_model_bundle(args.model_dir, mmap=False)
+    if not bundle.ready or bundle.feature_plan is None:
+        print("Model artifacts did not load with a compiled feature plan; nothing to compare.")
+        return 1
+    model = bundle.fraud_model
+    started = time.perf_counter()
+    engine = compile_model(model)
+    if engine is None:
+        print(f"No compiled engine for {type(model).__name__}.")
+        return 1
+    print(f"Compiled {type(model).__name__} in {time.perf_counter() - started:.3f}s: "
+          f"{getattr(engine, 'n_trees', 0)} trees, {getattr(engine, 'node_count', 0):,} nodes, "
+          f"depth {getattr(engine, 'max_depth', 0)}")
+
+    reference = bundle.feature_plan.transform_many(sample_bases(bundle.encoders))
+    X = random_inputs(model, reference, n_rows=args.check_rows, seed=args.seed)
+    if not verify_engine(engine, model, X):
+        print(f"MISMATCH: compiled engine differs from sklearn on {len(X):,} randomized rows")
+        return 1
+    print(f"Equivalence: predict and predict_proba identical on {len(X):,} randomized rows")
+
+    rng = np.random.default_rng(args.seed)
+    results = []
+    print(f"\n{'batch':>6} {'sklearn p50':>12} {'compiled p50':>13} {'sklearn/row':>12} {'compiled/row':>13} {'speedup':>8}")
+    for size in [int(s) for s in args.batch_sizes.split(',')]:
+        batch = X[rng.integers(0, len(X), size)]
+        sklearn_stats = summarize(time_calls(model.predict_proba, named_features(model, batch), args.repeats), size)
+        compiled_stats = summarize(time_calls(engine.predict_proba, batch, args.repeats), size)
+        speedup = round(sklearn_stats['p50_us'] / compiled_stats['p50_us'], 1)
+        results.append({'batch_size': size, 'sklearn': sklearn_stats, 'compiled': compiled_stats, 'speedup': speedup})
+        print(f"{size:>6} {sklearn_stats['p50_us']:>10.0f}us {compiled_stats['p50_us']:>11.0f}us "
+              f"{sklearn_stats['per_row_us']:>10.1f}us {compiled_stats['per_row_us']:>11.1f}us {speedup:>7.1f}x")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'model': type(model).__name__, 'version': bundle.version, 'results': results}, f, indent=2)
+        print(f"\nWrote {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""Compare is_new_payee lookups: COUNT(*) query vs EXISTS query vs PayeeIndex.
+
+Fills a scratch database with synthetic transfers at each requested size and
+times lookups for a random mix of known and new payees.
+
+    python bench/bench_payee_index.py --rows 10000,1000000,10000000 --password ...
+
+The scratch database (default bank_bench) is dropped and recreated per size.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import mysql.connector
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from migrations import run_migrations  # noqa: E402
+from payee_index import PayeeIndex  # noqa: E402
+
+COUNT_SQL = "SELECT COUNT(*) FROM transactions WHERE sender_user_id = %s AND receiver_account_number = %s"
+EXISTS_SQL = "SELECT 1 FROM transactions WHERE sender_user_id = %s AND receiver_account_number = %s LIMIT 1"
+LOAD_SQL = "SELECT DISTINCT receiver_account_number FROM transactions WHERE sender_user_id = %s"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=os.getenv('BENCH_DB_HOST', 'localhost'))
+    parser.add_argument('--user', default=os.getenv('BENCH_DB_USER', 'root'))
+    parser.add_argument('--password', default=os.getenv('BENCH_DB_PASSWORD', ''))
+    parser.add_argument('--database', default=os.getenv('BENCH_DB_NAME', 'bank_bench'))
+    parser.add_argument('--rows', default='10000,1000000,10000000')
+    parser.add_argument('--senders', type=int, default=1000)
+    parser.add_argument('--payees-per-sender', type=int, default=50)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--without-index', action='store_true', help='drop the migration 4 indexes to time the pre-migration query')
+    parser.add_argument('--seed', type=int, default=7)
+    return parser.parse_args()
+
+
+def reset_database(args):
+    conn = mysql.connector.connect(host=args.host, user=args.user, password=args.password)
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {args.database}")
+    cursor.execute(f"CREATE DATABASE {args.database}")
+    conn.commit()
+    conn.close()
+    conn = mysql.connector.connect(host=args.host, user=args.user, password=args.password, database=args.database)
+    run_migrations(conn, args.database)
+    return conn
+
+
+def populate(conn, args, rows, senders, rng):
+    cursor = conn.cursor()
+    start = datetime.now() - timedelta(days=365)
+    chunk = []
+    for i in range(rows):
+        sender = senders[i % len(senders)]
+        chunk.append((
+            str(uuid.uuid4()), sender, f"P{rng.randrange(args.payees_per_sender):06d}", 100.0, 'USD',
+            start + timedelta(seconds=i), 'Success'
+        ))
+        if len(chunk) == 10000:
+            cursor.executemany(
+                "INSERT INTO transactions (txn_id, sender_user_id, receiver_account_number, amount, currency, timestamp, status) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                chunk
+            )
+            conn.commit()
+            chunk = []
+    if chunk:
+        cursor.executemany(
+            "INSERT INTO transactions (txn_id, sender_user_id, receiver_account_number, amount, currency, timestamp, status) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            chunk
+        )
+        conn.commit()
+    cursor.close()
+
+
+def time_queries(conn, sql, probes):
+    cursor = conn.cursor()
+    samples = []
+    for sender, payee in probes:
+        started = time.perf_counter()
+        cursor.execute(sql, (sender, payee))
+        cursor.fetchall()
+        samples.append(time.perf_counter() - started)
+    cursor.close()
+    return samples
+
+
+def time_index(conn, probes):
+    index = PayeeIndex()
+    cursor = conn.cursor()
+    cold, warm = [], []
+    for sender, payee in probes:
+        started = time.perf_counter()
+        known = index.contains(sender, payee)
+        if known is None and index.begin_load(sender):
+            cursor.execute(LOAD_SQL, (sender,))
+            index.finish_load(sender, [row[0] for row in cursor.fetchall()])
+            index.contains(sender, payee)
+            cold.append(time.perf_counter() - started)
+        else:
+            warm.append(time.perf_counter() - started)
+    cursor.close()
+    return cold, warm, index.stats()
+
+
+def summarize(samples):
+    if not samples:
+        return {'n': 0}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e6
+
+    return {'n': len(ordered), 'p50_us': round(pick(0.50), 2), 'p99_us': round(pick(0.99), 2),
+            'mean_us': round(sum(ordered) / len(ordered) * 1e6, 2)}
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    senders = [str(uuid.uuid4()) for _ in range(args.senders)]
+    for rows in [int(r) for r in args.rows.split(',')]:
+        conn = reset_database(args)
+        started = time.perf_counter()
+        populate(conn, args, rows, senders, rng)
+        print(f"\n== {rows:,} rows (loaded in {time.perf_counter() - started:.1f}s)")
+        if args.without_index:
+            cursor = conn.cursor()
+            for name in ('idx_txn_sender_time_status', 'idx_txn_sender_payee', 'idx_txn_sender_time_desc'):
+                cursor.execute(f"DROP INDEX {name} ON transactions")
+            cursor.close()
+
+        # Half the probes hit payees the sender has likely paid, half never-seen payees
+        probes = [(rng.choice(senders), f"P{rng.randrange(args.payees_per_sender * 2):06d}") for _ in range(args.lookups)]
+        print('COUNT(*) query   ', summarize(time_queries(conn, COUNT_SQL, probes)))
+        print('EXISTS query     ', summarize(time_queries(conn, EXISTS_SQL, probes)))
+        cold, warm, stats = time_index(conn, probes)
+        print('PayeeIndex (load)', summarize(cold))
+        print('PayeeIndex (warm)', summarize(warm))
+        print('PayeeIndex stats ', stats)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
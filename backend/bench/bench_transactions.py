@@ -0,0 +1,398 @@
+"""End-to-end load test of POST /api/transactions with a per-stage latency breakdown.
+
+Drives the Flask app in-process with concurrent synthetic users and, for each
+history size, reports throughput plus p50/p95/p99 latency for the whole request
+and for each stage: derive (generate_derived_fields_and_validate), encode,
+scale, predict, insert and commit. "other" is whatever the request spent
+outside those stages (routing, JSON, pool checkout).
+
+    python bench/bench_transactions.py --db fake --rows 0,10000,100000,1000000
+    python bench/bench_transactions.py --db mysql --password ... --output results.json
+    python bench/bench_transactions.py --compare baseline.json
+
+--db fake runs against an SQLite-backed stand-in (bench/fake_db.py) and needs
+no server; --db mysql recreates a scratch database (default bank_bench) for
+every size. Results are written as JSON. --compare prints the change against
+an earlier results file, matched by history size.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = ['derive', 'encode', 'scale', 'predict', 'insert', 'commit']
+
+# Settings the app reads at import time; the limits would otherwise reject most of the load
+BENCH_ENV = {
+    'MAX_TXNS_PER_DAY': '1000000000',
+    'RUN_MIGRATIONS_ON_STARTUP': '0',
+    'MODEL_WATCH': '0',
+}
+# Recorded with the results so runs with different settings are not compared blindly
+CONFIG_ENV = [
+    'DB_POOL_SIZE', 'DB_POOL_MAX_OVERFLOW', 'VELOCITY_STORE', 'PAYEE_INDEX', 'INFERENCE_BATCHING',
+    'INFERENCE_MAX_BATCH_SIZE', 'INFERENCE_MAX_WAIT_MS', 'ARTIFACT_MMAP', 'MODEL_ENGINE', 'GROUP_COMMIT',
+    'GROUP_COMMIT_MAX_BATCH_SIZE', 'GROUP_COMMIT_MAX_WAIT_MS', 'USER_CACHE', 'USER_CACHE_MAX_ENTRIES', 'USER_CACHE_TTL'
+]
+
+HISTORY_SQL = (
+    "INSERT INTO transactions (txn_id, sender_user_id, receiver_account_number, amount, currency, channel, "
+    "authorization_method, is_international, timestamp, txn_hour, txn_day_of_week, is_new_payee, "
+    "txn_count_last_24h, sum_amount_last_24h, is_fraud, status) "
+    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+)
+
+CURRENCIES = ['USD', 'USD', 'USD', 'EUR', 'INR']
+CHANNELS = ['Mobile', 'Web', 'ATM']
+AUTH_METHODS = ['OTP', 'Password', 'Biometric']
+
+_current = threading.local()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', choices=['fake', 'mysql'], default='fake')
+    parser.add_argument('--host', default=os.getenv('BENCH_DB_HOST', 'localhost'))
+    parser.add_argument('--user', default=os.getenv('BENCH_DB_USER', 'root'))
+    parser.add_argument('--password', default=os.getenv('BENCH_DB_PASSWORD', ''))
+    parser.add_argument('--database', default=os.getenv('BENCH_DB_NAME', 'bank_bench'))
+    parser.add_argument('--rows', default='0,10000,100000,1000000', help='history sizes to test, comma separated')
+    parser.add_argument('--senders', type=int, default=50, help='synthetic users; history is split evenly between them')
+    parser.add_argument('--payees-per-sender', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=16, help='users posting at the same time')
+    parser.add_argument('--requests', type=int, default=2000, help='measured requests per history size')
+    parser.add_argument('--warmup', type=int, default=100, help='unmeasured requests per history size')
+    parser.add_argument('--output', default='bench_transactions.json')
+    parser.add_argument('--compare', help='earlier results file to diff against')
+    parser.add_argument('--verbose', action='store_true', help="keep the app's own console output")
+    parser.add_argument('--seed', type=int, default=7)
+    return parser.parse_args()
+
+
+def add_stage(name, seconds):
+    stages = getattr(_current, 'stages', None)
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + seconds
+
+
+def timed(name, fn):
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            add_stage(name, time.perf_counter() - started)
+    return wrapper
+
+
+class TimedCursor:
+    def __init__(self, cursor, insert_sql):
+        self._cursor = cursor
+        self._insert_sql = insert_sql
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def execute(self, sql, params=None):
+        if sql == self._insert_sql:
+            return timed('insert', self._cursor.execute)(sql, params)
+        return self._cursor.execute(sql, params)
+
+
+class TimedConnection:
+    """Attributes the transaction INSERT and the commit to their own stages."""
+
+    def __init__(self, conn, insert_sql):
+        self._conn = conn
+        self._insert_sql = insert_sql
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._conn.cursor(*args, **kwargs), self._insert_sql)
+
+    def commit(self):
+        return timed('commit', self._conn.commit)()
+
+    def close(self):
+        return self._conn.close()
+
+
+def instrument(app_module):
+    app_module.generate_derived_fields_and_validate = timed('derive', app_module.generate_derived_fields_and_validate)
+    get_connection = app_module.get_db_connection
+
+    def get_db_connection():
+        conn = get_connection()
+        return TimedConnection(conn, app_module.INSERT_TRANSACTION_SQL) if conn is not None else None
+    app_module.get_db_connection = get_db_connection
+
+    bundle = app_module.active_model
+    if bundle.feature_plan is not None:
+        bundle.feature_plan.encode_many = timed('encode', bundle.feature_plan.encode_many)
+        bundle.feature_plan.scale_align = timed('scale', bundle.feature_plan.scale_align)
+    if bundle.scheduler is not None:
+        # Per request, so batching wait counts against the request that waited
+        bundle.scheduler.predict = timed('predict', bundle.scheduler.predict)
+    elif bundle.ready:
+        bundle.score_rows = timed('predict', bundle.score_rows)
+    if app_module.transaction_writer is not None:
+        # The insert and commit run on the writer thread; the request's wait for them counts as commit
+        app_module.transaction_writer.write = timed('commit', app_module.transaction_writer.write)
+
+
+def reset_fake(app_module, path):
+    from db_pool import ConnectionPool
+    from fake_db import FakeDatabase
+    fake = FakeDatabase(path)
+    return ConnectionPool(fake.connect, size=app_module.DB_POOL_SIZE, max_overflow=app_module.DB_POOL_MAX_OVERFLOW,
+                          timeout=app_module.DB_POOL_TIMEOUT)
+
+
+def reset_mysql(app_module, args):
+    import mysql.connector
+    from db_pool import create_mysql_pool
+    conn = mysql.connector.connect(host=args.host, user=args.user, password=args.password)
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {args.database}")
+    cursor.execute(f"CREATE DATABASE {args.database}")
+    conn.commit()
+    conn.close()
+    config = {'host': args.host, 'user': args.user, 'password': args.password, 'database': args.database}
+    app_module.db_config = config
+    return create_mysql_pool(config, app_module.DB_POOL_SIZE, app_module.DB_POOL_MAX_OVERFLOW, app_module.DB_POOL_TIMEOUT)
+
+
+def populate(pool, app_module, args, rows, senders, rng):
+    conn = pool.acquire()
+    try:
+        from migrations import run_migrations
+        run_migrations(conn, app_module.db_config['database'])
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT INTO users (user_id, full_name, account_number, email, password_hash) VALUES (%s, %s, %s, %s, %s)",
+            [(sender, f"Bench User {i}", f"ACC{i:08d}", f"bench{i}@example.com", 'x') for i, sender in enumerate(senders)]
+        )
+        conn.commit()
+
+        # Spread over the last year, so each sender's 24h window holds only a slice of its history
+        now = datetime.now()
+        chunk = []
+        for i in range(rows):
+            ts = now - timedelta(seconds=rng.randrange(1, 365 * 86400))
+            chunk.append((
+                str(uuid.uuid4()), senders[i % len(senders)], f"P{rng.randrange(args.payees_per_sender):06d}",
+                round(rng.uniform(1, 5000), 2), rng.choice(CURRENCIES), rng.choice(CHANNELS), rng.choice(AUTH_METHODS),
+                0, ts, ts.hour, ts.weekday(), 0, 0, 0, 0, 'Success'
+            ))
+            if len(chunk) == 10000:
+                cursor.executemany(HISTORY_SQL, chunk)
+                conn.commit()
+                chunk = []
+        if chunk:
+            cursor.executemany(HISTORY_SQL, chunk)
+            conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def reset_app_state(app_module, pool):
+    from payee_index import PayeeIndex
+    from user_cache import UserCache
+    from velocity_store import VelocityStore
+    app_module.db_pool = pool
+    app_module.schema_ready = False
+    if app_module.transaction_writer is not None:
+        app_module.transaction_writer.release_connection()
+    if app_module.payee_index is not None:
+        app_module.payee_index = PayeeIndex(max_entries=app_module.PAYEE_INDEX_MAX_ENTRIES)
+    if app_module.user_cache is not None:
+        app_module.user_cache = UserCache(
+            max_entries=app_module.USER_CACHE_MAX_ENTRIES, ttl=app_module.USER_CACHE_TTL,
+            negative_ttl=app_module.USER_CACHE_NEGATIVE_TTL
+        )
+    if app_module.velocity_store is not None:
+        app_module.velocity_store = VelocityStore(window=timedelta(hours=24))
+        app_module.last_velocity_warm = time.monotonic()
+        app_module.warm_velocity_store()
+
+
+def payload(senders, args, rng):
+    # Half the payees are ones the sender has likely paid before
+    return {
+        'user_id': rng.choice(senders),
+        'receiver_account_number': f"P{rng.randrange(args.payees_per_sender * 2):06d}",
+        'receiver_name': 'Bench Payee',
+        'amount': round(rng.uniform(1, 50000), 2),
+        'currency': rng.choice(CURRENCIES),
+        'description': 'bench',
+        'send_via': rng.choice(CHANNELS),
+        'authorization_method': rng.choice(AUTH_METHODS),
+    }
+
+
+def run_load(flask_app, senders, args, count, seed):
+    samples = []
+    lock = threading.Lock()
+    per_worker = [count // args.concurrency + (1 if i < count % args.concurrency else 0) for i in range(args.concurrency)]
+
+    def user(worker, n):
+        rng = random.Random(seed * 1000 + worker)
+        client = flask_app.test_client()
+        mine = []
+        for _ in range(n):
+            body = payload(senders, args, rng)
+            _current.stages = {}
+            started = time.perf_counter()
+            response = client.post('/api/transactions', json=body)
+            total = time.perf_counter() - started
+            mine.append((response.status_code, total, _current.stages))
+            _current.stages = None
+        with lock:
+            samples.extend(mine)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for future in [pool.submit(user, i, n) for i, n in enumerate(per_worker) if n]:
+            future.result()
+    return samples, time.perf_counter() - started
+
+
+def summarize(values):
+    if not values:
+        return {'n': 0}
+    ordered = sorted(values)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000.0, 3)
+
+    return {'n': len(ordered), 'mean_ms': round(sum(ordered) / len(ordered) * 1000.0, 3),
+            'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99), 'max_ms': round(ordered[-1] * 1000.0, 3)}
+
+
+def report(rows, samples, wall):
+    ok = [s for s in samples if s[0] == 200]
+    latency = {'total': summarize([s[1] for s in ok])}
+    for stage in STAGES:
+        latency[stage] = summarize([s[2][stage] for s in ok if stage in s[2]])
+    latency['other'] = summarize([s[1] - sum(s[2].values()) for s in ok])
+    return {
+        'history_rows': rows,
+        'requests': len(samples),
+        'status_counts': {str(k): v for k, v in sorted(Counter(s[0] for s in samples).items())},
+        'wall_s': round(wall, 3),
+        'throughput_rps': round(len(samples) / wall, 1) if wall else None,
+        'latency': latency
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_result(result):
+    print(f"\n== {result['history_rows']:,} history rows: {result['throughput_rps']} req/s, status {result['status_counts']}")
+    print(f"   {'stage':<8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage in ['total'] + STAGES + ['other']:
+        s = result['latency'][stage]
+        if s['n']:
+            print(f"   {stage:<8} {s['p50_ms']:>9.3f} {s['p95_ms']:>9.3f} {s['p99_ms']:>9.3f}")
+
+
+def compare(baseline_path, meta, results):
+    with open(baseline_path) as f:
+        document = json.load(f)
+    baseline = {r['history_rows']: r for r in document['results']}
+    print(f"\n== Change vs {baseline_path} @ {document['meta'].get('commit')} (positive = slower)")
+    for key in ('db', 'concurrency', 'senders', 'payees_per_sender', 'compiled_features', 'inference_batching', 'env'):
+        if document['meta'].get(key) != meta.get(key):
+            print(f"   warning: {key} differs ({document['meta'].get(key)} -> {meta.get(key)})")
+    for result in results:
+        before = baseline.get(result['history_rows'])
+        if before is None:
+            continue
+        print(f"   {result['history_rows']:,} rows: throughput {before['throughput_rps']} -> {result['throughput_rps']} req/s")
+        for stage in ['total'] + STAGES:
+            old, new = before['latency'].get(stage, {}), result['latency'][stage]
+            if not old.get('n') or not new['n']:
+                continue
+            deltas = [f"{q} {(new[q] - old[q]) / old[q] * 100.0 if old[q] else 0.0:+.1f}%" for q in ('p50_ms', 'p95_ms', 'p99_ms')]
+            print(f"     {stage:<8} " + '  '.join(deltas))
+
+
+def main():
+    args = parse_args()
+    for key, value in BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        import app as app_module
+    instrument(app_module)
+
+    rng = random.Random(args.seed)
+    senders = [str(uuid.uuid4()) for _ in range(args.senders)]
+    scratch = tempfile.mkdtemp(prefix='bench_transactions_')
+    results = []
+    for rows in [int(r) for r in args.rows.split(',')]:
+        pool = reset_fake(app_module, os.path.join(scratch, 'bank.sqlite')) if args.db == 'fake' else reset_mysql(app_module, args)
+        started = time.perf_counter()
+        with (contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())):
+            populate(pool, app_module, args, rows, senders, rng)
+            reset_app_state(app_module, pool)
+            run_load(app_module.app, senders, args, args.warmup, args.seed)
+            samples, wall = run_load(app_module.app, senders, args, args.requests, args.seed + rows)
+        print(f"\n(loaded {rows:,} rows and ran in {time.perf_counter() - started:.1f}s)")
+        result = report(rows, samples, wall)
+        print_result(result)
+        results.append(result)
+        pool.close_idle()
+
+    document = {
+        'meta': {
+            'commit': git_commit(),
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'db': args.db,
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'senders': args.senders,
+            'payees_per_sender': args.payees_per_sender,
+            'model_version': app_module.active_model.version,
+            'compiled_features': app_module.active_model.feature_plan is not None,
+            'inference_batching': app_module.active_model.scheduler is not None,
+            'env': {key: os.environ[key] for key in CONFIG_ENV if key in os.environ}
+        },
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"\nWrote {args.output}")
+    if args.compare:
+        compare(args.compare, document['meta'], results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+"""In-process stand-in for a MySQL server, backed by an SQLite file.
+
+Implements the slice of the mysql.connector connection/cursor API the backend
+uses and rewrites its MySQL-specific statements (migration locks,
+information_schema probes, multi-column ALTER TABLE, upserts, DATE_FORMAT,
+FOR UPDATE, exact SUM(amount)) into SQLite. It is meant for benchmarks that need a database
+without a server; it is not a general MySQL emulator.
+
+    fake = FakeDatabase('/tmp/bank.sqlite')
+    pool = ConnectionPool(fake.connect, size=8)
+
+latency_ms adds a fixed delay to every statement, standing in for the network
+round trip to a real server. AsyncFakePool wraps the same database in the
+slice of the aiomysql pool API asgi_app.py uses.
+"""
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from mysql.connector import errors
+
+CENT = Decimal('0.01')
+
+sqlite3.register_converter('DATETIME', lambda b: datetime.fromisoformat(b.decode()))
+sqlite3.register_converter('DECIMAL', lambda b: Decimal(b.decode()).quantize(CENT, rounding=ROUND_HALF_UP))
+
+COLUMNS_SQL = re.compile(r"SELECT COLUMN_NAME FROM information_schema\.COLUMNS", re.I)
+STATISTICS_SQL = re.compile(r"SELECT COUNT\(\*\) FROM information_schema\.STATISTICS", re.I)
+ALTER_ADD_SQL = re.compile(r"ALTER TABLE (\w+) (ADD COLUMN .*)", re.I | re.S)
+NOOP_SQL = re.compile(r"\s*(SET |CREATE DATABASE|USE )", re.I)
+LOCK_SQL = re.compile(r"\s*SELECT (GET_LOCK|RELEASE_LOCK)\(", re.I)
+VALUES_REF = re.compile(r"VALUES\((\w+)\)")
+WRITE_SQL = re.compile(r"\s*(INSERT|UPDATE|REPLACE)\b", re.I)
+AMOUNT_SUM = re.compile(r"\bSUM\(amount\)", re.I)
+
+
+def date_format(value, fmt):
+    # MySQL DATE_FORMAT for the specifiers strftime shares with it (%i and %s are its minutes/seconds)
+    if value is None:
+        return None
+    return datetime.fromisoformat(str(value)).strftime(fmt.replace('%i', '%M').replace('%s', '%S'))
+
+
+class DecimalSum:
+    # SUM over a DECIMAL(15,2) column: each value as the DECIMAL converter reads it back, added exactly
+    def __init__(self):
+        self.total = None
+
+    def step(self, value):
+        if value is not None:
+            self.total = (self.total or Decimal('0')) + Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+    def finalize(self):
+        return None if self.total is None else str(self.total)
+
+
+def adapt(value, stored=True):
+    # Store values the way MySQL would keep them in DATETIME / DECIMAL columns. MySQL only rounds
+    # fractional seconds when storing; compared as-is, whole-second text sorts before any fraction of it
+    if isinstance(value, datetime):
+        if stored:
+            value = (value + timedelta(microseconds=500000)).replace(microsecond=0)
+        return value.isoformat(sep=' ')
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def translate(sql, params):
+    """Rewrite one MySQL statement into a list of (sqlite_sql, params)."""
+    stored = WRITE_SQL.match(sql) is not None
+    params = tuple(adapt(p, stored) for p in params or ())
+    if LOCK_SQL.match(sql):
+        return [('SELECT 1', ())]
+    if NOOP_SQL.match(sql):
+        return []
+    if COLUMNS_SQL.match(sql):
+        return [('SELECT name AS COLUMN_NAME FROM pragma_table_info(?)', (params[1],))]
+    if STATISTICS_SQL.match(sql):
+        return [("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND name = ?", (params[1], params[2]))]
+    match = ALTER_ADD_SQL.match(sql.strip())
+    if match:
+        table, clauses = match.groups()
+        return [(f"ALTER TABLE {table} {clause.strip()}", ()) for clause in re.split(r",\s*(?=ADD COLUMN)", clauses)]
+    if 'ON DUPLICATE KEY UPDATE' in sql:
+        insert, updates = sql.split('ON DUPLICATE KEY UPDATE')
+        sql = insert + ' ON CONFLICT DO UPDATE SET ' + VALUES_REF.sub(r'excluded.\1', updates)
+    # SQLite locks the whole database for writes, so row locks have nothing to add
+    sql = re.sub(r"\s+FOR UPDATE\s*$", "", sql.strip(), flags=re.I)
+    # SQLite would add the amounts as doubles; MySQL sums DECIMAL exactly
+    sql = AMOUNT_SUM.sub('DECIMAL_SUM(amount)', sql)
+    return [(sql.replace('%s', '?'), params)]
+
+
+class FakeCursor:
+    def __init__(self, conn, dictionary=False):
+        self._conn = conn
+        self._cursor = conn._db.cursor()
+        self._dictionary = dictionary
+        self._has_rows = False
+
+    def execute(self, sql, params=None):
+        self._has_rows = False
+        self._conn.round_trip()
+        try:
+            for statement, args in translate(sql, params):
+                self._conn.before(statement)
+                self._cursor.execute(statement, args)
+                self._has_rows = self._cursor.description is not None
+        except sqlite3.Error as e:
+            raise errors.DatabaseError(msg=str(e)) from e
+
+    def executemany(self, sql, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        self._conn.round_trip()
+        statement, _ = translate(sql, rows[0])[0]
+        self._conn.before(statement)
+        try:
+            stored = WRITE_SQL.match(sql) is not None
+            self._cursor.executemany(statement, [tuple(adapt(v, stored) for v in row) for row in rows])
+        except sqlite3.Error as e:
+            raise errors.DatabaseError(msg=str(e)) from e
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone()) if self._has_rows else None
+
+    def fetchall(self):
+        return [self._row(r) for r in self._cursor.fetchall()] if self._has_rows else []
+
+    def fetchmany(self, size=1):
+        return [self._row(r) for r in self._cursor.fetchmany(size)] if self._has_rows else []
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class FakeConnection:
+    def __init__(self, path, latency_ms=0.0, write_lock=None):
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        self._db.create_function('DATE_FORMAT', 2, date_format, deterministic=True)
+        self._db.create_aggregate('DECIMAL_SUM', 1, DecimalSum)
+        self._latency = latency_ms / 1000.0
+        self._write_lock = write_lock
+        self._writing = False
+
+    def round_trip(self):
+        if self._latency:
+            time.sleep(self._latency)
+
+    def before(self, statement):
+        # Writers queue on the database's lock until commit/rollback instead of
+        # spinning in SQLite's busy handler, which starves some of them for seconds
+        if self._write_lock is not None and not self._writing and not statement.lstrip().upper().startswith('SELECT'):
+            self._write_lock.acquire()
+            self._writing = True
+
+    def _end(self):
+        if self._writing:
+            self._writing = False
+            self._write_lock.release()
+
+    def cursor(self, dictionary=False, buffered=None, **kwargs):
+        return FakeCursor(self, dictionary=dictionary)
+
+    def commit(self):
+        self.round_trip()
+        try:
+            self._db.commit()
+        finally:
+            self._end()
+
+    def rollback(self):
+        try:
+            self._db.rollback()
+        finally:
+            self._end()
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        pass
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        try:
+            self._db.close()
+        finally:
+            self._end()
+
+
+class FakeDatabase:
+    """One SQLite file shared by every connection it hands out (WAL, so readers never block the writer)."""
+
+    def __init__(self, path, latency_ms=0.0):
+        self.path = path
+        self.latency_ms = latency_ms
+        self.write_lock = threading.Lock()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        db = sqlite3.connect(path)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.close()
+
+    def connect(self):
+        conn = FakeConnection(self.path, self.latency_ms, self.write_lock)
+        conn._db.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+
+class AsyncFakeCursor:
+    # Statements run on the pool's threads (SQLite blocks); the round trip is awaited on the event loop
+    def __init__(self, conn):
+        self._conn = conn
+        self._cursor = FakeCursor(conn._conn, dictionary=True)
+
+    async def _call(self, fn, *args):
+        if self._conn._latency:
+            await asyncio.sleep(self._conn._latency)
+        return await asyncio.get_running_loop().run_in_executor(self._conn._executor, fn, *args)
+
+    def _autocommit(self, fn, *args):
+        fn(*args)
+        if not self._conn._in_transaction:
+            self._conn._conn.commit()
+
+    async def execute(self, sql, params=None):
+        await self._call(self._autocommit, self._cursor.execute, sql, params)
+
+    async def executemany(self, sql, rows):
+        await self._call(self._autocommit, self._cursor.executemany, sql, list(rows))
+
+    async def fetchone(self):
+        return self._cursor.fetchone()
+
+    async def fetchall(self):
+        return self._cursor.fetchall()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self._cursor.close()
+
+
+class AsyncFakeConnection:
+    # Autocommit like the aiomysql pool asgi_app creates: begin() opens a transaction, commit()/rollback() end it
+    def __init__(self, conn, executor, latency):
+        self._conn = conn
+        self._executor = executor
+        self._latency = latency
+        self._in_transaction = False
+
+    def cursor(self):
+        return AsyncFakeCursor(self)
+
+    async def begin(self):
+        self._in_transaction = True
+
+    async def commit(self):
+        self._in_transaction = False
+        await AsyncFakeCursor(self)._call(self._conn.commit)
+
+    async def rollback(self):
+        self._in_transaction = False
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._conn.rollback)
+
+
+class _Acquire:
+    def __init__(self, pool):
+        self._pool = pool
+        self._conn = None
+
+    async def __aenter__(self):
+        self._conn = await self._pool._acquire()
+        return self._conn
+
+    async def __aexit__(self, *exc):
+        await self._pool._release(self._conn)
+
+
+class AsyncFakePool:
+    """aiomysql-style pool over a FakeDatabase: acquire() waits while maxsize connections are out."""
+
+    def __init__(self, database, maxsize=10):
+        self.database = database
+        self.maxsize = maxsize
+        self._latency = database.latency_ms / 1000.0
+        self._executor = ThreadPoolExecutor(max_workers=maxsize, thread_name_prefix='fake-aiomysql')
+        self._idle = []
+        self._slots = None
+
+    def acquire(self):
+        return _Acquire(self)
+
+    async def _acquire(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.maxsize)
+        await self._slots.acquire()
+        if self._idle:
+            return self._idle.pop()
+        conn = FakeConnection(self.database.path, write_lock=self.database.write_lock)
+        conn._db.execute('PRAGMA synchronous=NORMAL')
+        return AsyncFakeConnection(conn, self._executor, self._latency)
+
+    async def _release(self, conn):
+        if conn._in_transaction:
+            # aiomysql closes a connection handed back mid-transaction; rolling back keeps it reusable here
+            await conn.rollback()
+        self._idle.append(conn)
+        self._slots.release()
+
+    def close(self):
+        for conn in self._idle:
+            conn._conn.close()
+        self._idle = []
+
+    async def wait_closed(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import deque
+import mysql.connector
+from mysql.connector import errors
+
+
+class PooledConnection:
+    """Proxy around a pooled MySQL connection; close() hands it back to the pool."""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise errors.OperationalError(msg='Connection already returned to the pool')
+        return getattr(conn, name)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn)
+
+
+class ConnectionPool:
+    """Bounded MySQL connection pool.
+
+    Keeps up to `size` idle connections and opens at most `max_overflow` extra
+    ones under bursts; overflow connections are closed when returned. Checkout
+    blocks for up to `timeout` seconds when every connection is in use, and each
+    idle connection is pinged before it is handed out so connections killed by a
+    server restart are replaced instead of failing the request.
+    """
+
+    def __init__(self, connect, size=5, max_overflow=10, timeout=5.0):
+        self._connect = connect
+        self.size = max(0, int(size))
+        self.max_overflow = max(0, int(max_overflow))
+        self.timeout = float(timeout)
+
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._open = 0
+        self._in_use = 0
+        self._waiters = 0
+
+        self.peak_in_use = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.reconnects = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+
+    def acquire(self):
+        started = time.perf_counter()
+        deadline = started + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._open < self.size + self.max_overflow:
+                    # Reserve the slot now, connect outside the lock
+                    conn = None
+                    self._open += 1
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise errors.PoolError(msg=f'Connection pool exhausted: no connection available within {self.timeout}s')
+                self._waiters += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+            self._in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self._in_use)
+
+        try:
+            if conn is None or not self._validate(conn):
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        wait_ms = (time.perf_counter() - started) * 1000.0
+        with self._cond:
+            self.checkouts += 1
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+        return PooledConnection(self, conn)
+
+    def _validate(self, conn):
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            self.reconnects += 1
+            self._discard(conn)
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def release(self, conn):
+        # End any open transaction so the next user does not inherit its snapshot or locks
+        healthy = True
+        try:
+            conn.rollback()
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            self._in_use -= 1
+            if healthy and len(self._idle) < self.size:
+                self._idle.append(conn)
+                conn = None
+            else:
+                self._open -= 1
+            self._cond.notify()
+        if conn is not None:
+            self._discard(conn)
+
+    def close_idle(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'timeout_s': self.timeout,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'waiters': self._waiters,
+                'peak_in_use': self.peak_in_use,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'reconnects': self.reconnects,
+                'wait_ms': {
+                    'mean': (self.wait_total_ms / self.checkouts) if self.checkouts else 0.0,
+                    'max': self.wait_max_ms
+                }
+            }
+
+
+def create_mysql_pool(config, size, max_overflow, timeout):
+    return ConnectionPool(lambda: mysql.connector.connect(**config), size=size, max_overflow=max_overflow, timeout=timeout)
@@ -0,0 +1,53 @@
+import atexit
+import itertools
+import logging
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler with a bounded queue that drops records instead of blocking the caller when it is full."""
+
+    def __init__(self, max_queue):
+        super().__init__(queue.Queue(max(1, int(max_queue))))
+        self._dropped_lock = threading.Lock()
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+class Sampler:
+    """True once every `every` calls; every <= 0 never samples."""
+
+    def __init__(self, every):
+        self.every = int(every)
+        self._calls = itertools.count(1)
+
+    def __call__(self):
+        return self.every > 0 and next(self._calls) % self.every == 0
+
+
+def create_queue_logger(name, max_queue=10000, level=logging.INFO, stream=None):
+    # Request threads only format and enqueue; the listener thread started by start() does the writing
+    handler = DroppingQueueHandler(max_queue)
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    logger.propagate = False
+    logger.addHandler(handler)
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    listener = QueueListener(handler.queue, output)
+
+    def start():
+        listener.start()
+        atexit.register(listener.stop)
+
+    return logger, handler, start
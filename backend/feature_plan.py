@@ -0,0 +1,255 @@
+import numpy as np
+import pandas as pd
+
+# Order of the base feature dict built by build_model_base
+BASE_COLUMNS = [
+    'amount', 'currency', 'channel', 'authorization_method', 'txn_hour', 'txn_day_of_week',
+    'is_new_payee', 'is_international', 'txn_count_last_24h', 'sum_amount_last_24h'
+]
+CATEGORICAL_COLUMNS = {'currency', 'channel', 'authorization_method'}
+FALLBACK_NUMERICAL_COLUMNS = ['amount', 'txn_count_last_24h', 'sum_amount_last_24h', 'txn_hour', 'txn_day_of_week']
+
+
+
+def named_features(estimator, X):
+    # The plan builds plain arrays already in the fitted column order; sklearn estimators fitted on
+    # DataFrames warn on arrays, so they get a frame with their own column names
+    names = getattr(estimator, 'feature_names_in_', None)
+    if names is None or isinstance(X, pd.DataFrame):
+        return X
+    return pd.DataFrame(X, columns=names, copy=False)
+
+
+# derived_fields: anything with the derived feature keys, e.g. the dict from
+# generate_derived_fields_and_validate or a transactions row
+def build_model_base(amount, currency, channel, authorization_method, derived_fields):
+    return {
+        'amount': float(amount),
+        'currency': str(currency),
+        'channel': str(channel),
+        'authorization_method': str(authorization_method),
+        'txn_hour': int(derived_fields['txn_hour']),
+        'txn_day_of_week': int(derived_fields['txn_day_of_week']),
+        'is_new_payee': int(bool(derived_fields['is_new_payee'])),
+        'is_international': int(bool(derived_fields['is_international'])),
+        'txn_count_last_24h': int(derived_fields['txn_count_last_24h']),
+        'sum_amount_last_24h': float(derived_fields['sum_amount_last_24h'] or 0)
+    }
+
+
+# Reference pandas pipeline: base feature dict -> DataFrame aligned to the model
+def build_features_frame(base, encoders, scaler, model):
+    features = pd.DataFrame([base])
+
+    # Apply encoders with type-aware handling only for categorical inputs
+    for column, encoder in encoders.items():
+        if column not in features.columns or column not in CATEGORICAL_COLUMNS:
+            continue
+
+        # Handle unseen labels by mapping to first known category/class
+        safe_series = features[column].astype(str)
+        if hasattr(encoder, 'categories_'):
+            # OneHotEncoder path
+            cats = [str(c) for c in encoder.categories_[0]]
+            safe_series = safe_series.apply(lambda x: x if x in cats else cats[0])
+            encoded = encoder.transform(safe_series.values.reshape(-1, 1))
+            encoded = encoded.toarray() if hasattr(encoded, 'toarray') else np.asarray(encoded)
+            col_names = [f"{column}_{cat}" for cat in cats]
+            encoded_df = pd.DataFrame(encoded, columns=col_names)
+            features = pd.concat([features.drop(columns=[column]), encoded_df], axis=1)
+        elif hasattr(encoder, 'classes_'):
+            # LabelEncoder path (expects 1D array)
+            classes = [str(c) for c in encoder.classes_]
+            safe_series = safe_series.apply(lambda x: x if x in classes else classes[0])
+            encoded = encoder.transform(safe_series.values)
+            features[f"{column}_label"] = encoded
+            features = features.drop(columns=[column])
+        else:
+            # Unknown encoder type, skip transformation
+            pass
+
+    # Scale features according to scaler's fitted feature names
+    scale_cols = list(getattr(scaler, 'feature_names_in_', []))
+    if scale_cols:
+        # Ensure all expected scaler columns exist; fill missing with 0
+        for col in scale_cols:
+            if col not in features.columns:
+                features[col] = 0
+        scaled_values = scaler.transform(features[scale_cols])
+        features[scale_cols] = scaled_values
+    else:
+        # Fallback: scale known numeric columns including time-based ones
+        numerical_cols = [c for c in FALLBACK_NUMERICAL_COLUMNS if c in features.columns]
+        if numerical_cols:
+            features[numerical_cols] = scaler.transform(features[numerical_cols])
+
+    # Align columns to model expectations when available
+    expected_cols = getattr(model, 'feature_names_in_', None)
+    if expected_cols is not None:
+        aligned = pd.DataFrame(columns=expected_cols)
+        for col in expected_cols:
+            aligned[col] = features[col] if col in features.columns else 0
+        features = aligned
+    return features
+
+
+class FeaturePlan:
+    """Encoders, scaler and model column order compiled into NumPy lookups.
+
+    Mirrors build_features_frame step for step: categorical columns are
+    replaced by their encoded columns (unseen labels fall back to the first
+    known class), the scaler runs over its fitted columns, and the result is
+    aligned to the model's feature_names_in_ with missing columns set to 0.
+    """
+
+    def __init__(self, encoders, scaler, model):
+        # Working column layout as the pandas pipeline would evolve it
+        columns = list(BASE_COLUMNS)
+
+        # Per categorical: (source column, lookup dict, fallback index, one-hot width or None)
+        self.categoricals = []
+        for column, encoder in encoders.items():
+            if column not in columns or column not in CATEGORICAL_COLUMNS:
+                continue
+            if hasattr(encoder, 'categories_'):
+                # OneHotEncoder path: one output column per category
+                cats = [str(c) for c in encoder.categories_[0]]
+                columns.remove(column)
+                columns.extend(f"{column}_{cat}" for cat in cats)
+                self.categoricals.append((column, {c: i for i, c in enumerate(cats)}, 0, len(cats)))
+            elif hasattr(encoder, 'classes_'):
+                # LabelEncoder path: classes_ is sorted, so the label is the class position
+                classes = [str(c) for c in encoder.classes_]
+                columns.remove(column)
+                columns.append(f"{column}_label")
+                self.categoricals.append((column, {c: i for i, c in enumerate(classes)}, 0, None))
+
+        # Scaler: fitted columns, or the fixed numeric fallback when the scaler has no names
+        scale_cols = [str(c) for c in getattr(scaler, 'feature_names_in_', [])]
+        if scale_cols:
+            for col in scale_cols:
+                if col not in columns:
+                    columns.append(col)
+        else:
+            scale_cols = [c for c in FALLBACK_NUMERICAL_COLUMNS if c in columns]
+
+        self.scaler = scaler
+        self.scale_mean = None
+        self.scale_scale = None
+        if type(scaler).__name__ == 'StandardScaler':
+            n = len(scale_cols)
+            mean = getattr(scaler, 'mean_', None) if getattr(scaler, 'with_mean', True) else None
+            scale = getattr(scaler, 'scale_', None) if getattr(scaler, 'with_std', True) else None
+            self.scale_mean = np.asarray(mean, dtype=np.float64) if mean is not None else np.zeros(n)
+            self.scale_scale = np.asarray(scale, dtype=np.float64) if scale is not None else np.ones(n)
+
+        index = {col: i for i, col in enumerate(columns)}
+        self.working_columns = columns
+        self.scale_idx = np.array([index[c] for c in scale_cols], dtype=np.intp)
+
+        # Model alignment: output position -> working position, or -1 for "fill with 0"
+        expected = getattr(model, 'feature_names_in_', None)
+        self.columns = [str(c) for c in expected] if expected is not None else list(columns)
+        self.out_idx = np.array([index.get(c, -1) for c in self.columns], dtype=np.intp)
+        self.out_present = self.out_idx >= 0
+
+        # Where each plain numeric base field and each categorical lands in the working row
+        categorical_sources = {c[0] for c in self.categoricals}
+        self.numeric_slots = [(name, index[name]) for name in BASE_COLUMNS
+                              if name not in categorical_sources and name in index]
+        self.categorical_slots = []
+        for column, lookup, fallback, width in self.categoricals:
+            if width is None:
+                self.categorical_slots.append((column, lookup, fallback, index[f"{column}_label"], None))
+            else:
+                first = index[f"{column}_{next(iter(lookup))}"]
+                self.categorical_slots.append((column, lookup, fallback, first, width))
+
+    def _fill(self, row, base):
+        for name, pos in self.numeric_slots:
+            row[pos] = base[name]
+        for column, lookup, fallback, pos, width in self.categorical_slots:
+            code = lookup.get(str(base[column]), fallback)
+            if width is None:
+                row[pos] = code
+            else:
+                row[pos + code] = 1.0
+
+    def encode_many(self, bases):
+        # Working rows: numeric fields copied, categoricals encoded, nothing scaled yet
+        work = np.zeros((len(bases), len(self.working_columns)), dtype=np.float64)
+        for i, base in enumerate(bases):
+            self._fill(work[i], base)
+        return work
+
+    def scale_align(self, work):
+        # Scales the working rows in place and returns them in the model's column order
+        if len(self.scale_idx):
+            block = work[:, self.scale_idx]
+            if self.scale_mean is not None:
+                block -= self.scale_mean
+                block /= self.scale_scale
+            else:
+                block = np.asarray(self.scaler.transform(named_features(self.scaler, block)), dtype=np.float64)
+            work[:, self.scale_idx] = block
+
+        out = np.zeros((len(work), len(self.columns)), dtype=np.float64)
+        out[:, self.out_present] = work[:, self.out_idx[self.out_present]]
+        return out
+
+    def transform_many(self, bases):
+        return self.scale_align(self.encode_many(bases))
+
+    def transform(self, base):
+        return self.transform_many([base])
+
+
+def build_feature_plan(encoders, scaler, model):
+    if not (encoders and scaler and model):
+        return None
+    try:
+        return FeaturePlan(encoders, scaler, model)
+    except Exception as e:
+        print(f"Failed to compile feature plan: {e}")
+        return None
+
+
+def sample_bases(encoders):
+    # Synthetic rows covering every known label, an unseen label and the numeric edge cases
+    known = {}
+    for column in CATEGORICAL_COLUMNS:
+        encoder = encoders.get(column)
+        if hasattr(encoder, 'classes_'):
+            known[column] = [str(c) for c in encoder.classes_]
+        elif hasattr(encoder, 'categories_'):
+            known[column] = [str(c) for c in encoder.categories_[0]]
+        else:
+            known[column] = ['USD']
+    width = max(len(v) for v in known.values()) + 1
+    bases = []
+    for i in range(width):
+        bases.append({
+            'amount': float(1 + i * 997.5),
+            'currency': (known['currency'] + ['__unseen__'])[i % (len(known['currency']) + 1)],
+            'channel': (known['channel'] + ['__unseen__'])[i % (len(known['channel']) + 1)],
+            'authorization_method': (known['authorization_method'] + ['__unseen__'])[i % (len(known['authorization_method']) + 1)],
+            'txn_hour': i % 24,
+            'txn_day_of_week': i % 7,
+            'is_new_payee': i % 2,
+            'is_international': (i + 1) % 2,
+            'txn_count_last_24h': i,
+            'sum_amount_last_24h': float(i * 1234.25)
+        })
+    return bases
+
+
+def verify_feature_plan(plan, encoders, scaler, model, bases):
+    # Compare the compiled plan with the pandas pipeline on the given base dicts
+    for base in bases:
+        expected_frame = build_features_frame(base, encoders, scaler, model)
+        if [str(c) for c in expected_frame.columns] != plan.columns:
+            return False
+        expected = expected_frame.to_numpy(dtype=np.float64)
+        if not np.array_equal(plan.transform(base), expected):
+            return False
+    return True
@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import deque
+
+# Reuse the writer's connection without a ping while it has been idle for less than this
+IDLE_PING_S = 30.0
+
+
+class _Pending:
+    __slots__ = ('item', 'enqueued', 'done', 'error')
+
+    def __init__(self, item):
+        self.item = item
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.error = None
+
+
+class GroupCommitWriter:
+    """Commits rows from concurrent request threads in shared transactions.
+
+    write() queues an item and blocks until it is committed. A worker thread
+    drains the queue into batches of up to max_batch_size items, waiting at
+    most max_wait_ms after the first queued one, runs write_fn(cursor, items)
+    once per batch and commits, and only then releases the callers, so a
+    return from write() still means the row is durable. If the batch fails it
+    is rolled back and every item is retried in its own transaction: the bad
+    row gets its error, the rest commit.
+
+    The worker keeps one connection from connect() between batches (pinged
+    after IDLE_PING_S idle) and gives it back after any error.
+    """
+
+    def __init__(self, connect, write_fn, max_batch_size=64, max_wait_ms=2.0):
+        self.connect = connect
+        self.write_fn = write_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._worker = None
+        self._conn = None
+        self._last_used = 0.0
+
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.committed_rows = 0
+        self.failed_rows = 0
+        self.isolated_batches = 0
+        self.batch_sizes = {}
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+
+    def write(self, item):
+        pending = _Pending(item)
+        with self._cond:
+            self._ensure_worker()
+            self._queue.append(pending)
+            self._cond.notify()
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name='group-commit', daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                deadline = self._queue[0].enqueued + self.max_wait
+                while len(self._queue) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._queue.popleft() for _ in range(min(self.max_batch_size, len(self._queue)))]
+            self._execute(batch)
+
+    def _connection(self):
+        if self._conn is not None and time.monotonic() - self._last_used > IDLE_PING_S:
+            try:
+                self._conn.ping(reconnect=False)
+            except Exception:
+                self._drop_connection()
+        if self._conn is None:
+            self._conn = self.connect()
+        self._last_used = time.monotonic()
+        return self._conn
+
+    def release_connection(self):
+        # Give back the held connection (e.g. after the pool was replaced); only safe while no batch is running
+        self._drop_connection()
+
+    def _drop_connection(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _commit(self, conn, items):
+        cursor = conn.cursor()
+        try:
+            self.write_fn(cursor, items)
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            cursor.close()
+
+    def _execute(self, batch):
+        started = time.perf_counter()
+        isolated = False
+        try:
+            conn = self._connection()
+            try:
+                self._commit(conn, [p.item for p in batch])
+            except Exception as e:
+                if len(batch) == 1:
+                    raise
+                # One transaction per row, so a bad row cannot take the others down with it
+                print(f"Group commit of {len(batch)} rows failed, retrying them one by one: {e}")
+                isolated = True
+                for p in batch:
+                    try:
+                        self._commit(conn, [p.item])
+                    except Exception as row_error:
+                        p.error = row_error
+        except Exception as e:
+            for p in batch:
+                if p.error is None:
+                    p.error = e
+        finally:
+            if any(p.error is not None for p in batch):
+                self._drop_connection()
+            for p in batch:
+                p.done.set()
+        self._record(batch, started, isolated)
+
+    def _record(self, batch, started, isolated):
+        failed = sum(1 for p in batch if p.error is not None)
+        with self._stats_lock:
+            self.batches += 1
+            self.committed_rows += len(batch) - failed
+            self.failed_rows += failed
+            self.isolated_batches += int(isolated)
+            self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+            for p in batch:
+                wait_ms = (started - p.enqueued) * 1000.0
+                self.wait_total_ms += wait_ms
+                self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+
+    def stats(self):
+        with self._stats_lock:
+            rows = self.committed_rows + self.failed_rows
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'queue_depth': len(self._queue),
+                'batches': self.batches,
+                'committed_rows': self.committed_rows,
+                'failed_rows': self.failed_rows,
+                'isolated_batches': self.isolated_batches,
+                'mean_batch_size': (rows / self.batches) if self.batches else 0.0,
+                'batch_sizes': {str(k): v for k, v in sorted(self.batch_sizes.items())},
+                'queue_wait_ms': {
+                    'mean': (self.wait_total_ms / rows) if rows else 0.0,
+                    'max': self.wait_max_ms
+                }
+            }
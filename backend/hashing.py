@@ -0,0 +1,165 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+
+# Upper bounds (ms) of the hash latency histogram buckets
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500]
+
+
+class HashingBusy(Exception):
+    pass
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def _check(password, hashed):
+    try:
+        return bcrypt.checkpw(password, hashed)
+    except (ValueError, TypeError):
+        return False
+
+
+def _noop():
+    return os.getpid()
+
+
+def hash_cost(hashed):
+    # "$2b$12$..." -> 12; None for anything that is not a bcrypt hash
+    try:
+        return int(hashed.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class HashingExecutor:
+    """Runs bcrypt in a dedicated process pool so request threads only wait on it.
+
+    At most `workers + max_queue` hashes are admitted at once; further calls raise
+    HashingBusy immediately instead of queueing behind a login burst. A call that
+    times out also raises HashingBusy but keeps its slot until the worker is done
+    with the job. A pool whose worker died is replaced on the next call.
+    """
+
+    def __init__(self, workers=2, max_queue=32, rounds=12, timeout=30.0):
+        self.workers = max(1, int(workers))
+        self.max_queue = max(0, int(max_queue))
+        self.rounds = int(rounds)
+        self.timeout = float(timeout)
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.completed = {'hash': 0, 'check': 0}
+        self.latency_total_ms = {'hash': 0.0, 'check': 0.0}
+        self.latency_max_ms = {'hash': 0.0, 'check': 0.0}
+        self.latency_buckets = {op: [0] * (len(LATENCY_BUCKETS_MS) + 1) for op in ('hash', 'check')}
+
+    def start(self):
+        # Fork the workers up front, before the server starts its request threads
+        with self._pool_lock:
+            if self._pool is None:
+                context = multiprocessing.get_context('fork') if os.name == 'posix' else None
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                for future in [self._pool.submit(_noop) for _ in range(self.workers)]:
+                    future.result()
+        return self
+
+    def hash_password(self, password):
+        return self._run('hash', _hash, password.encode('utf-8'), self.rounds)
+
+    def check_password(self, password, hashed):
+        return self._run('check', _check, password.encode('utf-8'), hashed.encode('utf-8'))
+
+    def needs_rehash(self, hashed):
+        cost = hash_cost(hashed)
+        return cost is not None and cost < self.rounds
+
+    def _run(self, op, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.rejected += 1
+            raise HashingBusy('Password hashing is saturated')
+        started = time.perf_counter()
+        with self._stats_lock:
+            self.in_flight += 1
+        pool = self._pool
+        try:
+            if pool is None:
+                pool = self.start()._pool
+            future = pool.submit(fn, *args)
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._finish(op, started)
+            self._discard(pool if pool is not None else self._pool)
+            raise HashingBusy(f'Password hashing unavailable: {e}') from e
+        # The slot is held until the job ends, not until this call gives up on it
+        future.add_done_callback(lambda _: self._finish(op, started))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError as e:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise HashingBusy('Password hashing timed out') from e
+        except BrokenProcessPool as e:
+            self._discard(pool)
+            raise HashingBusy(f'Password hashing unavailable: {e}') from e
+
+    def _finish(self, op, started):
+        self._slots.release()
+        self._record(op, (time.perf_counter() - started) * 1000.0)
+
+    def _discard(self, pool):
+        # A worker died: drop the broken pool so the next call forks a new one
+        with self._pool_lock:
+            if pool is None or self._pool is not pool:
+                return
+            self._pool = None
+        with self._stats_lock:
+            self.restarts += 1
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _record(self, op, elapsed_ms):
+        with self._stats_lock:
+            self.in_flight -= 1
+            self.completed[op] += 1
+            self.latency_total_ms[op] += elapsed_ms
+            self.latency_max_ms[op] = max(self.latency_max_ms[op], elapsed_ms)
+            for i, bound in enumerate(LATENCY_BUCKETS_MS):
+                if elapsed_ms <= bound:
+                    self.latency_buckets[op][i] += 1
+                    break
+            else:
+                self.latency_buckets[op][-1] += 1
+
+    def stats(self):
+        labels = [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        with self._stats_lock:
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'rounds': self.rounds,
+                'in_flight': self.in_flight,
+                'queue_depth': max(0, self.in_flight - self.workers),
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'restarts': self.restarts,
+                'latency_ms': {
+                    op: {
+                        'count': self.completed[op],
+                        'mean': (self.latency_total_ms[op] / self.completed[op]) if self.completed[op] else 0.0,
+                        'max': self.latency_max_ms[op],
+                        'buckets': dict(zip(labels, self.latency_buckets[op]))
+                    }
+                    for op in ('hash', 'check')
+                }
+            }
@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+
+# Upper bounds (ms) of the queue wait histogram buckets
+WAIT_BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50]
+
+
+class _Pending:
+    __slots__ = ('row', 'enqueued', 'done', 'result', 'error')
+
+    def __init__(self, row):
+        self.row = row
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class InferenceScheduler:
+    """Coalesces single-row predictions from concurrent request threads.
+
+    Rows submitted while other predictions are in flight are queued; a worker
+    thread drains the queue into batches of up to max_batch_size rows, waiting at
+    most max_wait_ms after the first queued row, and runs one predict call per
+    batch. When no more than bypass_inflight requests are in flight the caller
+    predicts directly, so an idle server pays no queueing latency.
+
+    close() stops the worker once the rows already queued have been answered;
+    predict() keeps working after it, predicting directly.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=2.0, bypass_inflight=1):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.bypass_inflight = int(bypass_inflight)
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._inflight = 0
+        self._worker = None
+        self._closed = False
+
+        self._stats_lock = threading.Lock()
+        self.bypassed = 0
+        self.batches = 0
+        self.batched_rows = 0
+        self.batch_sizes = {}
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+
+    def predict(self, row):
+        # row: 1-D feature vector; returns predict_fn's result for it (predict_fn maps a 2-D batch to per-row results)
+        with self._cond:
+            self._inflight += 1
+            inflight = self._inflight
+            closed = self._closed
+        try:
+            if closed or inflight <= self.bypass_inflight:
+                with self._stats_lock:
+                    self.bypassed += 1
+                return self.predict_fn(np.asarray(row, dtype=np.float64).reshape(1, -1))[0]
+
+            pending = _Pending(np.asarray(row, dtype=np.float64).reshape(-1))
+            with self._cond:
+                # Closed since the check above: the worker may already be gone
+                closed = self._closed
+                if not closed:
+                    self._ensure_worker()
+                    self._queue.append(pending)
+                    self._cond.notify()
+            if closed:
+                return self.predict_fn(pending.row.reshape(1, -1))[0]
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.result
+        finally:
+            with self._cond:
+                self._inflight -= 1
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name='inference-scheduler', daemon=True)
+            self._worker.start()
+
+    def close(self, timeout=None):
+        # Called on a bundle that has been replaced; requests still holding it finish normally
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            worker = self._worker
+        if worker is not None and worker is not threading.current_thread():
+            worker.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    if self._closed:
+                        return
+                    self._cond.wait()
+                deadline = self._queue[0].enqueued + self.max_wait
+                while len(self._queue) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._queue.popleft() for _ in range(min(self.max_batch_size, len(self._queue)))]
+            self._execute(batch)
+
+    def _execute(self, batch):
+        started = time.perf_counter()
+        try:
+            predictions = self.predict_fn(np.vstack([p.row for p in batch]))
+            for p, prediction in zip(batch, predictions):
+                p.result = prediction
+        except Exception as e:
+            for p in batch:
+                p.error = e
+        finally:
+            for p in batch:
+                p.done.set()
+        self._record(batch, started)
+
+    def _record(self, batch, started):
+        with self._stats_lock:
+            self.batches += 1
+            self.batched_rows += len(batch)
+            self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+            for p in batch:
+                wait_ms = (started - p.enqueued) * 1000.0
+                self.wait_total_ms += wait_ms
+                self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+                for i, bound in enumerate(WAIT_BUCKETS_MS):
+                    if wait_ms <= bound:
+                        self.wait_buckets[i] += 1
+                        break
+                else:
+                    self.wait_buckets[-1] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            labels = [f"<={b}ms" for b in WAIT_BUCKETS_MS] + [f">{WAIT_BUCKETS_MS[-1]}ms"]
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'bypass_inflight': self.bypass_inflight,
+                'queue_depth': len(self._queue),
+                'bypassed': self.bypassed,
+                'batches': self.batches,
+                'batched_rows': self.batched_rows,
+                'mean_batch_size': (self.batched_rows / self.batches) if self.batches else 0.0,
+                'batch_sizes': {str(k): v for k, v in sorted(self.batch_sizes.items())},
+                'queue_wait_ms': {
+                    'mean': (self.wait_total_ms / self.batched_rows) if self.batched_rows else 0.0,
+                    'max': self.wait_max_ms,
+                    'buckets': dict(zip(labels, self.wait_buckets))
+                }
+            }
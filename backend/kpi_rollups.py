@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from velocity_store import db_amount, db_timestamp
+
+# Hourly and daily counters per channel/currency; the two periods are kept as separate rows
+PERIODS = ('hour', 'day')
+
+UPSERT_ROLLUP_SQL = (
+    "INSERT INTO kpi_rollups (period, bucket_start, channel, currency, txn_count, fraud_count, amount_total, fraud_amount_total) "
+    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s) "
+    "ON DUPLICATE KEY UPDATE txn_count = txn_count + VALUES(txn_count), fraud_count = fraud_count + VALUES(fraud_count), "
+    "amount_total = amount_total + VALUES(amount_total), fraud_amount_total = fraud_amount_total + VALUES(fraud_amount_total)"
+)
+INCREMENT_COUNTER_SQL = (
+    "INSERT INTO kpi_counters (name, value) VALUES (%s, %s) "
+    "ON DUPLICATE KEY UPDATE value = value + VALUES(value)"
+)
+
+REBUILD_SQL = [
+    "DELETE FROM kpi_rollups",
+    "DELETE FROM kpi_counters",
+    """
+    INSERT INTO kpi_rollups (period, bucket_start, channel, currency, txn_count, fraud_count, amount_total, fraud_amount_total)
+    SELECT 'hour', DATE_FORMAT(timestamp, '%Y-%m-%d %H:00:00'), COALESCE(channel, ''), COALESCE(currency, ''),
+           COUNT(*), SUM(CASE WHEN is_fraud = 1 THEN 1 ELSE 0 END), COALESCE(SUM(amount), 0),
+           COALESCE(SUM(CASE WHEN is_fraud = 1 THEN amount ELSE 0 END), 0)
+    FROM transactions WHERE timestamp IS NOT NULL
+    GROUP BY DATE_FORMAT(timestamp, '%Y-%m-%d %H:00:00'), COALESCE(channel, ''), COALESCE(currency, '')
+    """,
+    """
+    INSERT INTO kpi_rollups (period, bucket_start, channel, currency, txn_count, fraud_count, amount_total, fraud_amount_total)
+    SELECT 'day', DATE_FORMAT(bucket_start, '%Y-%m-%d 00:00:00'), channel, currency,
+           SUM(txn_count), SUM(fraud_count), SUM(amount_total), SUM(fraud_amount_total)
+    FROM kpi_rollups WHERE period = 'hour'
+    GROUP BY DATE_FORMAT(bucket_start, '%Y-%m-%d 00:00:00'), channel, currency
+    """,
+    "INSERT INTO kpi_counters (name, value) SELECT 'users', COUNT(*) FROM users"
+]
+
+
+def bucket_starts(timestamp):
+    # Bucket by the value MySQL will store, so live counters and a rebuild agree at hour boundaries
+    stored = db_timestamp(timestamp)
+    hour = stored.replace(minute=0, second=0)
+    return (('hour', hour), ('day', hour.replace(hour=0)))
+
+
+def rollup_rows(transactions):
+    """UPSERT_ROLLUP_SQL parameters for inserted transactions, in key order.
+
+    transactions: iterable of (timestamp, channel, currency, amount, is_fraud).
+    Upserting in key order makes concurrent writers lock the rows in the same order.
+    """
+    deltas = {}
+    for timestamp, channel, currency, amount, is_fraud in transactions:
+        amount = db_amount(amount)
+        for period, start in bucket_starts(timestamp):
+            delta = deltas.setdefault((period, start, channel or '', currency or ''), [0, 0, Decimal('0.00'), Decimal('0.00')])
+            delta[0] += 1
+            delta[2] += amount
+            if is_fraud:
+                delta[1] += 1
+                delta[3] += amount
+    return [key + tuple(delta) for key, delta in sorted(deltas.items())]
+
+
+def apply_kpi_rollups(cursor, transactions):
+    # Add inserted transactions to the rollups; call in the inserting transaction, just before commit
+    rows = rollup_rows(transactions)
+    if rows:
+        cursor.executemany(UPSERT_ROLLUP_SQL, rows)
+
+
+def increment_counter(cursor, name, amount=1):
+    cursor.execute(INCREMENT_COUNTER_SQL, (name, amount))
+
+
+def rebuild_kpi_rollups(cursor, database=None):
+    # Recompute every counter from history. INSERT ... SELECT holds shared locks on the scanned
+    # transactions rows, so concurrent inserts wait for the caller's commit instead of being lost.
+    for sql in REBUILD_SQL:
+        cursor.execute(sql)
+
+
+def _rate(fraud, total):
+    return round(fraud * 100.0 / total, 2) if total else 0.0
+
+
+def read_kpis(cursor, now=None):
+    """Dashboard KPIs from the rollups: a bounded number of primary-key rows at any data volume."""
+    now = now or datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    since = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=23)
+
+    cursor.execute("SELECT value FROM kpi_counters WHERE name = 'users'")
+    row = cursor.fetchone()
+    total_users = int(row['value']) if row else 0
+
+    cursor.execute(
+        "SELECT channel, currency, txn_count, fraud_count, amount_total, fraud_amount_total FROM kpi_rollups "
+        "WHERE period = 'day' AND bucket_start = %s",
+        (today,)
+    )
+    by_channel, by_currency = {}, {}
+    totals = [0, 0, Decimal('0.00'), Decimal('0.00')]
+    for row in cursor.fetchall():
+        values = (int(row['txn_count']), int(row['fraud_count']), Decimal(row['amount_total']), Decimal(row['fraud_amount_total']))
+        for group, key in ((by_channel, row['channel']), (by_currency, row['currency'])):
+            entry = group.setdefault(key, [0, 0, Decimal('0.00'), Decimal('0.00')])
+            for i, value in enumerate(values):
+                entry[i] += value
+        for i, value in enumerate(values):
+            totals[i] += value
+
+    cursor.execute(
+        "SELECT bucket_start, SUM(txn_count) AS txn_count, SUM(fraud_count) AS fraud_count, SUM(amount_total) AS amount_total "
+        "FROM kpi_rollups WHERE period = 'hour' AND bucket_start >= %s GROUP BY bucket_start ORDER BY bucket_start",
+        (since,)
+    )
+    hourly = [
+        {'hour': row['bucket_start'].isoformat(), 'transactions': int(row['txn_count']),
+         'flagged': int(row['fraud_count']), 'amount': float(row['amount_total'])}
+        for row in cursor.fetchall()
+    ]
+
+    def breakdown(group):
+        return {
+            key: {'transactions': v[0], 'flagged': v[1], 'amount': float(v[2]), 'flagged_amount': float(v[3]), 'fraud_rate': _rate(v[1], v[0])}
+            for key, v in sorted(group.items())
+        }
+
+    return {
+        'total_users': total_users,
+        'todays_transactions': totals[0],
+        'flagged_transactions': totals[1],
+        'fraud_rate': _rate(totals[1], totals[0]),
+        'todays_amount': float(totals[2]),
+        'flagged_amount': float(totals[3]),
+        'by_channel': breakdown(by_channel),
+        'by_currency': breakdown(by_currency),
+        'hourly': hourly,
+        'as_of': now.isoformat(timespec='seconds')
+    }
@@ -0,0 +1,248 @@
+from datetime import datetime
+import mysql.connector
+from kpi_rollups import rebuild_kpi_rollups
+
+# Serializes migration runs across worker processes sharing one database
+MIGRATION_LOCK = 'bank_schema_migrations'
+MIGRATION_LOCK_TIMEOUT = 60
+
+
+def create_users_table(cursor, database):
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id VARCHAR(36) PRIMARY KEY,
+            full_name VARCHAR(255) NOT NULL,
+            account_number VARCHAR(50) NOT NULL UNIQUE,
+            email VARCHAR(255) NOT NULL UNIQUE,
+            password_hash VARCHAR(255) NOT NULL
+        )
+        """
+    )
+
+
+def create_transactions_table(cursor, database):
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS transactions (
+            txn_id VARCHAR(36) PRIMARY KEY,
+            sender_user_id VARCHAR(36) NOT NULL,
+            receiver_account_number VARCHAR(50) NOT NULL,
+            receiver_name VARCHAR(255),
+            amount DECIMAL(15,2) NOT NULL,
+            currency VARCHAR(10) NOT NULL,
+            description TEXT,
+            channel VARCHAR(50),
+            authorization_method VARCHAR(50),
+            is_international TINYINT(1),
+            timestamp DATETIME NOT NULL,
+            txn_hour INT,
+            txn_day_of_week INT,
+            ip_address VARCHAR(45),
+            device_fingerprint VARCHAR(255),
+            is_new_payee TINYINT(1),
+            txn_count_last_24h INT,
+            sum_amount_last_24h DECIMAL(15,2),
+            is_fraud TINYINT(1),
+            status VARCHAR(20)
+        )
+        """
+    )
+
+
+def add_missing_transaction_columns(cursor, database):
+    # Tables created by older versions of the backend may lack some columns
+    add_missing_columns(cursor, database, 'transactions', {
+        'txn_id': 'VARCHAR(36)',
+        'sender_user_id': 'VARCHAR(36)',
+        'receiver_account_number': 'VARCHAR(50)',
+        'receiver_name': 'VARCHAR(255)',
+        'amount': 'DECIMAL(15,2)',
+        'currency': 'VARCHAR(10)',
+        'description': 'TEXT',
+        'channel': 'VARCHAR(50)',
+        'authorization_method': 'VARCHAR(50)',
+        'is_international': 'TINYINT(1)',
+        'timestamp': 'DATETIME',
+        'txn_hour': 'INT',
+        'txn_day_of_week': 'INT',
+        'ip_address': 'VARCHAR(45)',
+        'device_fingerprint': 'VARCHAR(255)',
+        'is_new_payee': 'TINYINT(1)',
+        'txn_count_last_24h': 'INT',
+        'sum_amount_last_24h': 'DECIMAL(15,2)',
+        'is_fraud': 'TINYINT(1)',
+        'status': 'VARCHAR(20)'
+    })
+
+
+def add_transaction_indexes(cursor, database):
+    # 24h velocity aggregate, new-payee check and history listing
+    create_index(cursor, database, 'transactions', 'idx_txn_sender_time_status', '(sender_user_id, timestamp, status)')
+    create_index(cursor, database, 'transactions', 'idx_txn_sender_payee', '(sender_user_id, receiver_account_number)')
+    create_index(cursor, database, 'transactions', 'idx_txn_sender_time_desc', '(sender_user_id, timestamp DESC)')
+
+
+def add_model_version_column(cursor, database):
+    # Which model bundle scored each transaction
+    add_missing_columns(cursor, database, 'transactions', {'model_version': 'VARCHAR(64)'})
+
+
+def create_rescore_tables(cursor, database):
+    # Offline re-scoring output (rescore.py): one row per model version and transaction, plus resume points
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS transaction_scores (
+            model_version VARCHAR(64) NOT NULL,
+            txn_id VARCHAR(36) NOT NULL,
+            is_fraud TINYINT(1) NOT NULL,
+            fraud_probability DOUBLE,
+            scored_at DATETIME NOT NULL,
+            PRIMARY KEY (model_version, txn_id)
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rescore_checkpoints (
+            model_version VARCHAR(64) PRIMARY KEY,
+            last_txn_id VARCHAR(36) NOT NULL,
+            rows_scored BIGINT NOT NULL,
+            rows_skipped BIGINT NOT NULL,
+            updated_at DATETIME NOT NULL
+        )
+        """
+    )
+
+
+def create_kpi_tables(cursor, database):
+    # Dashboard counters maintained by the insert paths (kpi_rollups.py), backfilled from existing rows
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS kpi_rollups (
+            period VARCHAR(8) NOT NULL,
+            bucket_start DATETIME NOT NULL,
+            channel VARCHAR(50) NOT NULL,
+            currency VARCHAR(10) NOT NULL,
+            txn_count BIGINT NOT NULL DEFAULT 0,
+            fraud_count BIGINT NOT NULL DEFAULT 0,
+            amount_total DECIMAL(20,2) NOT NULL DEFAULT 0,
+            fraud_amount_total DECIMAL(20,2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, bucket_start, channel, currency)
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS kpi_counters (
+            name VARCHAR(64) PRIMARY KEY,
+            value BIGINT NOT NULL
+        )
+        """
+    )
+    rebuild_kpi_rollups(cursor, database)
+
+
+def add_review_columns(cursor, database):
+    # Model probability, 0-100 risk score and reviewer state for the admin flagged-transaction queue
+    add_missing_columns(cursor, database, 'transactions', {
+        'fraud_probability': 'DOUBLE',
+        'risk_score': 'TINYINT UNSIGNED',
+        'review_status': 'VARCHAR(20)',
+        'reviewed_at': 'DATETIME'
+    })
+    cursor.execute("UPDATE transactions SET review_status = 'flagged' WHERE is_fraud = 1 AND review_status IS NULL")
+    # Queue listing newest first, by risk, and per review status
+    create_index(cursor, database, 'transactions', 'idx_txn_flagged_time', '(is_fraud, timestamp, txn_id)')
+    create_index(cursor, database, 'transactions', 'idx_txn_flagged_risk', '(is_fraud, risk_score, timestamp, txn_id)')
+    create_index(cursor, database, 'transactions', 'idx_txn_review_time', '(review_status, timestamp, txn_id)')
+
+
+def add_export_index(cursor, database):
+    # Training-data export scans by (timestamp, txn_id) across all senders
+    create_index(cursor, database, 'transactions', 'idx_txn_time', '(timestamp, txn_id)')
+
+
+def add_missing_columns(cursor, database, table, expected_defs):
+    cursor.execute(
+        "SELECT COLUMN_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s",
+        (database, table)
+    )
+    existing = {row[0] for row in cursor.fetchall()}
+    missing = [(name, dtype) for name, dtype in expected_defs.items() if name not in existing]
+    if missing:
+        cursor.execute(f"ALTER TABLE {table} " + ", ".join([f"ADD COLUMN {name} {dtype}" for name, dtype in missing]))
+
+
+def create_index(cursor, database, table, name, columns):
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND INDEX_NAME = %s",
+        (database, table, name)
+    )
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f"CREATE INDEX {name} ON {table} {columns}")
+
+
+# (version, name, step) in apply order; append new steps, never edit applied ones
+MIGRATIONS = [
+    (1, 'create users table', create_users_table),
+    (2, 'create transactions table', create_transactions_table),
+    (3, 'add missing transactions columns', add_missing_transaction_columns),
+    (4, 'add transactions indexes', add_transaction_indexes),
+    (5, 'add transactions.model_version', add_model_version_column),
+    (6, 'create transaction_scores and rescore_checkpoints', create_rescore_tables),
+    (7, 'create and backfill kpi_rollups and kpi_counters', create_kpi_tables),
+    (8, 'add transactions review columns and queue indexes', add_review_columns),
+    (9, 'add transactions (timestamp, txn_id) index', add_export_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def applied_versions(cursor):
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at DATETIME NOT NULL
+        )
+        """
+    )
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def run_migrations(conn, database):
+    # Applies every pending migration in order; returns the versions applied by this call
+    cursor = conn.cursor()
+    applied = []
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise mysql.connector.errors.OperationalError(msg='Timed out waiting for the schema migration lock')
+        try:
+            done = applied_versions(cursor)
+            for version, name, step in MIGRATIONS:
+                if version in done:
+                    continue
+                step(cursor, database)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name, applied_at) VALUES (%s, %s, %s)",
+                    (version, name, datetime.now())
+                )
+                conn.commit()
+                applied.append(version)
+                print(f"Applied schema migration {version}: {name}")
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+            cursor.fetchone()
+        return applied
+    except mysql.connector.Error as err:
+        print(f"Error running schema migrations: {err}")
+        raise
+    finally:
+        try:
+            cursor.close()
+        except Exception:
+            pass
@@ -0,0 +1,166 @@
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier, ExtraTreeClassifier
+from artifacts import ARTIFACT_NAMES, load_artifacts, sha256_file
+from feature_plan import build_feature_plan, build_features_frame, named_features, sample_bases, verify_feature_plan
+from inference_scheduler import InferenceScheduler
+from tree_engine import compile_model, random_inputs, verify_engine
+
+
+# Classifiers whose predict() is exactly classes_[argmax(predict_proba())], so one call yields both
+ARGMAX_CLASSIFIERS = (RandomForestClassifier, ExtraTreesClassifier, DecisionTreeClassifier, ExtraTreeClassifier)
+
+
+class ModelLoadError(Exception):
+    pass
+
+
+def risk_score(probability):
+    # 0-100 integer for the review queue; None when the model gives no probability
+    return None if probability is None else int(round(float(probability) * 100))
+
+
+class ModelBundle:
+    """One fraud_model/encoders/scaler triple plus everything compiled from it.
+
+    Requests take a reference to the active bundle once and use it throughout,
+    so a reload swapping in a new bundle never mixes artifacts mid-request.
+    """
+
+    def __init__(self, fraud_model, encoders, scaler, version, report=None):
+        self.fraud_model = fraud_model
+        self.encoders = encoders
+        self.scaler = scaler
+        self.version = version
+        self.report = report or {}
+        self.feature_plan = None
+        self.engine = None
+        self.scheduler = None
+        classes = [int(c) for c in getattr(fraud_model, 'classes_', [])] if fraud_model is not None else []
+        # Column of the fraud class in predict_proba output, or None when there is no probability to store
+        self.proba_column = classes.index(1) if hasattr(fraud_model, 'predict_proba') and 1 in classes else None
+        self.argmax_predict = isinstance(fraud_model, ARGMAX_CLASSIFIERS)
+
+    @property
+    def estimator(self):
+        # The compiled engine when one was built and verified, otherwise the sklearn model itself
+        return self.engine if self.engine is not None else self.fraud_model
+
+    @property
+    def engine_name(self):
+        return 'compiled' if self.engine is not None else 'sklearn'
+
+    @property
+    def ready(self):
+        return bool(self.fraud_model and self.encoders and self.scaler)
+
+    def build_features_frame(self, base):
+        return build_features_frame(base, self.encoders, self.scaler, self.fraud_model)
+
+    def features(self, bases):
+        if self.feature_plan is not None:
+            return self.feature_plan.transform_many(bases)
+        return pd.concat([self.build_features_frame(base) for base in bases], ignore_index=True)
+
+    def predict(self, bases):
+        # Score many base feature dicts with one model call
+        return [int(p) for p in self.estimator.predict(named_features(self.estimator, self.features(bases)))]
+
+    def score_features(self, features):
+        # (predictions, fraud probabilities or None) for an already built feature matrix
+        estimator = self.estimator
+        features = named_features(estimator, features)
+        if self.proba_column is None:
+            return [int(p) for p in estimator.predict(features)], None
+        proba = estimator.predict_proba(features)
+        if self.argmax_predict:
+            predictions = estimator.classes_.take(np.argmax(proba, axis=1), axis=0)
+        else:
+            predictions = estimator.predict(features)
+        return [int(p) for p in predictions], [float(p) for p in proba[:, self.proba_column]]
+
+    def close(self):
+        # Stop what was started for this bundle once a reload has replaced it
+        if self.scheduler is not None:
+            self.scheduler.close()
+
+    def score_rows(self, features):
+        # Per-row (prediction, probability) pairs; the shape the inference scheduler hands back per request
+        predictions, probabilities = self.score_features(features)
+        return list(zip(predictions, probabilities if probabilities is not None else [None] * len(predictions)))
+
+    def score(self, bases):
+        return self.score_features(self.features(bases))
+
+
+def model_version(model_dir, names=ARTIFACT_NAMES):
+    # Short content hash over the source artifacts, stable across restarts and workers
+    digest = hashlib.sha256()
+    for name in names:
+        path = os.path.join(model_dir, f"{name}.pkl")
+        digest.update(sha256_file(path).encode('ascii') if os.path.exists(path) else b'-')
+    return digest.hexdigest()[:12]
+
+
+def load_model_bundle(model_dir, mmap=True, strict=False, scheduler_options=None, engine='sklearn'):
+    """Load, compile and warm a bundle from model_dir.
+
+    With strict=True any failure raises ModelLoadError (used by reloads, which
+    must keep the old bundle serving); otherwise problems are printed and the
+    bundle degrades the way startup always has. engine='compiled' scores
+    through tree_engine once it reproduces the model exactly on randomized
+    rows; otherwise the sklearn model is used.
+    """
+    version = model_version(model_dir)
+    artifacts, report = load_artifacts(model_dir, mmap=mmap)
+    bundle = ModelBundle(artifacts['fraud_model'], artifacts['encoders'], artifacts['scaler'], version, report)
+    if not bundle.ready:
+        if strict:
+            raise ModelLoadError('one or more artifacts failed to load')
+        return bundle
+
+    samples = sample_bases(bundle.encoders)
+    try:
+        # The reference pipeline must run end to end: this catches encoders/scaler/model that do not fit together
+        reference = pd.concat([bundle.build_features_frame(base) for base in samples], ignore_index=True)
+        n_features = getattr(bundle.fraud_model, 'n_features_in_', None)
+        if n_features is not None and reference.shape[1] != n_features:
+            raise ModelLoadError(f'model expects {n_features} features, pipeline produces {reference.shape[1]}')
+        expected = bundle.fraud_model.predict(reference)
+        if bundle.argmax_predict and bundle.proba_column is not None:
+            if bundle.score_features(reference)[0] != [int(p) for p in expected]:
+                bundle.argmax_predict = False
+    except Exception as e:
+        if strict:
+            raise ModelLoadError(f'artifacts are inconsistent: {e}') from e
+        print(f"Model artifacts failed the warm-up check: {e}")
+        return bundle
+
+    plan = build_feature_plan(bundle.encoders, bundle.scaler, bundle.fraud_model)
+    if plan is not None and not verify_feature_plan(plan, bundle.encoders, bundle.scaler, bundle.fraud_model, samples):
+        print("Compiled feature plan does not match the pandas pipeline; using pandas features.")
+        plan = None
+    bundle.feature_plan = plan
+
+    if engine == 'compiled':
+        compiled = compile_model(bundle.fraud_model)
+        if compiled is None:
+            print(f"No compiled engine for {type(bundle.fraud_model).__name__}; using sklearn.")
+        elif not verify_engine(compiled, bundle.fraud_model, random_inputs(bundle.fraud_model, reference)):
+            print("Compiled model does not match sklearn predictions; using sklearn.")
+        else:
+            bundle.engine = compiled
+
+    # Warm the fast path too so the first real request does not pay for it
+    bundle.predict(samples)
+    if scheduler_options is not None and plan is not None:
+        bundle.scheduler = InferenceScheduler(bundle.score_rows, **scheduler_options)
+        try:
+            bundle.scheduler.predict(np.asarray(plan.transform(samples[0])[0]))
+        except Exception:
+            bundle.close()
+            raise
+    return bundle
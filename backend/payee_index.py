@@ -0,0 +1,114 @@
+import threading
+from collections import OrderedDict
+
+
+class PayeeIndex:
+    """Per-sender sets of receiver account numbers already paid.
+
+    A sender's set is loaded lazily from the transactions table on first use
+    and extended after each insert, so is_new_payee becomes a set lookup. Payees
+    added while a sender's set is being loaded are buffered and merged, since the
+    load query may or may not have seen them. Senders are evicted least recently
+    used first once the total number of cached payees exceeds max_entries.
+    Senders with more payees than max_entries are remembered as too large and
+    never loaded again; contains() returns None for them.
+
+    Like the velocity store this only sees inserts made by this process, so a
+    payee found in the set is certain but a missing one may have been paid
+    from another process since the load: callers confirm it against the table
+    and report such payees with learn().
+    """
+
+    def __init__(self, max_entries=1_000_000):
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._senders = OrderedDict()
+        self._loading = {}
+        self._too_large = set()
+        self._entries = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.too_large_lookups = 0
+        self.stale_misses = 0
+
+    def contains(self, sender, payee):
+        # True/False when the sender's set is cached, None when it has to be loaded first
+        with self._lock:
+            payees = self._senders.get(sender)
+            if payees is None:
+                if sender in self._too_large:
+                    self.too_large_lookups += 1
+                    return None
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._senders.move_to_end(sender)
+            return payee in payees
+
+    def begin_load(self, sender):
+        with self._lock:
+            if sender in self._senders or sender in self._loading or sender in self._too_large:
+                return False
+            self._loading[sender] = []
+            return True
+
+    def finish_load(self, sender, payees):
+        with self._lock:
+            buffered = self._loading.pop(sender, None)
+            if buffered is None:
+                return
+            payees = set(payees)
+            payees.update(buffered)
+            self.loads += 1
+            if len(payees) > self.max_entries:
+                self._too_large.add(sender)
+                return
+            self._senders[sender] = payees
+            self._entries += len(payees)
+            self._evict()
+
+    def fail_load(self, sender):
+        with self._lock:
+            self._loading.pop(sender, None)
+
+    def add(self, sender, payee):
+        # Call after a transfer row has been inserted, whatever its status
+        with self._lock:
+            payees = self._senders.get(sender)
+            if payees is not None:
+                self._senders.move_to_end(sender)
+                if payee not in payees:
+                    payees.add(payee)
+                    self._entries += 1
+                    self._evict()
+            elif sender in self._loading:
+                self._loading[sender].append(payee)
+
+    def learn(self, sender, payee):
+        # A payee the cached set did not have but the table did: paid from another process since the load
+        with self._lock:
+            self.stale_misses += 1
+        self.add(sender, payee)
+
+    def _evict(self):
+        while self._entries > self.max_entries and self._senders:
+            _, payees = self._senders.popitem(last=False)
+            self._entries -= len(payees)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'senders': len(self._senders),
+                'entries': self._entries,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'loads': self.loads,
+                'evictions': self.evictions,
+                'too_large_senders': len(self._too_large),
+                'too_large_lookups': self.too_large_lookups,
+                'stale_misses': self.stale_misses
+            }
@@ -0,0 +1,137 @@
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from feature_plan import build_model_base
+from model_bundle import load_model_bundle, model_version
+
+FEATURE_COLUMNS = [
+    'amount', 'currency', 'channel', 'authorization_method', 'txn_hour', 'txn_day_of_week',
+    'is_new_payee', 'is_international', 'txn_count_last_24h', 'sum_amount_last_24h'
+]
+REQUIRED_COLUMNS = [c for c in FEATURE_COLUMNS if c != 'sum_amount_last_24h']
+
+SCORE_SQL = (
+    "INSERT INTO transaction_scores (model_version, txn_id, is_fraud, fraud_probability, scored_at) "
+    "VALUES (%s, %s, %s, %s, %s) "
+    "ON DUPLICATE KEY UPDATE is_fraud = VALUES(is_fraud), fraud_probability = VALUES(fraud_probability), scored_at = VALUES(scored_at)"
+)
+CHECKPOINT_SQL = (
+    "INSERT INTO rescore_checkpoints (model_version, last_txn_id, rows_scored, rows_skipped, updated_at) "
+    "VALUES (%s, %s, %s, %s, %s) "
+    "ON DUPLICATE KEY UPDATE last_txn_id = VALUES(last_txn_id), rows_scored = VALUES(rows_scored), "
+    "rows_skipped = VALUES(rows_skipped), updated_at = VALUES(updated_at)"
+)
+
+_worker_bundle = None
+
+
+def _init_worker(model_dir, mmap):
+    global _worker_bundle
+    _worker_bundle = load_model_bundle(model_dir, mmap=mmap, strict=True)
+
+
+def _score_chunk(bases):
+    return _worker_bundle.score(bases)
+
+
+def read_checkpoint(conn, version):
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT last_txn_id, rows_scored, rows_skipped FROM rescore_checkpoints WHERE model_version = %s",
+        (version,)
+    )
+    row = cursor.fetchone()
+    cursor.close()
+    return row if row else ('', 0, 0)
+
+
+def rescore_transactions(connect, model_dir, chunk_size=5000, workers=2, mmap=True, reset=False, log=print):
+    """Score every stored transaction with the model in model_dir into transaction_scores.
+
+    Rows stream in primary-key order from an unbuffered cursor (a clustered
+    index scan, no sort) and are scored in chunks by a process pool. At most
+    2 * workers chunks are in flight, so memory stays bounded whatever the
+    table size. Each chunk's scores and the checkpoint (last txn_id) are
+    committed together, so a rerun resumes after the last committed chunk.
+    """
+    version = model_version(model_dir)
+    read_conn = connect()
+    write_conn = connect()
+    try:
+        if reset:
+            cursor = write_conn.cursor()
+            cursor.execute("DELETE FROM rescore_checkpoints WHERE model_version = %s", (version,))
+            write_conn.commit()
+            cursor.close()
+        last_txn_id, scored, skipped = read_checkpoint(write_conn, version)
+        if last_txn_id:
+            log(f"Resuming model {version} after txn_id {last_txn_id} ({scored} scored, {skipped} skipped)")
+        else:
+            log(f"Rescoring all transactions with model {version}")
+
+        read_cursor = read_conn.cursor(dictionary=True, buffered=False)
+        # The stream idles while chunks are scored and written; keep the server from dropping it
+        read_cursor.execute("SET SESSION net_write_timeout = 3600")
+        read_cursor.execute(
+            f"SELECT txn_id, {', '.join(FEATURE_COLUMNS)} FROM transactions WHERE txn_id > %s ORDER BY txn_id",
+            (last_txn_id,)
+        )
+
+        # Pool workers load their own bundle; spawn keeps them independent of this process's threads
+        context = multiprocessing.get_context('spawn')
+        started = time.perf_counter()
+        in_flight = deque()
+        write_cursor = write_conn.cursor()
+
+        def commit_oldest():
+            nonlocal scored, skipped
+            txn_ids, chunk_last, chunk_skipped, future = in_flight.popleft()
+            predictions, probabilities = future.result()
+            now = datetime.now()
+            rows = [
+                (version, txn_id, bool(pred), probabilities[i] if probabilities is not None else None, now)
+                for i, (txn_id, pred) in enumerate(zip(txn_ids, predictions))
+            ]
+            if rows:
+                write_cursor.executemany(SCORE_SQL, rows)
+            scored += len(rows)
+            skipped += chunk_skipped
+            write_cursor.execute(CHECKPOINT_SQL, (version, chunk_last, scored, skipped, now))
+            write_conn.commit()
+            rate = scored / max(time.perf_counter() - started, 1e-9)
+            log(f"Checkpoint {chunk_last}: {scored} scored, {skipped} skipped ({rate:.0f} rows/s)")
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(model_dir, mmap)) as pool:
+            while True:
+                rows = read_cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                txn_ids, bases, chunk_skipped = [], [], 0
+                for row in rows:
+                    if any(row[c] is None for c in REQUIRED_COLUMNS):
+                        chunk_skipped += 1
+                        continue
+                    txn_ids.append(row['txn_id'])
+                    bases.append(build_model_base(row['amount'], row['currency'], row['channel'], row['authorization_method'], row))
+                if bases:
+                    future = pool.submit(_score_chunk, bases)
+                else:
+                    future = Future()
+                    future.set_result(([], None))
+                in_flight.append((txn_ids, rows[-1]['txn_id'], chunk_skipped, future))
+                if len(in_flight) >= 2 * workers:
+                    commit_oldest()
+            while in_flight:
+                commit_oldest()
+
+        write_cursor.close()
+        read_cursor.close()
+        log(f"Done: {scored} transactions scored, {skipped} skipped, with model {version}")
+        return {'model_version': version, 'scored': scored, 'skipped': skipped}
+    finally:
+        read_conn.close()
+        write_conn.close()
+
@@ -0,0 +1,158 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+REVIEW_STATUSES = ('flagged', 'under_review', 'approved', 'blocked')
+# Dashboard action -> review_status it sets
+REVIEW_ACTIONS = {'approve': 'approved', 'block': 'blocked', 'request_info': 'under_review'}
+SORTS = ('newest', 'risk')
+
+REVIEW_COLUMNS = (
+    "t.txn_id, t.sender_user_id, u.account_number AS sender_account, u.full_name AS sender_name, "
+    "t.receiver_account_number, t.receiver_name, t.amount, t.currency, t.description, t.channel, "
+    "t.authorization_method, t.timestamp, t.ip_address, t.device_fingerprint, t.fraud_probability, "
+    "t.risk_score, t.review_status, t.reviewed_at, t.model_version"
+)
+
+
+class InvalidFilter(ValueError):
+    pass
+
+
+def _datetime(value):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise InvalidFilter(f'Invalid date: {value}')
+
+
+def _upper_bound(value):
+    # 'YYYY-MM-DD' includes that whole day; a full ISO timestamp is an inclusive bound
+    if len(value) <= 10:
+        return '<', _datetime(value) + timedelta(days=1)
+    return '<=', _datetime(value)
+
+
+def _number(args, name, cast=float):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return cast(value)
+    except ValueError:
+        raise InvalidFilter(f'{name} must be a number')
+
+
+def parse_filters(args):
+    status = args.get('status', 'all')
+    if status != 'all' and status not in REVIEW_STATUSES:
+        raise InvalidFilter(f"status must be 'all' or one of {', '.join(REVIEW_STATUSES)}")
+    sort = args.get('sort', 'newest')
+    if sort not in SORTS:
+        raise InvalidFilter(f"sort must be one of {', '.join(SORTS)}")
+    return {
+        'status': status,
+        'sort': sort,
+        'date_from': _datetime(args['date_from']) if args.get('date_from') else None,
+        'date_to': _upper_bound(args['date_to']) if args.get('date_to') else None,
+        'min_risk': _number(args, 'min_risk', int),
+        'min_amount': _number(args, 'min_amount'),
+        'max_amount': _number(args, 'max_amount'),
+        'min_prob': _number(args, 'min_prob')
+    }
+
+
+def encode_review_cursor(row, sort):
+    key = [row['timestamp'].isoformat(), row['txn_id']]
+    if sort == 'risk':
+        key.insert(0, row['risk_score'])
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+
+def decode_review_cursor(value, sort):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(value.encode('ascii')).decode('utf-8'))
+        if sort == 'risk':
+            return int(key[0]), datetime.fromisoformat(key[1]), str(key[2])
+        return datetime.fromisoformat(key[0]), str(key[1])
+    except (ValueError, TypeError, IndexError):
+        raise InvalidFilter('Invalid cursor')
+
+
+def build_review_query(filters, after, limit):
+    """SQL for one keyset page of the flagged-transaction queue.
+
+    The leading equality (review_status for a single status, otherwise
+    is_fraud = 1) plus the sort order match one of the migration 8 indexes,
+    so pages are read in index order; the remaining filters are checked on
+    the rows walked. Sorting by risk lists only rows that have a risk score.
+    """
+    where, params = [], []
+    if filters['status'] == 'all':
+        where.append("t.is_fraud = 1")
+    else:
+        where.append("t.review_status = %s")
+        params.append(filters['status'])
+    if filters['date_from'] is not None:
+        where.append("t.timestamp >= %s")
+        params.append(filters['date_from'])
+    if filters['date_to'] is not None:
+        op, bound = filters['date_to']
+        where.append(f"t.timestamp {op} %s")
+        params.append(bound)
+    if filters['min_risk'] is not None:
+        where.append("t.risk_score >= %s")
+        params.append(filters['min_risk'])
+    if filters['min_amount'] is not None:
+        where.append("t.amount >= %s")
+        params.append(filters['min_amount'])
+    if filters['max_amount'] is not None:
+        where.append("t.amount <= %s")
+        params.append(filters['max_amount'])
+    if filters['min_prob'] is not None:
+        where.append("t.fraud_probability >= %s")
+        params.append(filters['min_prob'])
+
+    if filters['sort'] == 'risk':
+        where.append("t.risk_score IS NOT NULL")
+        if after is not None:
+            where.append(
+                "(t.risk_score < %s OR (t.risk_score = %s AND (t.timestamp < %s OR (t.timestamp = %s AND t.txn_id < %s))))"
+            )
+            params += [after[0], after[0], after[1], after[1], after[2]]
+        order = "t.risk_score DESC, t.timestamp DESC, t.txn_id DESC"
+    else:
+        if after is not None:
+            where.append("(t.timestamp < %s OR (t.timestamp = %s AND t.txn_id < %s))")
+            params += [after[0], after[0], after[1]]
+        order = "t.timestamp DESC, t.txn_id DESC"
+
+    sql = (
+        f"SELECT {REVIEW_COLUMNS} FROM transactions t LEFT JOIN users u ON u.user_id = t.sender_user_id "
+        f"WHERE {' AND '.join(where)} ORDER BY {order} LIMIT %s"
+    )
+    return sql, params + [limit]
+
+
+def apply_review_action(cursor, txn_ids, action, now=None):
+    """Set the review status of flagged transactions; returns (updated ids, ids not in the queue).
+
+    The rows are locked first so concurrent reviewers of the same transactions
+    serialize, and the ids are processed in sorted order to avoid deadlocks.
+    """
+    status = REVIEW_ACTIONS[action]
+    txn_ids = sorted(set(txn_ids))
+    placeholders = ", ".join(["%s"] * len(txn_ids))
+    cursor.execute(
+        f"SELECT txn_id FROM transactions WHERE txn_id IN ({placeholders}) AND is_fraud = 1 ORDER BY txn_id FOR UPDATE",
+        tuple(txn_ids)
+    )
+    found = [row[0] for row in cursor.fetchall()]
+    if found:
+        placeholders = ", ".join(["%s"] * len(found))
+        cursor.execute(
+            f"UPDATE transactions SET review_status = %s, reviewed_at = %s WHERE txn_id IN ({placeholders})",
+            (status, now or datetime.now(), *found)
+        )
+    missing = sorted(set(txn_ids) - set(found))
+    return found, missing
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+MODEL_DIR = os.path.join(BACKEND_DIR, 'model')
+
+
+@pytest.fixture(scope='session')
+def shipped_artifacts():
+    from artifacts import load_artifacts
+    artifacts, _ = load_artifacts(MODEL_DIR, mmap=False)
+    if not all(artifacts.values()):
+        pytest.skip('model artifacts did not load')
+    return artifacts
@@ -0,0 +1,74 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_plan import CATEGORICAL_COLUMNS, FeaturePlan, build_features_frame, sample_bases
+from model_bundle import load_model_bundle
+from conftest import MODEL_DIR
+
+
+def random_bases(encoders, n, seed=3):
+    # Known labels mixed with unseen and oddly spelled ones, plus zero and large amounts
+    rng = random.Random(seed)
+    labels = {c: [str(v) for v in encoders[c].classes_] + ['__unseen__', '', 'usd'] for c in CATEGORICAL_COLUMNS}
+    bases = []
+    for _ in range(n):
+        count = rng.randint(0, 50)
+        bases.append({
+            'amount': rng.choice([0.0, 0.01, rng.uniform(1, 5000), rng.uniform(5000, 1e6)]),
+            'currency': rng.choice(labels['currency']),
+            'channel': rng.choice(labels['channel']),
+            'authorization_method': rng.choice(labels['authorization_method']),
+            'txn_hour': rng.randint(0, 23),
+            'txn_day_of_week': rng.randint(0, 6),
+            'is_new_payee': rng.randint(0, 1),
+            'is_international': rng.randint(0, 1),
+            'txn_count_last_24h': count,
+            'sum_amount_last_24h': 0.0 if count == 0 else rng.uniform(0, 1e5)
+        })
+    return bases
+
+
+@pytest.fixture(scope='module')
+def plan(shipped_artifacts):
+    a = shipped_artifacts
+    return FeaturePlan(a['encoders'], a['scaler'], a['fraud_model'])
+
+
+def expected_features(artifacts, bases):
+    return pd.concat(
+        [build_features_frame(base, artifacts['encoders'], artifacts['scaler'], artifacts['fraud_model']) for base in bases],
+        ignore_index=True
+    )
+
+
+def test_columns_match_pandas_pipeline(plan, shipped_artifacts):
+    expected = expected_features(shipped_artifacts, sample_bases(shipped_artifacts['encoders'])[:1])
+    assert plan.columns == [str(c) for c in expected.columns]
+
+
+@pytest.mark.parametrize('source', ['samples', 'random'])
+def test_transform_many_matches_pandas_pipeline(plan, shipped_artifacts, source):
+    encoders = shipped_artifacts['encoders']
+    bases = sample_bases(encoders) if source == 'samples' else random_bases(encoders, 500)
+    assert any(base['currency'] == '__unseen__' for base in bases)
+
+    expected = expected_features(shipped_artifacts, bases).to_numpy(dtype=np.float64)
+    assert np.array_equal(plan.transform_many(bases), expected)
+    for base, row in zip(bases[:50], expected):
+        assert np.array_equal(plan.transform(base)[0], row)
+
+
+@pytest.mark.filterwarnings('error:X does not have valid feature names')
+def test_bundle_scores_arrays_without_feature_name_warnings():
+    bundle = load_model_bundle(MODEL_DIR, mmap=False)
+    if not bundle.ready:
+        pytest.skip('model artifacts did not load')
+    assert bundle.feature_plan is not None
+    bases = random_bases(bundle.encoders, 20)
+    predictions, probabilities = bundle.score_features(bundle.features(bases))
+    assert predictions == [int(p) for p in bundle.fraud_model.predict(expected_features(
+        {'encoders': bundle.encoders, 'scaler': bundle.scaler, 'fraud_model': bundle.fraud_model}, bases))]
+    assert len(probabilities) == len(bases)
@@ -0,0 +1,53 @@
+import threading
+import time
+
+import numpy as np
+
+from inference_scheduler import InferenceScheduler
+
+
+def slow_sum(batch):
+    time.sleep(0.005)
+    return [float(row.sum()) for row in batch]
+
+
+def scheduler_threads():
+    return [t for t in threading.enumerate() if t.name == 'inference-scheduler']
+
+
+def run_concurrently(scheduler, rows):
+    results = [None] * len(rows)
+
+    def call(i):
+        results[i] = scheduler.predict(rows[i])
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(rows))]
+    for t in threads:
+        t.start()
+    return threads, results
+
+
+def test_close_answers_queued_rows_then_stops_the_worker():
+    scheduler = InferenceScheduler(slow_sum, max_batch_size=4, max_wait_ms=5, bypass_inflight=0)
+    rows = [np.full(3, i, dtype=np.float64) for i in range(16)]
+    threads, results = run_concurrently(scheduler, rows)
+    time.sleep(0.002)
+    scheduler.close(timeout=5)
+    for t in threads:
+        t.join(5)
+    assert results == [3.0 * i for i in range(16)]
+    assert scheduler._worker is None or not scheduler._worker.is_alive()
+    # Requests still holding a closed scheduler predict directly
+    assert scheduler.predict(np.ones(3)) == 3.0
+    assert scheduler._worker is None or not scheduler._worker.is_alive()
+
+
+def test_replaced_schedulers_do_not_leave_threads_behind():
+    before = len(scheduler_threads())
+    for _ in range(5):
+        scheduler = InferenceScheduler(slow_sum, max_batch_size=4, max_wait_ms=1, bypass_inflight=0)
+        threads, _ = run_concurrently(scheduler, [np.ones(2)] * 4)
+        for t in threads:
+            t.join(5)
+        scheduler.close(timeout=5)
+    assert len(scheduler_threads()) == before
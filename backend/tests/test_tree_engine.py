@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
+
+from feature_plan import FeaturePlan, named_features, sample_bases
+from tree_engine import compile_model, random_inputs, supports_missing_values
+
+
+def assert_same_scores(engine, model, X):
+    named = named_features(model, X)
+    assert np.array_equal(engine.predict_proba(X), model.predict_proba(named))
+    assert np.array_equal(engine.predict(X), model.predict(named))
+
+
+def outcome(fn, X):
+    # ('error', None) when the call rejects X, otherwise ('ok', result)
+    try:
+        return 'ok', fn(X)
+    except ValueError:
+        return 'error', None
+
+
+def assert_same_outcome(engine, model, X):
+    expected = outcome(model.predict_proba, named_features(model, X))
+    actual = outcome(engine.predict_proba, X)
+    assert actual[0] == expected[0]
+    if expected[0] == 'ok':
+        assert np.array_equal(actual[1], expected[1])
+
+
+@pytest.fixture(scope='module')
+def shipped(shipped_artifacts):
+    a = shipped_artifacts
+    model = a['fraud_model']
+    engine = compile_model(model)
+    assert engine is not None
+    reference = FeaturePlan(a['encoders'], a['scaler'], model).transform_many(sample_bases(a['encoders']))
+    return engine, model, reference
+
+
+def synthetic_data(seed=0, n_rows=400, n_features=6, n_classes=2):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(0, 1, (n_rows, n_features))
+    # Coarse values so many samples share split thresholds
+    X[:, :2] = np.round(X[:, :2], 1)
+    y = (X[:, 0] + X[:, 1] * X[:, 2] + rng.normal(0, 0.5, n_rows) > 0).astype(int)
+    if n_classes > 2:
+        y = y + (X[:, 3] > 0.5).astype(int)
+    return X, y
+
+
+SYNTHETIC_MODELS = [
+    ('tree', lambda: DecisionTreeClassifier(max_depth=8, random_state=0), 2),
+    ('forest', lambda: RandomForestClassifier(n_estimators=25, max_depth=10, random_state=0), 2),
+    ('forest_multiclass', lambda: RandomForestClassifier(n_estimators=15, random_state=0), 3),
+    ('extra_trees', lambda: ExtraTreesClassifier(n_estimators=20, random_state=0), 2),
+    ('logistic', lambda: LogisticRegression(max_iter=500), 2),
+    ('logistic_multiclass', lambda: LogisticRegression(max_iter=500), 3),
+]
+
+
+@pytest.mark.parametrize('name,factory,n_classes', SYNTHETIC_MODELS, ids=[m[0] for m in SYNTHETIC_MODELS])
+def test_synthetic_models_match_sklearn(name, factory, n_classes):
+    X, y = synthetic_data(n_classes=n_classes)
+    model = factory().fit(X, y)
+    engine = compile_model(model)
+    assert engine is not None
+    inputs = random_inputs(model, X, n_rows=300, seed=1)
+    assert_same_scores(engine, model, inputs)
+    for row in inputs[:20]:
+        assert_same_scores(engine, model, row[np.newaxis, :])
+
+
+def test_shipped_model_matches_sklearn_on_random_inputs(shipped):
+    engine, model, reference = shipped
+    X = random_inputs(model, reference, n_rows=1000, seed=11)
+    assert_same_scores(engine, model, X)
+    # Both code paths of predict_proba: one block of rows and many
+    assert_same_scores(engine, model, X[:7])
+    assert_same_scores(engine, model, reference)
+
+
+def test_shipped_model_matches_sklearn_at_threshold_ties(shipped):
+    engine, model, reference = shipped
+    rng = np.random.default_rng(5)
+    rows = []
+    for estimator in model.estimators_[:20]:
+        tree = estimator.tree_
+        for node in np.flatnonzero(tree.feature >= 0)[:40]:
+            feature, threshold = tree.feature[node], tree.threshold[node]
+            row = reference[rng.integers(0, len(reference))].copy()
+            # On the threshold, and one float32 step either side of it
+            for value in (threshold, np.nextafter(np.float32(threshold), np.float32(np.inf)),
+                          np.nextafter(np.float32(threshold), np.float32(-np.inf))):
+                row = row.copy()
+                row[feature] = value
+                rows.append(row)
+    assert_same_scores(engine, model, np.array(rows))
+
+
+@pytest.mark.parametrize('value', [np.nan, np.inf, -np.inf, 1e39])
+def test_non_finite_inputs_handled_like_sklearn(shipped, value):
+    engine, model, reference = shipped
+    X = reference[:5].copy()
+    X[1, 0] = value
+    X[3, -1] = value
+    assert_same_outcome(engine, model, X)
+
+
+def test_nan_rows_follow_missing_value_routing_or_are_rejected():
+    X, y = synthetic_data(seed=3)
+    missing = random_inputs(DecisionTreeClassifier().fit(X, y), X, n_rows=50, seed=2)
+    missing[np.random.default_rng(4).random(missing.shape) < 0.3] = np.nan
+    for model in (RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y),
+                  DecisionTreeClassifier(random_state=0).fit(X, y),
+                  # Monotonic constraints turn off missing-value support, so NaN has to be rejected
+                  DecisionTreeClassifier(random_state=0, monotonic_cst=[1, 0, 0, 0, 0, 0]).fit(X, y),
+                  LogisticRegression().fit(X, y)):
+        engine = compile_model(model)
+        assert getattr(engine, 'allow_nan', False) == supports_missing_values(model)
+        assert_same_outcome(engine, model, missing)
@@ -0,0 +1,58 @@
+from user_cache import UserCache
+
+ALICE = {'user_id': 'u-alice', 'email': 'alice@x.com', 'password_hash': 'h', 'full_name': 'Alice', 'account_number': '1'}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def cache_with_clock():
+    clock = Clock()
+    return UserCache(ttl=300.0, negative_ttl=5.0, clock=clock), clock
+
+
+def test_email_lookups_ignore_case():
+    cache, clock = cache_with_clock()
+    cache.store('email', 'alice@x.com', ALICE, clock())
+    clock.now = 1.0
+    assert cache.lookup('email', 'Alice@X.com') == (True, ALICE)
+
+
+def test_miss_for_padded_email_does_not_hide_the_real_user():
+    cache, clock = cache_with_clock()
+    cache.store('email', 'alice@x.com', ALICE, clock())
+    cache.invalidate(user_id='u-alice', email='alice@x.com')
+    clock.now = 1.0
+    # MySQL finds no row for a leading space; that miss must not land on alice@x.com
+    started = clock()
+    assert cache.lookup('email', ' alice@x.com') == (False, None)
+    cache.store('email', ' alice@x.com', None, started)
+    clock.now = 2.0
+    assert not cache.is_missing('email', 'alice@x.com')
+    assert cache.lookup('email', 'alice@x.com') == (False, None)
+
+
+def test_misses_are_cached_only_under_the_email_looked_up():
+    cache, clock = cache_with_clock()
+    cache.store('email', 'Bob@x.com', None, clock())
+    cache.store('email', 'carol@x.com', None, clock())
+    clock.now = 1.0
+    assert not cache.is_missing('email', 'bob@x.com')
+    assert cache.is_missing('email', 'carol@x.com')
+    assert cache.is_missing('email', 'Carol@X.com')
+
+
+def test_register_clears_misses_for_any_capitalization():
+    cache, clock = cache_with_clock()
+    cache.store('email', 'dave@x.com', None, clock())
+    clock.now = 1.0
+    cache.invalidate(user_id='u-dave', email='Dave@X.com')
+    assert cache.lookup('email', 'dave@x.com') == (False, None)
+    # A SELECT that started before the register cannot put the miss back
+    cache.store('email', 'dave@x.com', None, 0.5)
+    assert not cache.is_missing('email', 'dave@x.com')
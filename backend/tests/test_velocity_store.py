@@ -0,0 +1,111 @@
+import os
+import sys
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from conftest import BACKEND_DIR
+from migrations import run_migrations
+from velocity_store import VelocityStore
+
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'bench'))
+from fake_db import FakeDatabase  # noqa: E402
+
+WINDOW = timedelta(hours=24)
+# The queries the request path and the warm-up run against MySQL
+VELOCITY_SQL = ("SELECT COUNT(*) AS cnt, SUM(amount) AS total_amount FROM transactions "
+                "WHERE sender_user_id = %s AND timestamp >= %s AND status = 'Success'")
+WARM_SQL = "SELECT sender_user_id, timestamp, amount, txn_id FROM transactions WHERE timestamp >= %s AND status = 'Success'"
+
+T0 = datetime(2026, 3, 1, 12, 0, 0)
+# (seconds after T0, amount): half-second timestamps round up, just under half rounds down,
+# half-cent amounts round away from zero
+TRANSFERS = [
+    (0.0, 10.005), (0.5, 0.015), (0.499999, 2.675), (1.5, 1.005), (2.5, 99.995),
+    (2.500001, 0.125), (3.0, 33.333), (4.75, 0.005), (5.25, 12345.675), (6.5, 7.0)
+]
+
+
+@pytest.fixture
+def conn(tmp_path):
+    connection = FakeDatabase(str(tmp_path / 'bank.sqlite')).connect()
+    run_migrations(connection, 'bank')
+    yield connection
+    connection.close()
+
+
+def insert(conn, txn_id, sender, timestamp, amount, status='Success'):
+    # Parameters as the request path passes them: a float amount and a datetime with microseconds
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO transactions (txn_id, sender_user_id, receiver_account_number, amount, currency, channel, "
+        "authorization_method, timestamp, status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        (txn_id, sender, 'ACC-1', amount, 'USD', 'web', 'otp', timestamp, status)
+    )
+    conn.commit()
+    cursor.close()
+
+
+def sql_velocity(conn, sender, now):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(VELOCITY_SQL, (sender, now - WINDOW))
+    row = cursor.fetchone()
+    cursor.close()
+    return row['cnt'] or 0, Decimal(row['total_amount'] or 0)
+
+
+def lookup_times():
+    # Whole seconds stepping the 24h boundary across every transfer, plus the half-second marks
+    start = T0 + WINDOW - timedelta(seconds=1)
+    return [start + timedelta(seconds=s / 2) for s in range(0, 20)]
+
+
+def assert_matches_sql(store, conn, senders, times):
+    for now in times:
+        for sender in senders:
+            expected = sql_velocity(conn, sender, now)
+            count, total = store.lookup(sender, now)
+            assert (count, total) == expected, (sender, now)
+            assert float(total) == float(expected[1])
+
+
+def record_all(conn, store, sender):
+    for i, (offset, amount) in enumerate(TRANSFERS):
+        timestamp = T0 + timedelta(seconds=offset)
+        insert(conn, f'{sender}-{i}', sender, timestamp, amount)
+        store.record(sender, timestamp, amount, f'{sender}-{i}')
+    # Not counted by either side
+    insert(conn, f'{sender}-failed', sender, T0 + timedelta(seconds=3), 50.0, status='Failed')
+
+
+def warm_store(conn, now):
+    store = VelocityStore(window=WINDOW)
+    assert store.begin_warm()
+    cursor = conn.cursor()
+    cursor.execute(WARM_SQL, (now - WINDOW,))
+    store.finish_warm(cursor.fetchall(), now)
+    cursor.close()
+    return store
+
+
+def test_recorded_transfers_match_sql_aggregate(conn):
+    store = warm_store(conn, T0)
+    record_all(conn, store, 'alice')
+    record_all(conn, store, 'bob')
+    assert_matches_sql(store, conn, ['alice', 'bob', 'nobody'], [T0 + timedelta(hours=1)] + lookup_times())
+
+
+def test_warmed_store_matches_sql_aggregate(conn):
+    record_all(conn, VelocityStore(window=WINDOW), 'carol')
+    store = warm_store(conn, T0 + timedelta(hours=1))
+    assert_matches_sql(store, conn, ['carol'], lookup_times())
+
+
+def test_transfer_exactly_on_the_boundary_is_counted(conn):
+    store = warm_store(conn, T0)
+    insert(conn, 'edge', 'dave', T0, 1.0)
+    store.record('dave', T0, 1.0, 'edge')
+    assert store.lookup('dave', T0 + WINDOW) == sql_velocity(conn, 'dave', T0 + WINDOW) == (1, Decimal('1.00'))
+    later = T0 + WINDOW + timedelta(microseconds=1)
+    assert store.lookup('dave', later) == sql_velocity(conn, 'dave', later) == (0, Decimal('0'))
@@ -0,0 +1,240 @@
+import numpy as np
+import sklearn
+from scipy.special import expit
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier, ExtraTreeClassifier
+from sklearn.utils.fixes import parse_version
+from feature_plan import named_features
+
+FOREST_CLASSIFIERS = (RandomForestClassifier, ExtraTreesClassifier)
+TREE_CLASSIFIERS = (DecisionTreeClassifier, ExtraTreeClassifier)
+
+# Before 1.4 tree_.value held class counts and predict_proba divided them by their sum per row
+NORMALIZE_LEAF_VALUES = parse_version(sklearn.__version__) < parse_version('1.4')
+
+# Rows traversed together; bounds the (rows x trees) work arrays
+ROW_BLOCK = 64
+
+
+class TreeEngine:
+    """A fitted tree or forest classifier flattened into contiguous node arrays.
+
+    Every tree's nodes are concatenated with children stored as absolute
+    indices; leaves lead back to themselves, so all rows walk all trees together
+    for max_depth steps with no per-tree Python dispatch. The arithmetic
+    follows sklearn: inputs are compared as float32 (what the trees were
+    fitted on), each tree's leaf probabilities are summed in estimator
+    order and divided by the number of trees. Nodes are renumbered so the
+    right child always follows the left one, which makes a step a single
+    add: next = left[node] + (x > threshold[node]). Inputs are checked the
+    way sklearn checks them: infinite values are rejected, and NaN is either
+    rejected or, for models that accept missing values, sent down each
+    node's missing_go_to_left side.
+    """
+
+    def __init__(self, model):
+        estimators = list(model.estimators_) if isinstance(model, FOREST_CLASSIFIERS) else [model]
+        self.classes_ = model.classes_
+        self.n_classes = len(model.classes_)
+        self.n_features = int(model.n_features_in_)
+        self.n_trees = len(estimators)
+        self.divide = isinstance(model, FOREST_CLASSIFIERS)
+        self.allow_nan = supports_missing_values(model)
+
+        features, thresholds, lefts, missing_rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        depth = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            order = _sibling_order(tree.children_left, tree.children_right)
+            position = np.empty(tree.node_count, dtype=np.intp)
+            position[order] = np.arange(tree.node_count, dtype=np.intp) + offset
+            child = tree.children_left[order]
+            leaf = child == -1
+            features.append(np.where(leaf, 0, tree.feature[order]).astype(np.intp))
+            # A leaf compares against +inf and so "goes left" to itself
+            thresholds.append(np.where(leaf, np.inf, tree.threshold[order]).astype(np.float64))
+            lefts.append(np.where(leaf, position[order], position[np.where(leaf, 0, child)]))
+            missing_left = getattr(tree, 'missing_go_to_left', None)
+            missing_rights.append(np.zeros(len(order), dtype=bool) if missing_left is None
+                                  else ~leaf & (np.asarray(missing_left)[order] == 0))
+            value = np.array(tree.value[order, 0, :self.n_classes], dtype=np.float64)
+            if NORMALIZE_LEAF_VALUES:
+                normalizer = value.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                value /= normalizer
+            values.append(value)
+            roots.append(offset)
+            offset += tree.node_count
+            depth = max(depth, int(tree.max_depth))
+
+        self.feature = np.concatenate(features)
+        self.threshold = np.concatenate(thresholds)
+        self.left = np.concatenate(lefts)
+        self.missing_right = np.concatenate(missing_rights)
+        self.value = np.ascontiguousarray(np.concatenate(values))
+        self.roots = np.array(roots, dtype=np.intp)
+        self.max_depth = depth
+        self.node_count = offset
+
+    def leaves(self, X):
+        # (n_rows, n_trees) leaf node index of every row in every tree; rows go in blocks so the work arrays stay in cache
+        X = check_finite(X, np.float32, self.allow_nan).astype(np.float64)
+        return np.vstack([self._leaves(X[start:start + ROW_BLOCK]) for start in range(0, max(len(X), 1), ROW_BLOCK)])
+
+    def _leaves(self, X):
+        n = X.shape[0]
+        # Feature-major copy: the value for (row, feature) sits at feature * n + row
+        flat = np.ascontiguousarray(X.T).ravel()
+        feature_offsets = self.feature * n
+        rows = np.arange(n, dtype=np.intp)[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (n, self.n_trees)).copy()
+        has_nan = self.allow_nan and np.isnan(flat).any()
+        for _ in range(self.max_depth):
+            x = flat.take(feature_offsets.take(nodes) + rows)
+            go_right = x > self.threshold.take(nodes)
+            if has_nan:
+                go_right |= np.isnan(x) & self.missing_right.take(nodes)
+            nodes = self.left.take(nodes) + go_right
+        return nodes
+
+    def predict_proba(self, X):
+        # Running sum over the trees in estimator order, the same additions the forest makes:
+        # one cumsum for small batches, a loop over trees (cheaper per row) for large ones
+        leaves = self.leaves(X)
+        if len(leaves) <= ROW_BLOCK:
+            proba = np.cumsum(self.value.take(leaves.T, axis=0), axis=0)[-1]
+        else:
+            proba = np.zeros((len(leaves), self.n_classes), dtype=np.float64)
+            for tree_leaves in leaves.T:
+                proba += self.value.take(tree_leaves, axis=0)
+        if self.divide:
+            proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+def supports_missing_values(model):
+    # Whether sklearn lets NaN through to this model's trees (1.4+ for most tree models) instead of rejecting it
+    tree = model.estimators_[0] if isinstance(model, FOREST_CLASSIFIERS) else model
+    support = getattr(tree, '_support_missing_values', None)
+    if support is None or not hasattr(getattr(tree, 'tree_', None), 'missing_go_to_left'):
+        return False
+    try:
+        return bool(support(np.zeros((1, int(model.n_features_in_)), dtype=np.float32)))
+    except Exception:
+        return False
+
+
+def check_finite(X, dtype, allow_nan=False):
+    # The rejections sklearn's input validation makes, with its messages, after casting to dtype
+    with np.errstate(over='ignore'):
+        X = np.asarray(X, dtype=dtype)
+    if not np.isfinite(X).all():
+        if np.isinf(X).any():
+            raise ValueError(f"Input X contains infinity or a value too large for {X.dtype!r}.")
+        if not allow_nan:
+            raise ValueError("Input X contains NaN.")
+    return X
+
+
+def _sibling_order(children_left, children_right):
+    # Breadth-first node order, which puts every right child directly after its left sibling
+    order = [0]
+    for node in order:
+        if children_left[node] != -1:
+            order.append(int(children_left[node]))
+            order.append(int(children_right[node]))
+    return np.array(order, dtype=np.intp)
+
+
+class LinearEngine:
+    """LogisticRegression as a plain coefficient matrix; same formulas as sklearn's decision_function/predict_proba."""
+
+    def __init__(self, model):
+        self.classes_ = model.classes_
+        self.n_features = int(model.n_features_in_)
+        self.coef = np.ascontiguousarray(model.coef_, dtype=np.float64)
+        self.intercept = np.asarray(model.intercept_, dtype=np.float64)
+        self.multinomial = len(model.classes_) > 2 and getattr(model, 'multi_class', 'auto') not in ('ovr',) \
+            and getattr(model, 'solver', None) != 'liblinear'
+
+    def decision_function(self, X):
+        scores = check_finite(X, np.float64) @ self.coef.T + self.intercept
+        return scores.ravel() if scores.shape[1] == 1 else scores
+
+    def predict_proba(self, X):
+        scores = self.decision_function(X)
+        if scores.ndim == 1:
+            prob = expit(scores)
+            return np.vstack([1 - prob, prob]).T
+        if self.multinomial:
+            scores = scores - scores.max(axis=1)[:, np.newaxis]
+            exp = np.exp(scores)
+            return exp / exp.sum(axis=1)[:, np.newaxis]
+        prob = expit(scores)
+        return prob / prob.sum(axis=1)[:, np.newaxis]
+
+    def predict(self, X):
+        scores = self.decision_function(X)
+        indices = (scores > 0).astype(np.intp) if scores.ndim == 1 else scores.argmax(axis=1)
+        return self.classes_.take(indices, axis=0)
+
+
+def compile_model(model):
+    # None when the estimator has no compiled equivalent; callers keep using the sklearn model
+    try:
+        if isinstance(model, FOREST_CLASSIFIERS + TREE_CLASSIFIERS):
+            if getattr(model, 'n_outputs_', 1) != 1:
+                return None
+            return TreeEngine(model)
+        if isinstance(model, LogisticRegression):
+            return LinearEngine(model)
+    except Exception as e:
+        print(f"Failed to compile fraud model: {e}")
+    return None
+
+
+def random_inputs(model, reference, n_rows=512, seed=0):
+    """Randomized rows for comparing an engine with the model.
+
+    Mixes jittered copies of the reference rows, wide random values and, for
+    trees, values sitting exactly on split thresholds, where a comparison
+    done in the wrong precision or direction would send a row the other way,
+    and NaN entries when the model accepts missing values.
+    """
+    rng = np.random.default_rng(seed)
+    reference = np.asarray(reference, dtype=np.float64)
+    n_features = reference.shape[1]
+    picks = reference[rng.integers(0, len(reference), n_rows)]
+    rows = [picks + rng.normal(0, 1, picks.shape), rng.normal(0, 3, (n_rows, n_features))]
+
+    estimators = list(getattr(model, 'estimators_', [model]))
+    splits = [(int(f), float(t)) for e in estimators if hasattr(e, 'tree_')
+              for f, t in zip(e.tree_.feature, e.tree_.threshold) if f >= 0]
+    if splits:
+        on_threshold = picks.copy()
+        for row in on_threshold:
+            for i in rng.integers(0, len(splits), n_features):
+                feature, threshold = splits[i]
+                row[feature] = threshold
+        rows.append(on_threshold)
+    if supports_missing_values(model):
+        missing = picks.copy()
+        missing[rng.random(missing.shape) < 0.3] = np.nan
+        rows.append(missing)
+    return np.vstack(rows)
+
+
+def verify_engine(engine, model, X, single_rows=32):
+    # Predictions must match exactly and probabilities bit for bit, for the whole batch and row by row
+    for batch in [X] + [X[i:i + 1] for i in range(min(single_rows, len(X)))]:
+        named = named_features(model, batch)
+        if not np.array_equal(engine.predict_proba(batch), model.predict_proba(named)):
+            return False
+        if not np.array_equal(engine.predict(batch), model.predict(named)):
+            return False
+    return True
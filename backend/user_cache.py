@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserCache:
+    """Bounded TTL + LRU cache of users rows, keyed by user_id and by email.
+
+    lookup(field, value) returns (hit, row); a hit with row None means the
+    user is known not to exist (negative entry, kept for negative_ttl so
+    floods of unknown ids or emails stop at the cache). store() caches a row
+    under both keys. invalidate() leaves a tombstone stamped with the current
+    time, and store() ignores any row whose read started before the newest
+    stamp on its key, so a SELECT that raced a register cannot put a stale
+    miss back. Entries are evicted least recently used first past max_entries.
+    Emails are keyed lower-cased, since the users table compares them
+    case-insensitively, so every capitalization of a found address shares one
+    entry. Whitespace is kept: MySQL does not ignore a leading space. A miss is
+    only cached when the email looked up already is its key, so a miss is never
+    recorded for a spelling the query did not check.
+
+    Like the velocity store this only sees writes made by this process; the
+    TTLs bound how stale another process's changes can be here.
+    """
+
+    def __init__(self, max_entries=100_000, ttl=300.0, negative_ttl=5.0, clock=time.monotonic):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        self.negative_ttl = float(negative_ttl)
+        self.now = clock
+        self._lock = threading.Lock()
+        # (field, value) -> (expires_at, row, stamp)
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_stores = 0
+
+    @staticmethod
+    def _key(field, value):
+        if field == 'email' and isinstance(value, str):
+            return field, value.lower()
+        return field, value
+
+    def lookup(self, field, value):
+        now = self.now()
+        key = self._key(field, value)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                if entry[1] is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return True, entry[1]
+            if entry is not None and entry[2] < entry[0]:
+                # Expired entry (tombstones expire the moment they are written and are not counted)
+                self.expirations += 1
+            self.misses += 1
+            return False, None
+
+    def is_missing(self, field, value):
+        # True on a live negative entry, so callers can answer "not found" before taking a connection;
+        # only True is counted, as a False answer is followed by a lookup()
+        now = self.now()
+        key = self._key(field, value)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.negative_hits += 1
+                return True
+            return False
+
+    def store(self, field, value, row, started):
+        # started: self.now() taken before the SELECT that produced row (None = not found)
+        now = self.now()
+        with self._lock:
+            if row is None:
+                key = self._key(field, value)
+                if key[1] == value:
+                    self._put(key, now + self.negative_ttl, None, now, started)
+            else:
+                # Only under the row's own keys, which invalidate() clears; a lookup spelled differently
+                # (e.g. a trailing space MySQL matched) keeps going to the table
+                entry = (now + self.ttl, row, now)
+                for key in (self._key('user_id', row['user_id']), self._key('email', row['email'])):
+                    self._put(key, *entry, started)
+            self._evict()
+
+    def _put(self, key, expires_at, row, stamp, started):
+        entry = self._entries.get(key)
+        if entry is not None and entry[2] >= started:
+            self.stale_stores += 1
+            return
+        self._entries[key] = (expires_at, row, stamp)
+        self._entries.move_to_end(key)
+
+    def invalidate(self, user_id=None, email=None):
+        now = self.now()
+        with self._lock:
+            for key in (self._key('user_id', user_id), self._key('email', email)):
+                if key[1] is not None:
+                    self._entries[key] = (now, None, now)
+                    self._entries.move_to_end(key)
+                    self.invalidations += 1
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_s': self.ttl,
+                'negative_ttl_s': self.negative_ttl,
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'hit_ratio': ((self.hits + self.negative_hits) / lookups) if lookups else 0.0,
+                'expirations': self.expirations,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'stale_stores': self.stale_stores
+            }
@@ -0,0 +1,151 @@
+import threading
+from collections import deque
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+COLD, WARMING, WARM = 'cold', 'warming', 'warm'
+CENT = Decimal('0.01')
+
+
+def db_timestamp(ts):
+    # DATETIME columns keep whole seconds; MySQL rounds the fractional part on insert
+    return (ts + timedelta(microseconds=500000)).replace(microsecond=0)
+
+
+def db_amount(amount):
+    # DECIMAL(15,2) rounds half away from zero
+    return Decimal(str(amount)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class _SenderWindow:
+    __slots__ = ('entries', 'txn_ids', 'total')
+
+    def __init__(self):
+        self.entries = deque()  # (timestamp, amount, txn_id), oldest first
+        self.txn_ids = set()
+        self.total = Decimal('0')
+
+
+class VelocityStore:
+    """Per-sender sliding window of successful transfers.
+
+    Answers the txn_count_last_24h / sum_amount_last_24h features from memory
+    once warm. Warming loads the window from the transactions table; transfers
+    committed while the warm-up query runs are buffered and merged afterwards,
+    and entries are keyed by txn_id so nothing is counted twice. While cold,
+    lookup returns None and callers use the SQL aggregate instead.
+
+    The store only sees commits made by this process, so it is exact for a
+    single backend process and should be disabled when several processes write
+    transfers for the same senders.
+    """
+
+    def __init__(self, window=timedelta(hours=24), sweep_every=1000):
+        self.window = window
+        self.sweep_every = sweep_every
+        self._lock = threading.Lock()
+        self._senders = {}
+        self._state = COLD
+        self._buffer = []
+        self._records_since_sweep = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def state(self):
+        return self._state
+
+    def begin_warm(self):
+        with self._lock:
+            if self._state == WARMING:
+                return False
+            self._state = WARMING
+            self._buffer = []
+            return True
+
+    def finish_warm(self, rows, now):
+        # rows: (sender_user_id, timestamp, amount, txn_id) for Success transfers inside the window
+        senders = {}
+        for sender, ts, amount, txn_id in sorted(rows, key=lambda r: r[1]):
+            self._add(senders, sender, ts, Decimal(amount), txn_id)
+        with self._lock:
+            for sender, ts, amount, txn_id in sorted(self._buffer, key=lambda r: r[1]):
+                self._add(senders, sender, ts, amount, txn_id)
+            self._senders = senders
+            self._buffer = []
+            self._state = WARM
+            self._sweep(now)
+
+    def fail_warm(self):
+        with self._lock:
+            self._state = COLD
+            self._buffer = []
+
+    def lookup(self, sender, now):
+        # Returns (count, Decimal sum) over (now - window, now], or None when cold
+        with self._lock:
+            if self._state != WARM:
+                self.misses += 1
+                return None
+            self.hits += 1
+            window = self._senders.get(sender)
+            if window is None:
+                return 0, Decimal('0')
+            self._evict(sender, window, now - self.window)
+            if not window.entries:
+                del self._senders[sender]
+                return 0, Decimal('0')
+            return len(window.entries), window.total
+
+    def record(self, sender, timestamp, amount, txn_id):
+        # Call after a Success transfer has been committed
+        entry = (sender, db_timestamp(timestamp), db_amount(amount), txn_id)
+        with self._lock:
+            if self._state == WARMING:
+                self._buffer.append(entry)
+            elif self._state == WARM:
+                self._add(self._senders, *entry)
+                self._records_since_sweep += 1
+                if self._records_since_sweep >= self.sweep_every:
+                    self._sweep(timestamp)
+
+    def _add(self, senders, sender, ts, amount, txn_id):
+        window = senders.get(sender)
+        if window is None:
+            window = senders[sender] = _SenderWindow()
+        if txn_id in window.txn_ids:
+            return
+        window.txn_ids.add(txn_id)
+        window.total += amount
+        if window.entries and ts < window.entries[-1][0]:
+            # Out-of-order commit: keep entries sorted so eviction can pop from the left
+            entries = sorted(list(window.entries) + [(ts, amount, txn_id)], key=lambda e: e[0])
+            window.entries = deque(entries)
+        else:
+            window.entries.append((ts, amount, txn_id))
+
+    def _evict(self, sender, window, threshold):
+        # Same boundary as the SQL aggregate: keep timestamp >= threshold
+        while window.entries and window.entries[0][0] < threshold:
+            _, amount, txn_id = window.entries.popleft()
+            window.txn_ids.discard(txn_id)
+            window.total -= amount
+
+    def _sweep(self, now):
+        threshold = now - self.window
+        for sender in list(self._senders):
+            window = self._senders[sender]
+            self._evict(sender, window, threshold)
+            if not window.entries:
+                del self._senders[sender]
+        self._records_since_sweep = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self._state,
+                'senders': len(self._senders),
+                'entries': sum(len(w.entries) for w in self._senders.values()),
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -56,6 +56,9 @@ interface KPIData {
   fraud_rate: number;
 }
 
+// Rows per page of the flagged-transaction queue
+const PAGE_SIZE = 50;
+
 interface AdminDashboardProps {
   onLogout: () => void;
 }
@@ -69,7 +72,8 @@ const AdminDashboard: React.FC<AdminDashboardProps> = ({ onLogout }) => {
     fraud_rate: 0,
   });
   const [flaggedTransactions, setFlaggedTransactions] = useState<FlaggedTransaction[]>([]);
-  const [filteredTransactions, setFilteredTransactions] = useState<FlaggedTransaction[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [selectedIds, setSelectedIds] = useState<string[]>([]);
   const [selectedTransaction, setSelectedTransaction] = useState<FlaggedTransaction | null>(null);
   const [showTransactionModal, setShowTransactionModal] = useState(false);
   const [isLoading, setIsLoading] = useState(false);
@@ -86,87 +90,86 @@ const AdminDashboard: React.FC<AdminDashboardProps> = ({ onLogout }) => {
 
   useEffect(() => {
     fetchKPIData();
-    fetchFlaggedTransactions();
   }, []);
 
+  // Filtering and paging happen on the server; refetch the first page whenever a filter changes
   useEffect(() => {
-    applyFilters();
-  }, [flaggedTransactions, filters]);
+    fetchFlaggedTransactions();
+  }, [filters]);
 
   const fetchKPIData = async () => {
     try {
-      // Mock API call - replace with actual endpoint
-      const mockKPI: KPIData = {
-        total_users: 12547,
-        todays_transactions: 1843,
-        flagged_transactions: 23,
-        fraud_rate: 1.25,
-      };
-      setKpiData(mockKPI);
+      const response = await fetch('http://localhost:5000/api/admin/kpis', {
+        headers: {
+          'Authorization': `Bearer ${localStorage.getItem('admin_token')}`,
+        },
+      });
+
+      if (!response.ok) {
+        throw new Error('Failed to fetch KPI data');
+      }
+
+      const data = await response.json();
+      setKpiData({
+        total_users: data.total_users,
+        todays_transactions: data.todays_transactions,
+        flagged_transactions: data.flagged_transactions,
+        fraud_rate: data.fraud_rate,
+      });
     } catch (error) {
       console.error('Failed to fetch KPI data:', error);
     }
   };
 
-  const fetchFlaggedTransactions = async () => {
+  const buildQuery = (cursor?: string) => {
+    const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+    if (filters.status !== 'all') params.set('status', filters.status);
+    if (filters.dateFrom) params.set('date_from', format(filters.dateFrom, 'yyyy-MM-dd'));
+    if (filters.dateTo) params.set('date_to', format(filters.dateTo, 'yyyy-MM-dd'));
+    if (filters.riskScore !== 'all') params.set('min_risk', filters.riskScore);
+    if (filters.minAmount) params.set('min_amount', filters.minAmount);
+    if (filters.maxAmount) params.set('max_amount', filters.maxAmount);
+    if (filters.predictedProb) params.set('min_prob', filters.predictedProb);
+    if (cursor) params.set('cursor', cursor);
+    return params.toString();
+  };
+
+  const toFlaggedTransaction = (row: any): FlaggedTransaction => ({
+    id: row.txn_id,
+    sender_account: row.sender_account ?? '',
+    sender_name: row.sender_name ?? '',
+    receiver_account: row.receiver_account_number,
+    receiver_name: row.receiver_name ?? '',
+    amount: parseFloat(row.amount),
+    currency: row.currency,
+    description: row.description ?? '',
+    timestamp: row.timestamp,
+    risk_score: row.risk_score ?? 0,
+    predicted_prob: row.fraud_probability ?? 0,
+    status: row.review_status ?? 'flagged',
+    send_via: row.channel,
+    device_info: row.device_fingerprint ?? undefined,
+    ip_address: row.ip_address ?? undefined,
+  });
+
+  const fetchFlaggedTransactions = async (cursor?: string) => {
     setIsLoading(true);
     try {
-      // Mock API call - replace with actual endpoint
-      const mockTransactions: FlaggedTransaction[] = [
-        {
-          id: 'TXN001',
-          sender_account: '1234567890',
-          sender_name: 'John Doe',
-          receiver_account: '9876543210',
-          receiver_name: 'Jane Smith',
-          amount: 25000,
-          currency: 'USD',
-          description: 'Large business payment',
-          timestamp: '2024-01-15T14:30:00Z',
-          risk_score: 85,
-          predicted_prob: 0.78,
-          status: 'flagged',
-          send_via: 'web',
-          device_info: 'Chrome 120.0 on Windows 11',
-          ip_address: '192.168.1.100',
-        },
-        {
-          id: 'TXN002',
-          sender_account: '5555666677',
-          sender_name: 'Mike Johnson',
-          receiver_account: '1111222233',
-          receiver_name: 'Unknown',
-          amount: 15000,
-          currency: 'USD',
-          description: 'Emergency transfer',
-          timestamp: '2024-01-15T12:15:00Z',
-          risk_score: 72,
-          predicted_prob: 0.65,
-          status: 'under_review',
-          send_via: 'mobile',
-          device_info: 'iOS 17.2 on iPhone 14',
-          ip_address: '203.0.113.45',
-        },
-        {
-          id: 'TXN003',
-          sender_account: '7777888899',
-          sender_name: 'Sarah Wilson',
-          receiver_account: '4444555566',
-          receiver_name: 'Bob Brown',
-          amount: 45000,
-          currency: 'USD',
-          description: 'Investment payment',
-          timestamp: '2024-01-15T09:45:00Z',
-          risk_score: 91,
-          predicted_prob: 0.89,
-          status: 'flagged',
-          send_via: 'web',
-          device_info: 'Firefox 121.0 on macOS 14',
-          ip_address: '198.51.100.25',
+      const response = await fetch(`http://localhost:5000/api/admin/transactions?${buildQuery(cursor)}`, {
+        headers: {
+          'Authorization': `Bearer ${localStorage.getItem('admin_token')}`,
         },
-      ];
-      
-      setFlaggedTransactions(mockTransactions);
+      });
+
+      if (!response.ok) {
+        throw new Error('Failed to fetch flagged transactions');
+      }
+
+      const data = await response.json();
+      const page = data.transactions.map(toFlaggedTransaction);
+      setFlaggedTransactions(prev => (cursor ? [...prev, ...page] : page));
+      setNextCursor(data.next_cursor);
+      if (!cursor) setSelectedIds([]);
     } catch (error) {
       console.error('Failed to fetch flagged transactions:', error);
     } finally {
@@ -174,69 +177,63 @@ const AdminDashboard: React.FC<AdminDashboardProps> = ({ onLogout }) => {
     }
   };
 
-  const applyFilters = () => {
-    let filtered = [...flaggedTransactions];
-
-    // Date filter
-    if (filters.dateFrom) {
-      filtered = filtered.filter(t => new Date(t.timestamp) >= filters.dateFrom!);
-    }
-    if (filters.dateTo) {
-      filtered = filtered.filter(t => new Date(t.timestamp) <= filters.dateTo!);
-    }
-
-    // Risk score filter
-    if (filters.riskScore !== 'all') {
-      const threshold = parseInt(filters.riskScore);
-      filtered = filtered.filter(t => t.risk_score >= threshold);
-    }
+  const handleTransactionAction = async (transactionId: string, action: 'approve' | 'block' | 'request_info') => {
+    try {
+      const response = await fetch(`http://localhost:5000/api/admin/transactions/${transactionId}/action`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'Authorization': `Bearer ${localStorage.getItem('admin_token')}`,
+        },
+        body: JSON.stringify({ action }),
+      });
 
-    // Amount filters
-    if (filters.minAmount) {
-      filtered = filtered.filter(t => t.amount >= parseFloat(filters.minAmount));
-    }
-    if (filters.maxAmount) {
-      filtered = filtered.filter(t => t.amount <= parseFloat(filters.maxAmount));
-    }
+      if (!response.ok) {
+        throw new Error('Action failed');
+      }
 
-    // Predicted probability filter
-    if (filters.predictedProb) {
-      filtered = filtered.filter(t => t.predicted_prob >= parseFloat(filters.predictedProb));
-    }
+      toast({
+        title: "Action Successful",
+        description: `Transaction ${action === 'approve' ? 'approved' : action === 'block' ? 'blocked' : 'flagged for more info'}`,
+        variant: "default",
+      });
 
-    // Status filter
-    if (filters.status !== 'all') {
-      filtered = filtered.filter(t => t.status === filters.status);
+      // Refresh data
+      fetchFlaggedTransactions();
+      setShowTransactionModal(false);
+    } catch (error) {
+      toast({
+        title: "Action Failed",
+        description: "Please try again",
+        variant: "destructive",
+      });
     }
-
-    setFilteredTransactions(filtered);
   };
 
-  const handleTransactionAction = async (transactionId: string, action: 'approve' | 'block' | 'request_info') => {
+  const handleBulkAction = async (action: 'approve' | 'block') => {
+    if (selectedIds.length === 0) return;
     try {
-      // Mock API call - replace with actual endpoint
-      const response = await fetch(`/api/admin/transactions/${transactionId}/action`, {
+      const response = await fetch('http://localhost:5000/api/admin/transactions/actions', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
           'Authorization': `Bearer ${localStorage.getItem('admin_token')}`,
         },
-        body: JSON.stringify({ action }),
+        body: JSON.stringify({ txn_ids: selectedIds, action }),
       });
 
       if (!response.ok) {
         throw new Error('Action failed');
       }
 
+      const data = await response.json();
       toast({
         title: "Action Successful",
-        description: `Transaction ${action === 'approve' ? 'approved' : action === 'block' ? 'blocked' : 'flagged for more info'}`,
+        description: `${data.updated.length} transaction(s) ${action === 'approve' ? 'approved' : 'blocked'}`,
         variant: "default",
       });
 
-      // Refresh data
       fetchFlaggedTransactions();
-      setShowTransactionModal(false);
     } catch (error) {
       toast({
         title: "Action Failed",
@@ -246,9 +243,15 @@ const AdminDashboard: React.FC<AdminDashboardProps> = ({ onLogout }) => {
     }
   };
 
+  const toggleSelected = (transactionId: string) => {
+    setSelectedIds(prev =>
+      prev.includes(transactionId) ? prev.filter(id => id !== transactionId) : [...prev, transactionId]
+    );
+  };
+
   const exportCSV = () => {
     const headers = ['ID', 'Sender', 'Receiver', 'Amount', 'Risk Score', 'Probability', 'Status', 'Date'];
-    const csvData = filteredTransactions.map(t => [
+    const csvData = flaggedTransactions.map(t => [
       t.id,
       `${t.sender_name} (${t.sender_account})`,
       `${t.receiver_name} (${t.receiver_account})`,
@@ -533,12 +536,35 @@ const AdminDashboard: React.FC<AdminDashboardProps> = ({ onLogout }) => {
             {/* Transactions Table */}
             <Card className="shadow-card">
               <CardHeader>
-                <CardTitle>Flagged Transactions ({filteredTransactions.length})</CardTitle>
+                <div className="flex items-center justify-between">
+                  <CardTitle>Flagged Transactions ({flaggedTransactions.length}{nextCursor ? '+' : ''})</CardTitle>
+                  <div className="flex gap-2">
+                    <Button
+                      size="sm"
+                      variant="default"
+                      disabled={selectedIds.length === 0}
+                      onClick={() => handleBulkAction('approve')}
+                    >
+                      <Check className="w-3 h-3 mr-1" />
+                      Approve selected ({selectedIds.length})
+                    </Button>
+                    <Button
+                      size="sm"
+                      variant="destructive"
+                      disabled={selectedIds.length === 0}
+                      onClick={() => handleBulkAction('block')}
+                    >
+                      <X className="w-3 h-3 mr-1" />
+                      Block selected
+                    </Button>
+                  </div>
+                </div>
               </CardHeader>
               <CardContent>
                 <Table>
                   <TableHeader>
                     <TableRow>
+                      <TableHead></TableHead>
                       <TableHead>Transaction ID</TableHead>
                       <TableHead>Sender</TableHead>
                       <TableHead>Receiver</TableHead>
@@ -550,8 +576,15 @@ const AdminDashboard: React.FC<AdminDashboardProps> = ({ onLogout }) => {
                     </TableRow>
                   </TableHeader>
                   <TableBody>
-                    {filteredTransactions.map((transaction) => (
+                    {flaggedTransactions.map((transaction) => (
                       <TableRow key={transaction.id}>
+                        <TableCell>
+                          <input
+                            type="checkbox"
+                            checked={selectedIds.includes(transaction.id)}
+                            onChange={() => toggleSelected(transaction.id)}
+                          />
+                        </TableCell>
                         <TableCell className="font-mono">{transaction.id}</TableCell>
                         <TableCell>
                           <div>
@@ -620,6 +653,13 @@ const AdminDashboard: React.FC<AdminDashboardProps> = ({ onLogout }) => {
                     ))}
                   </TableBody>
                 </Table>
+                {nextCursor && (
+                  <div className="flex justify-center mt-4">
+                    <Button variant="outline" disabled={isLoading} onClick={() => fetchFlaggedTransactions(nextCursor)}>
+                      Load more
+                    </Button>
+                  </div>
+                )}
               </CardContent>
             </Card>
           </TabsContent>